@@ -0,0 +1,3 @@
+from .backtest import *
+from .checkpoint import *
+from .daycache import *
@@ -2,9 +2,15 @@
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
-import time, queue
+import os
+import queue
 
-from settings import settings
+from data.bars import BarAggregator
+from event.dispatcher import EventDispatcher, EventRouter
+from performance import format_report, write_report
+from portfolio import NumpyEquityRecorder
+from settings import settings, OUTPUT_RESULTS_DIR
+from strategy import StrategyHost
 
 class Backtest(object):
     """
@@ -15,54 +21,240 @@ class Backtest(object):
         self, pairs, data_handler, strategy,
         strategy_params, portfolio, execution,
         equity=100000.0, heartbeat=0.0,
-        max_iters=10000000000
+        max_iters=10000000000, data_dir=None, fixed_point=False,
+        portfolio_params=None, execution_params=None,
+        instrumentation=None, reuse_ticks=False, checkpoint=None,
+        day_cache=None, dates=None
     ):
         """
         Inizializza il backtest.
+
+        data_dir è la directory dei dati passata al data_handler: se
+        non specificata si usa CSV_DATA_DIR dalle impostazioni.
+        Con fixed_point=True prezzi, saldo e P&L sono interi (pipette
+        e micro-unità) invece che Decimal. portfolio_params contiene
+        eventuali argomenti aggiuntivi per il portfolio (es. recorder).
+
+        Se execution_params è indicato, l'execution viene creata con la
+        coda degli eventi, il ticker e questi argomenti (es. latenza e
+        slippage di SimulatedExecution) e il portfolio aggiorna le
+        posizioni solo alla ricezione dei FillEvent.
+
+        Se la strategia ha un attributo timeframes (es. ["1min"]) i tick
+        sono aggregati in barre da un BarAggregator e la strategia riceve
+        solo i BarEvent delle sue coppie e dei suoi timeframe, invece di
+        ogni tick.
+
+        instrumentation è un oggetto Instrumentation opzionale (vedi
+        performance.instrumentation): alla fine del backtest il report
+        con i tempi dei gestori, la profondità della coda, le latenze
+        ed eventualmente il profilo viene stampato ed esportato in
+        instrumentation.json in OUTPUT_RESULTS_DIR.
+
+        Con reuse_ticks=True il gestore dei prezzi riusa lo stesso
+        TickEvent per ogni tick invece di allocarne uno nuovo.
+
+        checkpoint è un Checkpointer opzionale (vedi
+        backtest.checkpoint): ogni checkpoint.every tick lo stato del
+        backtest viene salvato e, se esiste già un checkpoint, il
+        backtest riprende da quel punto.
+
+        day_cache è una DayCache opzionale (vedi backtest.daycache): lo
+        stato alla fine di ogni giorno dei dati viene salvato e i giorni
+        iniziali già presenti nella cache, con gli stessi parametri e
+        gli stessi file, non sono simulati di nuovo. Non si può usare
+        insieme a checkpoint.
+
+        dates è l'elenco opzionale dei giorni "YYYYMMDD" da simulare,
+        per default tutti quelli presenti in data_dir.
         """
+        if checkpoint is not None and day_cache is not None:
+            raise ValueError("checkpoint and day_cache cannot be used together")
         self.pairs = pairs
         self.events = queue.Queue()
-        self.csv_dir = settings.CSV_DATA_DIR
-        self.ticker = data_handler(self.pairs, self.events, self.csv_dir)
-        self.strategy_params = strategy_params
-        self.strategy = strategy(
-            self.pairs, self.events, **self.strategy_params
+        self.csv_dir = data_dir if data_dir is not None else settings.CSV_DATA_DIR
+        data_params = {"fixed_point": fixed_point}
+        if reuse_ticks:
+            data_params["reuse_ticks"] = True
+        if dates is not None:
+            data_params["dates"] = dates
+        self.ticker = data_handler(
+            self.pairs, self.events, self.csv_dir, **data_params
         )
+        self.strategy_params = strategy_params
         self.equity = equity
         self.heartbeat = heartbeat
         self.max_iters = max_iters
+        self.instrumentation = instrumentation
+        self.checkpoint = checkpoint
+        self.day_cache = day_cache
+        self.iters = 0
+        self.bars = None
+        portfolio_params = dict(portfolio_params or {})
+        if execution_params is not None:
+            portfolio_params.setdefault("fill_events", True)
+        self.portfolio_params = portfolio_params
+        self.execution_params = execution_params
+        self._create_strategy_portfolio(strategy, portfolio, portfolio_params)
+        if execution_params is not None:
+            self.execution = execution(
+                self.events, self.ticker, **execution_params
+            )
+        else:
+            self.execution = execution()
+        self.dispatcher = self._create_dispatcher()
+
+    def _create_strategy_portfolio(self, strategy, portfolio, portfolio_params):
+        self.strategy = strategy(
+            self.pairs, self.events, **self.strategy_params
+        )
         self.portfolio = portfolio(
-            self.ticker, self.events, equity=self.equity, backtest=True
+            self.ticker, self.events, equity=self.equity, backtest=True,
+            **portfolio_params
         )
-        self.execution = execution()
+
+    def _create_dispatcher(self):
+        """
+        Crea il dispatcher degli eventi con la tabella dei gestori
+        per ogni tipo di evento.
+        """
+        handlers = {
+            "TICK": [
+                self.strategy.calculate_signals,
+                self.portfolio.update_portfolio
+            ],
+            "SIGNAL": [self.portfolio.execute_signal],
+            "ORDER": [self.execution.execute_order],
+            "FILL": [self.portfolio.execute_fill],
+        }
+        timeframes = getattr(self.strategy, "timeframes", None)
+        if timeframes:
+            # La strategia lavora sulle barre: i tick passano solo
+            # dall'aggregatore, le barre chiuse sono instradate alla
+            # strategia in base a coppia e timeframe
+            self.bars = BarAggregator(self.events, timeframes, self.pairs)
+            self.router = EventRouter()
+            self.router.subscribe(
+                self.strategy.calculate_signals, self.pairs, timeframes
+            )
+            handlers["TICK"][0] = self.bars.on_tick
+            handlers["BAR"] = [self.router.route]
+        if hasattr(self.execution, "on_tick"):
+            # Il simulatore esegue gli ordini in attesa prima che la
+            # strategia elabori il nuovo tick
+            handlers["TICK"].insert(0, self.execution.on_tick)
+        return EventDispatcher(self.events, handlers, self.instrumentation)
 
     def _run_backtest(self):
         """
-        Esegue un ciclo while infinito che esegue il polling
-        della coda degli eventi e indirizza ogni evento al
-        componente della strategia del gestore di esecuzione.
-        Il ciclo si fermerà quindi per "heartbeat" secondi
-        e continuerà fino a quando si supera il numero massimo
-        di iterazioni.
+        Richiede un tick alla volta al gestore dei prezzi ed elabora
+        in blocco tutti gli eventi che ne derivano (tick, segnali,
+        ordini) tramite il dispatcher, fino alla fine dei dati o al
+        numero massimo di tick. Se heartbeat è maggiore di zero il
+        ciclo si ferma per "heartbeat" secondi dopo ogni tick.
         """
         print("Running Backtest...")
-        iters = 0
-        while iters < self.max_iters and self.ticker.continue_backtest:
-            try:
-                event = self.events.get(False)
-            except queue.Empty:
-                self.ticker.stream_next_tick()
+        if self.day_cache is not None:
+            self._run_cached_days()
+            return
+        if self.checkpoint is None:
+            self.iters += self.dispatcher.run_backtest(
+                self.ticker, self.max_iters, self.heartbeat
+            )
+            if not self.ticker.continue_backtest:
+                self._flush_bars()
+            return
+        if self.checkpoint.exists():
+            self.checkpoint.load(self)
+            print("Resuming from checkpoint after %s ticks..." % self.iters)
+        while self.ticker.continue_backtest and self.iters < self.max_iters:
+            self.iters += self.dispatcher.run_backtest(
+                self.ticker,
+                min(self.checkpoint.every, self.max_iters - self.iters),
+                self.heartbeat
+            )
+            if self.ticker.continue_backtest:
+                self.checkpoint.save(self)
+        if not self.ticker.continue_backtest:
+            # Backtest completato: il checkpoint non serve più
+            self._flush_bars()
+            self.checkpoint.clear()
+
+    def _flush_bars(self):
+        """
+        Alla fine dei dati emette le barre ancora aperte ed elabora gli
+        eventi che ne derivano, per cui l'ultima barra di ogni coppia e
+        timeframe è la stessa di resample_ticks e load_bars.
+        """
+        if self.bars is not None:
+            self.bars.flush()
+            self.dispatcher.drain()
+
+    def _run_cached_days(self):
+        """
+        Ripristina lo stato alla fine dell'ultimo giorno presente nella
+        cache e simula un giorno alla volta i giorni successivi,
+        salvando nella cache lo stato alla fine di ciascuno.
+        """
+        days = self.day_cache.days(self)
+        done = self.day_cache.cached(days)
+        if done:
+            self.day_cache.load(self, [key for _, key, _ in days[:done]])
+            print("Reusing %s cached days of %s..." % (done, len(days)))
+            if done < len(days):
+                self.ticker.open_day(days[done][0])
             else:
-                if event is not None:
-                    if event.type == 'TICK':
-                        self.strategy.calculate_signals(event)
-                        self.portfolio.update_portfolio(event)
-                    elif event.type == 'SIGNAL':
-                        self.portfolio.execute_signal(event)
-                    elif event.type == 'ORDER':
-                        self.execution.execute_order(event)
-            time.sleep(self.heartbeat)
-            iters += 1
+                self.ticker.continue_backtest = False
+        for date_str, key, ticks in days[done:]:
+            ticks = min(ticks, self.max_iters - self.iters)
+            self.iters += self.dispatcher.run_backtest(
+                self.ticker, ticks, self.heartbeat
+            )
+            if self.iters >= self.max_iters:
+                return
+            self.day_cache.save(self, key)
+        # Le barre aperte sono emesse dopo il salvataggio dell'ultimo
+        # giorno, che potrà proseguire con i dati dei giorni successivi
+        self._flush_bars()
+
+    def cache_params(self):
+        """
+        Restituisce i parametri che identificano il backtest nella
+        DayCache.
+        """
+        return [
+            type(self.strategy), self.strategy_params, type(self.portfolio),
+            self.portfolio_params, type(self.execution),
+            self.execution_params, type(self.ticker), self.pairs,
+            self.equity, self.ticker.fixed_point
+        ]
+
+    def get_state(self, directory):
+        """
+        Restituisce lo stato del backtest per un checkpoint; le righe
+        della curva di equity sono salvate in directory.
+        """
+        state = {
+            "iters": self.iters,
+            "ticker": self.ticker.get_state(),
+            "strategy": self.strategy.get_state(),
+            "portfolio": self.portfolio.get_state(directory)
+        }
+        if hasattr(self.execution, "get_state"):
+            state["execution"] = self.execution.get_state()
+        if self.bars is not None:
+            state["bars"] = self.bars.get_state()
+        return state
+
+    def set_state(self, state, directory):
+        self.iters = state["iters"]
+        self.ticker.set_state(state["ticker"])
+        self.strategy.set_state(state["strategy"])
+        self.portfolio.set_state(state["portfolio"], directory)
+        if "execution" in state:
+            self.execution.set_state(state["execution"])
+        if "bars" in state:
+            self.bars.set_state(state["bars"])
 
     def _output_performance(self):
         """
@@ -70,6 +262,15 @@ class Backtest(object):
         """
         print("Calculating Performance Metrics...")
         self.portfolio.output_results()
+        if self.instrumentation is None:
+            print(self.dispatcher.tick_to_order)
+            return
+        report = self.dispatcher.report()
+        print(format_report(report))
+        if OUTPUT_RESULTS_DIR is not None:
+            write_report(
+                report, os.path.join(OUTPUT_RESULTS_DIR, "instrumentation.json")
+            )
 
     def simulate_trading(self):
         """
@@ -77,4 +278,85 @@ class Backtest(object):
         """
         self._run_backtest()
         self._output_performance()
-        print("Backtest complete.")
\ No newline at end of file
+        print("Backtest complete.")
+
+
+class MultiStrategyBacktest(Backtest):
+    """
+    Backtest di più strategie sullo stesso flusso di prezzi, ospitate
+    da uno StrategyHost: ogni strategia riceve solo i tick (o le barre)
+    delle sue coppie e ha un sotto-portfolio con P&L proprio.
+    """
+    def __init__(
+        self, pairs, data_handler, strategies, portfolio, execution,
+        **kwargs
+    ):
+        """
+        strategies è un elenco di dizionari con le chiavi "id",
+        "strategy" (la classe) e opzionalmente "params", "pairs" (per
+        default tutte le coppie del backtest), "equity" e
+        "portfolio_params". Gli altri argomenti sono quelli di Backtest.
+        """
+        self.strategies = strategies
+        Backtest.__init__(
+            self, pairs, data_handler, StrategyHost, {}, portfolio,
+            execution, **kwargs
+        )
+
+    def _create_strategy_portfolio(self, strategy, portfolio, portfolio_params):
+        host = strategy(self.events)
+        for spec in self.strategies:
+            strategy_id = spec["id"]
+            events = host.queue(strategy_id)
+            pairs = spec.get("pairs", self.pairs)
+            params = dict(portfolio_params)
+            params.update(spec.get("portfolio_params", {}))
+            if "recorder" not in params:
+                path = None
+                if OUTPUT_RESULTS_DIR is not None:
+                    path = os.path.join(
+                        OUTPUT_RESULTS_DIR, "backtest_%s.npz" % strategy_id
+                    )
+                params["recorder"] = NumpyEquityRecorder(
+                    self.ticker.pairs, path=path
+                )
+            host.add_strategy(
+                strategy_id,
+                spec["strategy"](pairs, events, **spec.get("params", {})),
+                portfolio(
+                    self.ticker, events,
+                    equity=spec.get("equity", self.equity), backtest=True,
+                    **params
+                ),
+                pairs
+            )
+        self.strategy = self.portfolio = self.host = host
+
+    def _create_dispatcher(self):
+        dispatcher = Backtest._create_dispatcher(self)
+        dispatcher.register("BAR", self.host.calculate_signals)
+        return dispatcher
+
+    def _flush_bars(self):
+        self.host.flush()
+        self.dispatcher.drain()
+
+    def cache_params(self):
+        return Backtest.cache_params(self) + [self.strategies]
+
+    def get_state(self, directory):
+        state = {
+            "iters": self.iters,
+            "ticker": self.ticker.get_state(),
+            "host": self.host.get_state(directory)
+        }
+        if hasattr(self.execution, "get_state"):
+            state["execution"] = self.execution.get_state()
+        return state
+
+    def set_state(self, state, directory):
+        self.iters = state["iters"]
+        self.ticker.set_state(state["ticker"])
+        self.host.set_state(state["host"], directory)
+        if "execution" in state:
+            self.execution.set_state(state["execution"])
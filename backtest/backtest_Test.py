@@ -8,6 +8,7 @@ import threading
 import time
 from decimal import Decimal, getcontext
 
+from event.dispatcher import EventDispatcher
 from execution import SimulatedExecution
 from portfolio import Portfolio
 from settings import settings
@@ -15,60 +16,41 @@ from strategy import TestStrategy
 from data.price import HistoricCSVPriceHandler
 
 
-def trade(events, strategy, portfolio, execution, heartbeat):
+def create_dispatcher(events, strategy, portfolio, execution):
     """
-    Esegue un ciclo while infinito che esegue il polling
-    della coda degli eventi e indirizza ogni evento al
-    componente della strategia del gestore di esecuzione.
-    Il ciclo si fermerà quindi per "heartbeat" secondi
-    e continuerà.
+    Crea il dispatcher con la tabella tipo evento -> gestori.
     """
-    while True:
-        try:
-            event = events.get(False)
-        except queue.Empty:
-            pass
-        else:
-            if event is not None:
-                if event.type == 'TICK':
-                    strategy.calculate_signals(event)
-                elif event.type == 'SIGNAL':
-                    portfolio.execute_signal(event)
-                elif event.type == 'ORDER':
-                    execution.execute_order(event)
-        time.sleep(heartbeat)
+    return EventDispatcher(events, {
+        "TICK": [strategy.calculate_signals],
+        "SIGNAL": [portfolio.execute_signal],
+        "ORDER": [execution.execute_order],
+    })
 
 
+def trade(events, strategy, portfolio, execution, heartbeat, stop_event=None):
+    """
+    Resta in attesa sulla coda degli eventi (al più "heartbeat"
+    secondi per volta) e indirizza ogni evento al componente
+    registrato per il suo tipo, fino a quando stop_event viene
+    impostato.
+    """
+    dispatcher = create_dispatcher(events, strategy, portfolio, execution)
+    dispatcher.run_live(timeout=heartbeat or 1.0, stop_event=stop_event)
+
 
 def backtest(events, ticker, strategy, portfolio,
         execution, heartbeat, max_iters=200000
     ):
     """
-    Esegue un ciclo while infinito che esegue il polling
-    della coda degli eventi e indirizza ogni evento al
-    componente della strategia del gestore di esecuzione.
-    Il ciclo si fermerà quindi per "heartbeat" secondi
-    e continuerà fino a quando si supera il numero massimo
-    di iterazioni.
+    Richiede un tick alla volta al gestore dei prezzi ed elabora in
+    blocco gli eventi che ne derivano, fino alla fine dei dati o al
+    numero massimo di tick. Se heartbeat è maggiore di zero il ciclo
+    si ferma per "heartbeat" secondi dopo ogni tick.
     """
-    iters = 0
-    while True and iters < max_iters:
-        ticker.stream_next_tick()
-        try:
-            event = events.get(False)
-        except queue.Empty:
-            pass
-        else:
-            if event is not None:
-                if event.type == 'TICK':
-                    strategy.calculate_signals(event)
-                elif event.type == 'SIGNAL':
-                    portfolio.execute_signal(event)
-                elif event.type == 'ORDER':
-                    execution.execute_order(event)
-        time.sleep(heartbeat)
-        iters += 1
+    dispatcher = create_dispatcher(events, strategy, portfolio, execution)
+    dispatcher.run_backtest(ticker, max_iters, heartbeat)
     portfolio.output_results()
+    print(dispatcher.tick_to_order)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import glob
+import os, os.path
+import pickle
+
+
+class Checkpointer(object):
+    """
+    Salva periodicamente lo stato di un backtest in corso, in modo da
+    poterlo riprendere dopo un'interruzione ottenendo esattamente gli
+    stessi risultati di un'esecuzione senza interruzioni.
+
+    Lo stato (posizione nei dati, ultimi prezzi, stato della strategia,
+    del portfolio, degli ordini in attesa e del simulatore) è raccolto
+    dai metodi get_state dei componenti e scritto in un unico pickle,
+    in modo atomico: un'interruzione durante il salvataggio lascia
+    valido il checkpoint precedente. Le righe della curva di equity non
+    sono ripetute in ogni checkpoint, ma accodate in file binari
+    (*_equity.bin) nella stessa directory, per cui il costo di un
+    checkpoint non cresce con la durata del backtest.
+
+    La strategia deve implementare get_state e set_state (vedi
+    MovingAverageCrossStrategy).
+    """
+
+    def __init__(self, directory, every=100000):
+        """
+        Parametri:
+        directory - La directory dei file del checkpoint, creata se
+            non esiste. Deve essere dedicata a un solo backtest.
+        every - Il numero di tick tra due checkpoint.
+        """
+        self.directory = directory
+        self.every = every
+        self.path = os.path.join(directory, "checkpoint.pkl")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def save(self, backtest):
+        """
+        Scrive lo stato del backtest, sostituendo il checkpoint
+        precedente solo a scrittura completata.
+        """
+        state = backtest.get_state(self.directory)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as state_file:
+            pickle.dump(state, state_file, pickle.HIGHEST_PROTOCOL)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self, backtest):
+        """
+        Ripristina nel backtest, appena creato con gli stessi
+        parametri, lo stato dell'ultimo checkpoint.
+        """
+        with open(self.path, "rb") as state_file:
+            state = pickle.load(state_file)
+        backtest.set_state(state, self.directory)
+
+    def clear(self):
+        """
+        Elimina i file del checkpoint, ad esempio a backtest completato.
+        """
+        paths = [self.path, self.path + ".tmp"] + glob.glob(
+            os.path.join(self.directory, "*_equity.bin")
+        )
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
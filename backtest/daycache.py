@@ -0,0 +1,190 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import datetime
+from decimal import Decimal
+import glob
+import hashlib
+import inspect
+import os, os.path
+import pickle
+import shutil
+import tempfile
+
+
+def describe_param(value):
+    """
+    Restituisce una descrizione testuale stabile di un parametro del
+    backtest, usata per la chiave della cache. Le classi sono descritte
+    dal nome e dall'hash del codice sorgente, per cui la modifica di
+    una strategia invalida la cache; gli altri oggetti (es. un
+    recorder) sono descritti dalla classe e dalla configurazione
+    restituita dal loro metodo cache_key o, in mancanza, dai loro
+    attributi. Solleva TypeError per i parametri che non si possono
+    descrivere, invece di condividere la chiave con configurazioni
+    diverse.
+    """
+    if isinstance(value, type):
+        try:
+            source = inspect.getsource(value)
+        except (OSError, TypeError):
+            source = ""
+        return "%s.%s:%s" % (
+            value.__module__, value.__qualname__,
+            hashlib.sha1(source.encode("utf-8")).hexdigest()
+        )
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda kv: repr(kv[0]))
+        return "{%s}" % ",".join(
+            "%s:%s" % (describe_param(k), describe_param(v))
+            for k, v in items
+        )
+    if isinstance(value, (list, tuple)):
+        return "[%s]" % ",".join(describe_param(v) for v in value)
+    if value is None or isinstance(value, (
+        str, bool, int, float, Decimal, datetime.date, datetime.time,
+        datetime.timedelta
+    )):
+        return repr(value)
+    cache_key = getattr(value, "cache_key", None)
+    if cache_key is not None:
+        config = cache_key()
+    else:
+        try:
+            config = vars(value)
+        except TypeError:
+            raise TypeError(
+                "Cannot describe backtest parameter %r for the day cache"
+                % (value,)
+            )
+    return "%s(%s)" % (describe_param(type(value)), describe_param(config))
+
+
+class DayCache(object):
+    """
+    Cache su disco dello stato di fine giornata di un backtest, per
+    rieseguire ogni giorno lo stesso backtest su uno storico che cresce
+    simulando solo i giorni nuovi o modificati.
+
+    Per ogni giorno dei dati la chiave è l'hash della chiave del giorno
+    precedente e del contenuto dei file del giorno; la chiave del primo
+    giorno parte dall'hash dei parametri del backtest (classi e codice
+    della strategia, del portfolio e dell'esecuzione, parametri, coppie,
+    capitale). Aggiungere un giorno costa quindi la sola simulazione di
+    quel giorno, mentre la modifica di un file invalida il suo giorno e
+    tutti i successivi.
+
+    Ogni voce è una directory con lo stato di fine giornata (vedi
+    Backtest.get_state) e le righe della curva di equity registrate nel
+    giorno. Gli hash dei file sono memorizzati in base a dimensione e
+    data di modifica, per cui i file invariati non sono riletti.
+    """
+
+    def __init__(self, directory):
+        """
+        Parametri:
+        directory - La directory della cache, creata se non esiste.
+            Può essere condivisa da backtest con parametri diversi.
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, "files.pkl")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        try:
+            with open(self.index_path, "rb") as index_file:
+                self.files = pickle.load(index_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.files = {}
+
+    def _file_digest(self, ticker, path):
+        """
+        Restituisce l'hash del contenuto di un file di dati e il numero
+        dei suoi tick, rileggendo il file solo se è cambiato.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        entry = self.files.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1], entry[2]
+        with open(path, "rb") as data_file:
+            data = data_file.read()
+        digest = hashlib.sha1(data).hexdigest()
+        ticks = ticker.count_ticks(data)
+        self.files[path] = (signature, digest, ticks)
+        return digest, ticks
+
+    def days(self, backtest):
+        """
+        Restituisce l'elenco (data, chiave, tick) di tutti i giorni dei
+        dati del backtest, in ordine.
+        """
+        ticker = backtest.ticker
+        key = hashlib.sha1(
+            describe_param(backtest.cache_params()).encode("utf-8")
+        ).hexdigest()
+        days = []
+        for date_str in ticker.file_dates:
+            day_hash = hashlib.sha1(key.encode("ascii"))
+            ticks = 0
+            for path in ticker.day_files(date_str):
+                digest, file_ticks = self._file_digest(ticker, path)
+                day_hash.update(digest.encode("ascii"))
+                ticks += file_ticks
+            key = day_hash.hexdigest()
+            days.append((date_str, key, ticks))
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as index_file:
+            pickle.dump(self.files, index_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+        return days
+
+    def _day_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def cached(self, days):
+        """
+        Restituisce il numero di giorni iniziali presenti nella cache.
+        """
+        for i, (date_str, key, ticks) in enumerate(days):
+            if not os.path.exists(os.path.join(self._day_dir(key), "state.pkl")):
+                return i
+        return len(days)
+
+    def save(self, backtest, key):
+        """
+        Salva lo stato di fine giornata del backtest. La directory del
+        giorno compare nella cache solo a scrittura completata.
+        """
+        day_dir = self._day_dir(key)
+        tmp_dir = tempfile.mkdtemp(prefix="tmp-", dir=self.directory)
+        state = backtest.get_state(tmp_dir)
+        with open(os.path.join(tmp_dir, "state.pkl"), "wb") as state_file:
+            pickle.dump(state, state_file, pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(day_dir):
+            shutil.rmtree(day_dir)
+        os.replace(tmp_dir, day_dir)
+
+    def load(self, backtest, keys):
+        """
+        Ripristina nel backtest, appena creato, lo stato alla fine
+        dell'ultimo dei giorni keys, ricomponendo la curva di equity
+        dalle righe registrate in tutti i giorni.
+        """
+        tmp_dir = tempfile.mkdtemp(prefix="tmp-", dir=self.directory)
+        try:
+            for key in keys:
+                for path in glob.glob(
+                    os.path.join(self._day_dir(key), "*_equity.bin")
+                ):
+                    out_path = os.path.join(tmp_dir, os.path.basename(path))
+                    with open(path, "rb") as in_file, \
+                            open(out_path, "ab") as out_file:
+                        shutil.copyfileobj(in_file, out_file)
+            with open(
+                os.path.join(self._day_dir(keys[-1]), "state.pkl"), "rb"
+            ) as state_file:
+                state = pickle.load(state_file)
+            backtest.set_state(state, tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -0,0 +1,203 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+import itertools
+import os
+import random
+
+import pandas as pd
+
+from performance import (
+    create_drawdowns, period_returns, sharpe_ratio, sortino_ratio,
+    trade_stats
+)
+
+
+def grid_parameters(param_grid):
+    """
+    Restituisce l'elenco di tutte le combinazioni dei parametri.
+
+    Parametri:
+    param_grid - Dizionario nome parametro -> elenco dei valori,
+        es. {"short_window": [100, 500], "long_window": [1000, 2000]}.
+    """
+    names = sorted(param_grid)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*[param_grid[n] for n in names])
+    ]
+
+
+def random_parameters(param_distributions, n_iter, seed=None):
+    """
+    Restituisce n_iter combinazioni di parametri estratte a caso.
+
+    Parametri:
+    param_distributions - Dizionario nome parametro -> elenco dei
+        valori (estrazione uniforme) oppure funzione che riceve un
+        random.Random e restituisce un valore.
+    n_iter - Il numero di combinazioni.
+    seed - Il seme del generatore, per ripetere la stessa ricerca.
+    """
+    rng = random.Random(seed)
+    params_list = []
+    for _ in range(n_iter):
+        params = {}
+        for name in sorted(param_distributions):
+            dist = param_distributions[name]
+            params[name] = dist(rng) if callable(dist) else rng.choice(dist)
+        params_list.append(params)
+    return params_list
+
+
+def curve_statistics(curve, trade_pnls, equity):
+    """
+    Riassume la curva di equity di un backtest (DataFrame con la
+    colonna Balance e una colonna per coppia) nelle statistiche
+    riportate nella tabella dei risultati. Sharpe e Sortino sono
+    calcolati sui rendimenti giornalieri, per cui non dipendono dalla
+    densità dei tick né dal campionamento del recorder.
+    """
+    total = curve.sum(axis=1)
+    returns = period_returns(total)
+    drawdown, max_dd, dd_duration = create_drawdowns(total / float(equity))
+    stats = trade_stats(trade_pnls)
+    return {
+        "final_equity": float(total.iloc[-1]) if len(total) else float(equity),
+        "total_return": float(total.iloc[-1]) / float(equity) - 1.0 if len(total) else 0.0,
+        "max_drawdown": float(max_dd),
+        "drawdown_duration": float(dd_duration),
+        "sharpe": sharpe_ratio(returns),
+        "sortino": sortino_ratio(returns),
+        "trades": stats["trades"],
+        "win_rate": stats["win_rate"],
+        "profit_factor": stats["profit_factor"],
+    }
+
+
+def _simulate_vectorised(
+    pairs, csv_dir, store_dir, equity, params, dates=None
+):
+    """
+    Esegue un singolo VectorisedBacktest in un processo di lavoro e
+    restituisce la curva di equity e i P&L dei trade.
+    """
+    from backtest.vectorised import VectorisedBacktest
+    backtest = VectorisedBacktest(
+        pairs, csv_dir, equity=equity, store_dir=store_dir, dates=dates,
+        **params
+    )
+    curve = backtest.simulate_trading()
+    return curve, backtest.trade_pnls
+
+
+def _simulate_event_driven(
+    pairs, csv_dir, store_dir, equity, params, dates=None
+):
+    """
+    Esegue un singolo Backtest event-driven in un processo di lavoro,
+    leggendo i tick dall'archivio binario se disponibile, e
+    restituisce la curva di equity e i P&L dei trade.
+    """
+    from backtest.backtest import Backtest
+    from data.price import HistoricBinaryPriceHandler, HistoricCSVPriceHandler
+    from execution import SimulatedExecution
+    from portfolio import Portfolio, NumpyEquityRecorder
+    from strategy import MovingAverageCrossStrategy
+
+    if store_dir is not None:
+        handler, data_dir = HistoricBinaryPriceHandler, store_dir
+    else:
+        handler, data_dir = HistoricCSVPriceHandler, csv_dir
+    backtest = Backtest(
+        pairs, handler, MovingAverageCrossStrategy, params,
+        Portfolio, SimulatedExecution, equity=equity, data_dir=data_dir,
+        portfolio_params={"recorder": NumpyEquityRecorder(pairs)},
+        dates=dates
+    )
+    backtest._run_backtest()
+    curve = backtest.portfolio.recorder.to_frame()
+    return curve, backtest.portfolio.trade_pnls
+
+
+def _run_vectorised(pairs, csv_dir, store_dir, equity, params, dates=None):
+    curve, trade_pnls = _simulate_vectorised(
+        pairs, csv_dir, store_dir, equity, params, dates
+    )
+    return curve_statistics(curve, trade_pnls, equity)
+
+
+def _run_event_driven(
+    pairs, csv_dir, store_dir, equity, params, dates=None
+):
+    curve, trade_pnls = _simulate_event_driven(
+        pairs, csv_dir, store_dir, equity, params, dates
+    )
+    return curve_statistics(curve, trade_pnls, equity)
+
+
+class ParameterSweep(object):
+    """
+    Esegue la MovingAverageCrossStrategy per un insieme di parametri
+    (griglia o ricerca casuale) distribuendo i backtest su più processi
+    con un ProcessPoolExecutor, e raccoglie le statistiche di ogni
+    esecuzione in un'unica tabella.
+
+    Se è indicato store_dir i processi leggono i tick dall'archivio
+    binario mappato in memoria: i dati decodificati sono condivisi in
+    sola lettura tramite la page cache del sistema operativo, senza
+    ripetere il parsing dei CSV in ogni processo.
+    """
+
+    def __init__(
+        self, pairs, params_list, csv_dir=None, store_dir=None,
+        equity=Decimal("100000.00"), engine="vectorised", max_workers=None
+    ):
+        """
+        Parametri:
+        pairs - L'elenco delle coppie di valute da negoziare.
+        params_list - Elenco dei dizionari dei parametri della
+            strategia, es. prodotto da grid_parameters.
+        csv_dir, store_dir - Directory dei dati CSV o dell'archivio
+            binario (preferito).
+        equity - Il capitale iniziale di ogni backtest.
+        engine - "vectorised" (VectorisedBacktest) o "event" (Backtest).
+        max_workers - Il numero di processi, per default i core disponibili.
+        """
+        if csv_dir is None and store_dir is None:
+            raise ValueError("Either csv_dir or store_dir must be provided")
+        if engine not in ("vectorised", "event"):
+            raise ValueError("Unknown backtest engine: %s" % engine)
+        self.pairs = pairs
+        self.params_list = list(params_list)
+        self.csv_dir = csv_dir
+        self.store_dir = store_dir
+        self.equity = equity
+        self.engine = engine
+        self.max_workers = max_workers or os.cpu_count()
+
+    def run(self, sort_by="sharpe"):
+        """
+        Esegue tutti i backtest e restituisce un DataFrame con una riga
+        per combinazione di parametri, ordinato per sort_by.
+        """
+        run_one = _run_vectorised if self.engine == "vectorised" \
+            else _run_event_driven
+        n = len(self.params_list)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(
+                run_one, [self.pairs] * n, [self.csv_dir] * n,
+                [self.store_dir] * n, [self.equity] * n, self.params_list
+            ))
+        rows = []
+        for params, stats in zip(self.params_list, results):
+            row = dict(params)
+            row.update(stats)
+            rows.append(row)
+        table = pd.DataFrame(rows)
+        if sort_by is not None and len(table):
+            table = table.sort_values(sort_by, ascending=False)
+        return table.reset_index(drop=True)
@@ -0,0 +1,361 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from decimal import Decimal
+import os, os.path, re
+
+import numpy as np
+import pandas as pd
+
+from data.store import TickStore
+from fixedpoint import PRICE_SCALE
+from strategy.indicators import sma, to_fixed_array
+
+
+class VectorisedBacktest(object):
+    """
+    Esegue il backtest della MovingAverageCrossStrategy lavorando su
+    interi array NumPy giornalieri invece di far passare ogni tick
+    attraverso la coda degli eventi.
+
+    Per ogni giorno i tick di tutte le coppie sono uniti in ordine
+    temporale, le SMA sono calcolate in blocco con strategy.indicators,
+    gli eseguiti sono risolti in blocco solo sui tick che generano un
+    segnale e la curva di equity è costruita in un unico passaggio.
+
+    La semantica replica quella del motore event-driven (Backtest,
+    MovingAverageCrossStrategy, Portfolio e Position), in modo che il
+    P&L finale coincida sugli stessi file CSV.
+    """
+    def __init__(
+        self, pairs, csv_dir, short_window=500, long_window=2000,
+        equity=Decimal("100000.00"), home_currency="GBP",
+        risk_per_trade=Decimal("0.02"), store_dir=None, dates=None
+    ):
+        """
+        Inizializza il backtest vettoriale.
+
+        Parametri:
+        pairs - L'elenco delle coppie di valute da negoziare.
+        csv_dir - Percorso assoluto della directory dei file CSV.
+        short_window, long_window - Finestre delle SMA della strategia.
+        equity - Il capitale iniziale del portafoglio.
+        home_currency - La valuta di riferimento del conto.
+        risk_per_trade - La frazione di equity impiegata per ogni trade.
+        store_dir - Se specificato, i tick sono letti dall'archivio
+            binario mappato in memoria invece che dai file CSV.
+        dates - Se indicato, si usano solo i giorni "YYYYMMDD"
+            dell'elenco.
+        """
+        self.pairs = pairs
+        self.csv_dir = csv_dir
+        self.store = TickStore(store_dir) if store_dir is not None else None
+        self.short_window = short_window
+        self.long_window = long_window
+        self.equity = equity
+        self.home_currency = home_currency
+        self.trade_units = int(equity * risk_per_trade)
+        self.file_dates = self._list_all_file_dates()
+        if dates is not None:
+            dates = set(dates)
+            self.file_dates = [d for d in self.file_dates if d in dates]
+        self.qh_pairs = [self._quote_home_source(p) for p in self.pairs]
+        self._reset_state()
+
+    def _list_all_file_dates(self):
+        """
+        Restituisce l'elenco ordinato delle date "YYYYMMDD"
+        per cui esistono file CSV nella directory dei dati.
+        """
+        if self.store is not None:
+            return self.store.list_file_dates()
+        pattern = re.compile("[A-Z]{6}_\d{8}.csv")
+        files = [f for f in os.listdir(self.csv_dir) if pattern.search(f)]
+        return sorted(set([f[7:-4] for f in files]))
+
+    def _quote_home_source(self, pair):
+        """
+        Individua come ottenere il tasso quote/home di una coppia:
+        restituisce (indice coppia, invertito) oppure None se la
+        valuta quotata coincide con la valuta di riferimento.
+        """
+        quote = pair[3:]
+        if quote == self.home_currency:
+            return None
+        qh_pair = "%s%s" % (quote, self.home_currency)
+        hq_pair = "%s%s" % (self.home_currency, quote)
+        if qh_pair in self.pairs:
+            return self.pairs.index(qh_pair), False
+        if hq_pair in self.pairs:
+            return self.pairs.index(hq_pair), True
+        raise ValueError(
+            "Unable to price %s in %s: neither %s nor %s is traded" % (
+                pair, self.home_currency, qh_pair, hq_pair
+            )
+        )
+
+    def _reset_state(self):
+        """
+        Stato trasportato da un giorno al successivo.
+        """
+        n_pairs = len(self.pairs)
+        self.balance = float(self.equity)
+        self.ticks = np.zeros(n_pairs, dtype=np.int64)
+        # Ultimi prezzi (in pipette) di ogni coppia, necessari per
+        # proseguire le SMA sul giorno successivo
+        self.history = [np.empty(0, dtype=np.int64) for i in range(n_pairs)]
+        self.invested = np.zeros(n_pairs, dtype=bool)
+        self.last_bid = np.full(n_pairs, np.nan)
+        self.last_ask = np.full(n_pairs, np.nan)
+        self.last_profit = np.zeros(n_pairs)
+        # posizioni aperte: indice coppia -> [tipo, prezzo medio, unità]
+        self.positions = {}
+        self.trade_pnls = []
+
+    def _load_day_arrays(self, date_str):
+        """
+        Legge i file CSV di un giorno e restituisce gli array uniti in
+        ordine temporale: timestamp (int64 ns), indice della coppia,
+        bid e ask. A parità di timestamp si mantiene l'ordine delle coppie.
+        """
+        times, pair_ids, bids, asks = [], [], [], []
+        for i, p in enumerate(self.pairs):
+            if self.store is not None:
+                day = self.store.load_day(p, date_str)
+                times.append(day["Time"])
+                pair_ids.append(np.full(len(day["Time"]), i, dtype=np.int64))
+                bids.append(day["Bid"] / PRICE_SCALE)
+                asks.append(day["Ask"] / PRICE_SCALE)
+                continue
+            pair_path = os.path.join(self.csv_dir, '%s_%s.csv' % (p, date_str))
+            frame = pd.read_csv(
+                pair_path, header=0, index_col=0,
+                parse_dates=True, dayfirst=True,
+                names=("Time", "Ask", "Bid", "AskVolume", "BidVolume")
+            )
+            times.append(
+                frame.index.values.astype("datetime64[ns]").view(np.int64)
+            )
+            pair_ids.append(np.full(len(frame), i, dtype=np.int64))
+            bids.append(np.round(frame["Bid"].values, 5))
+            asks.append(np.round(frame["Ask"].values, 5))
+        times = np.concatenate(times)
+        order = np.argsort(times, kind="stable")
+        return (
+            times[order], np.concatenate(pair_ids)[order],
+            np.concatenate(bids)[order], np.concatenate(asks)[order]
+        )
+
+    def _last_known_quotes(self, pair_ids, bid, ask):
+        """
+        Costruisce le matrici (tick x coppie) con l'ultimo bid/ask noto
+        di ogni coppia al momento di ciascun tick.
+        """
+        n = len(pair_ids)
+        rows = np.arange(n)
+        q_bid = np.empty((n, len(self.pairs)))
+        q_ask = np.empty((n, len(self.pairs)))
+        for i in range(len(self.pairs)):
+            last = np.maximum.accumulate(np.where(pair_ids == i, rows, -1))
+            seen = last >= 0
+            q_bid[:, i] = np.where(seen, bid[last], self.last_bid[i])
+            q_ask[:, i] = np.where(seen, ask[last], self.last_ask[i])
+        return q_bid, q_ask
+
+    def _quote_home_rates(self, q_bid, q_ask, i):
+        """
+        Restituisce il bid/ask del tasso quote/home della coppia i
+        per ogni tick, invertendo la coppia negoziata se necessario.
+        """
+        source = self.qh_pairs[i]
+        if source is None:
+            ones = np.ones(len(q_bid))
+            return ones, ones
+        j, inverted = source
+        if inverted:
+            return np.round(1.0 / q_bid[:, j], 5), np.round(1.0 / q_ask[:, j], 5)
+        return q_bid[:, j], q_ask[:, j]
+
+    def _calculate_signals(self, pair_ids, bid):
+        """
+        Calcola le SMA e i segnali della strategia per ogni coppia con
+        operazioni sugli array. Restituisce la lista dei segnali
+        (indice tick, indice coppia, lato).
+        """
+        signals = []
+        for i in range(len(self.pairs)):
+            rows = np.flatnonzero(pair_ids == i)
+            if len(rows) == 0:
+                continue
+            # Si antepongono gli ultimi prezzi del giorno precedente in
+            # modo che le SMA coincidano con quelle in streaming della
+            # strategia event-driven
+            window = max(self.short_window, self.long_window)
+            history = self.history[i]
+            prices = np.concatenate([history, to_fixed_array(bid[rows])])
+            short_sma = sma(prices, self.short_window)[len(history):]
+            long_sma = sma(prices, self.long_window)[len(history):]
+            self.history[i] = prices[max(0, len(prices) - window + 1):]
+
+            ticks = self.ticks[i] + np.arange(len(rows))
+            ready = ticks + 1 >= window
+            sign = np.zeros(len(rows), dtype=np.int64)
+            sign[ready] = np.sign(short_sma[ready] - long_sma[ready])
+
+            # Lo stato "investito" dopo ogni tick è dato dall'ultimo
+            # segno non nullo, partendo dallo stato del giorno precedente
+            last = np.maximum.accumulate(
+                np.where(sign != 0, np.arange(len(sign)), -1)
+            )
+            invested = np.where(
+                last >= 0, sign[np.maximum(last, 0)] > 0, self.invested[i]
+            )
+            previous = np.concatenate([[self.invested[i]], invested[:-1]])
+            for k in np.flatnonzero(invested != previous):
+                signals.append(
+                    (rows[k], i, "buy" if invested[k] else "sell")
+                )
+
+            self.ticks[i] += len(rows)
+            self.invested[i] = invested[-1]
+        signals.sort()
+        return signals
+
+    def _resolve_fills(self, signals, complete, q_bid, q_ask, qh_rates):
+        """
+        Risolve in blocco gli eseguiti dei segnali con la stessa logica
+        di Portfolio.execute_signal. Restituisce il P&L realizzato per
+        ogni tick e, per ogni coppia, gli eventi che modificano la
+        posizione come (indice tick, posizione o None).
+        """
+        pnl = np.zeros(len(complete))
+        changes = dict((i, []) for i in range(len(self.pairs)))
+        for row, i, side in signals:
+            if not complete[row]:
+                continue
+            units = self.trade_units
+            ps = self.positions.get(i)
+            if ps is None:
+                if side == "buy":
+                    ps = ["long", q_ask[row, i], units]
+                else:
+                    ps = ["short", q_bid[row, i], units]
+            elif (side == "buy") == (ps[0] == "long"):
+                # Aggiunge unità alla posizione con prezzo medio ponderato
+                add_price = q_ask[row, i] if ps[0] == "long" else q_bid[row, i]
+                total = ps[2] + units
+                ps = [ps[0], (ps[1] * ps[2] + add_price * units) / total, total]
+            elif units == ps[2]:
+                qh_bid, qh_ask = qh_rates[i]
+                if ps[0] == "long":
+                    pips = np.round(q_bid[row, i] - ps[1], 5)
+                    qh_close = qh_ask[row]
+                else:
+                    pips = np.round(ps[1] - q_ask[row, i], 5)
+                    qh_close = qh_bid[row]
+                trade_pnl = np.round(pips * qh_close * ps[2], 2)
+                pnl[row] += trade_pnl
+                self.trade_pnls.append(trade_pnl)
+                ps = None
+            else:
+                # Riduzione o inversione della posizione non gestite,
+                # come in Portfolio.execute_signal
+                continue
+            if ps is None:
+                del self.positions[i]
+            else:
+                self.positions[i] = ps
+            changes[i].append((row, ps))
+        return pnl, changes
+
+    def _unrealised_profit(self, i, pair_ids, changes, q_bid, q_ask, qh_rates):
+        """
+        Calcola il profit_base della coppia i per ogni tick, così come
+        compare nella curva di equity del Portfolio: il valore viene
+        aggiornato sui tick della coppia e alla creazione della posizione.
+
+        L'array restituito ha un elemento in più, il valore a fine
+        giornata, che viene trasportato al giorno successivo.
+        """
+        n = len(pair_ids)
+        rows = np.arange(n + 1)
+        change_rows = np.array([c[0] for c in changes], dtype=np.int64)
+        marker = np.append(pair_ids == i, False)
+        marker[change_rows] = True
+        eval_row = np.maximum.accumulate(np.where(marker, rows, -1))
+
+        # Posizione attiva per ogni tick: l'ultima modifica
+        # avvenuta su un tick precedente
+        active = np.searchsorted(change_rows, rows, side="left") - 1
+        states = [self.positions_at_open.get(i)] + [c[1] for c in changes]
+        position_type = np.zeros(n + 1, dtype=np.int64)
+        avg_price = np.zeros(n + 1)
+        units = np.zeros(n + 1)
+        for k, ps in enumerate(states):
+            if ps is None:
+                continue
+            mask = active == k - 1
+            position_type[mask] = 1 if ps[0] == "long" else -1
+            avg_price[mask] = ps[1]
+            units[mask] = ps[2]
+
+        qh_bid, qh_ask = qh_rates[i]
+        er = np.maximum(eval_row, 0)
+        cur = np.where(position_type > 0, q_bid[er, i], q_ask[er, i])
+        qh_close = np.where(position_type > 0, qh_bid[er], qh_ask[er])
+        pips = np.round(position_type * (cur - avg_price), 5)
+        profit = np.where(
+            position_type != 0, np.round(pips * qh_close * units, 5), 0.0
+        )
+        return np.where(eval_row >= 0, profit, self.last_profit[i])
+
+    def _run_day(self, date_str):
+        """
+        Esegue il backtest di un giorno e restituisce il DataFrame della
+        curva di equity, con una riga per tick come nel file backtest.csv.
+        """
+        times, pair_ids, bid, ask = self._load_day_arrays(date_str)
+        q_bid, q_ask = self._last_known_quotes(pair_ids, bid, ask)
+        complete = ~np.isnan(q_bid).any(axis=1)
+        qh_rates = [
+            self._quote_home_rates(q_bid, q_ask, i)
+            for i in range(len(self.pairs))
+        ]
+
+        self.positions_at_open = dict(self.positions)
+        signals = self._calculate_signals(pair_ids, bid)
+        pnl, changes = self._resolve_fills(
+            signals, complete, q_bid, q_ask, qh_rates
+        )
+
+        # Ogni riga riporta il saldo prima degli eseguiti del proprio tick
+        realised = np.cumsum(pnl)
+        curve = {
+            "Balance": self.balance + np.concatenate([[0.0], realised[:-1]])
+        }
+        for i, p in enumerate(self.pairs):
+            profit = self._unrealised_profit(
+                i, pair_ids, changes[i], q_bid, q_ask, qh_rates
+            )
+            curve[p] = profit[:-1]
+            self.last_profit[i] = profit[-1]
+
+        self.balance += realised[-1]
+        self.last_bid = q_bid[-1].copy()
+        self.last_ask = q_ask[-1].copy()
+        return pd.DataFrame(
+            curve, index=pd.DatetimeIndex(times, name="Timestamp")
+        )
+
+    def simulate_trading(self):
+        """
+        Esegue il backtest su tutte le date disponibili e restituisce
+        il DataFrame della curva di equity.
+        """
+        print("Running Vectorised Backtest...")
+        self._reset_state()
+        curves = [self._run_day(d) for d in self.file_dates]
+        self.curve = pd.concat(curves)
+        print("Vectorised Backtest complete.")
+        return self.curve
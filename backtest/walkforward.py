@@ -0,0 +1,213 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from data.store import TickStore, convert_csv_dir
+from .sweep import (
+    curve_statistics, _run_event_driven, _run_vectorised,
+    _simulate_event_driven, _simulate_vectorised
+)
+
+
+def walk_forward_windows(
+    file_dates, train_days, test_days, step_days=None, anchored=False
+):
+    """
+    Divide l'elenco ordinato dei giorni in finestre successive di
+    training e di test. Restituisce un elenco di tuple
+    (giorni di training, giorni di test).
+
+    Parametri:
+    file_dates - L'elenco ordinato dei giorni "YYYYMMDD".
+    train_days - Il numero di giorni di ogni finestra di training.
+    test_days - Il numero di giorni di ogni finestra di test, che segue
+        immediatamente la finestra di training.
+    step_days - Lo spostamento tra due finestre, per default test_days.
+        Non può essere minore di test_days, altrimenti le finestre di
+        test si sovrappongono.
+    anchored - Se True le finestre di training partono tutte dal primo
+        giorno e crescono ad ogni passo.
+    """
+    step_days = step_days or test_days
+    if train_days < 1 or test_days < 1:
+        raise ValueError("train_days and test_days must be positive")
+    if step_days < test_days:
+        raise ValueError("step_days must not be smaller than test_days")
+    windows = []
+    start = 0
+    while start + train_days + test_days <= len(file_dates):
+        train_start = 0 if anchored else start
+        train = file_dates[train_start:start + train_days]
+        test = file_dates[start + train_days:start + train_days + test_days]
+        windows.append((list(train), list(test)))
+        start += step_days
+    return windows
+
+
+def stitch_curves(curves, equity):
+    """
+    Unisce le curve di equity delle finestre di test in un'unica curva
+    out-of-sample. Ogni finestra parte dal capitale iniziale, per cui i
+    suoi rendimenti sono composti a partire dal valore finale della
+    finestra precedente. Restituisce una Series "Equity".
+    """
+    equity = float(equity)
+    level = equity
+    parts = []
+    for curve in curves:
+        if not len(curve):
+            continue
+        total = curve.sum(axis=1) * (level / equity)
+        parts.append(total)
+        level = float(total.iloc[-1])
+    if not parts:
+        return pd.Series([], dtype=float, name="Equity")
+    stitched = pd.concat(parts)
+    stitched.name = "Equity"
+    return stitched
+
+
+class WalkForward(object):
+    """
+    Ottimizzazione walk-forward della MovingAverageCrossStrategy: i
+    giorni dei dati sono divisi in finestre successive di training e di
+    test (vedi walk_forward_windows); su ogni finestra di training si
+    sceglie la combinazione di parametri con il valore migliore di
+    metric, che viene poi valutata sulla finestra di test successiva.
+    Le curve di equity delle finestre di test sono unite in un'unica
+    curva out-of-sample. Ogni finestra di test parte senza posizioni
+    aperte e con le medie mobili vuote.
+
+    I backtest di tutte le finestre di training e di tutti i parametri
+    sono distribuiti insieme su più processi, come in ParameterSweep,
+    seguiti dai backtest delle finestre di test. I tick sono letti
+    dall'archivio binario mappato in memoria: se è indicato solo
+    csv_dir i CSV sono convertiti una sola volta in un archivio
+    temporaneo, per cui le finestre sovrapposte condividono i dati
+    decodificati (tramite la page cache) senza rileggere i CSV.
+    """
+
+    def __init__(
+        self, pairs, params_list, train_days, test_days, step_days=None,
+        csv_dir=None, store_dir=None, equity=Decimal("100000.00"),
+        engine="vectorised", metric="sharpe", anchored=False,
+        max_workers=None
+    ):
+        """
+        Parametri:
+        pairs - L'elenco delle coppie di valute da negoziare.
+        params_list - Elenco dei dizionari dei parametri della
+            strategia, es. prodotto da grid_parameters.
+        train_days, test_days, step_days, anchored - Le finestre, vedi
+            walk_forward_windows.
+        csv_dir, store_dir - Directory dei dati CSV o dell'archivio
+            binario (preferito).
+        equity - Il capitale iniziale di ogni backtest.
+        engine - "vectorised" (VectorisedBacktest) o "event" (Backtest).
+        metric - La statistica di curve_statistics da massimizzare
+            sulle finestre di training.
+        max_workers - Il numero di processi, per default i core disponibili.
+        """
+        if csv_dir is None and store_dir is None:
+            raise ValueError("Either csv_dir or store_dir must be provided")
+        if engine not in ("vectorised", "event"):
+            raise ValueError("Unknown backtest engine: %s" % engine)
+        self.pairs = pairs
+        self.params_list = list(params_list)
+        self.train_days = train_days
+        self.test_days = test_days
+        self.step_days = step_days
+        self.anchored = anchored
+        self.csv_dir = csv_dir
+        self.store_dir = store_dir
+        self.equity = equity
+        self.engine = engine
+        self.metric = metric
+        self.max_workers = max_workers or os.cpu_count()
+        self.curve = None
+
+    def run(self):
+        """
+        Esegue il walk-forward e restituisce un DataFrame con una riga
+        per finestra: i giorni di training e di test, i parametri
+        scelti, il valore in-sample di metric e le statistiche
+        out-of-sample. La curva out-of-sample è in self.curve.
+        """
+        tmp_dir = None
+        store_dir = self.store_dir
+        if store_dir is None:
+            tmp_dir = tempfile.mkdtemp(prefix="walkforward-")
+            convert_csv_dir(self.csv_dir, tmp_dir)
+            store_dir = tmp_dir
+        try:
+            return self._run(store_dir)
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir)
+
+    def _run(self, store_dir):
+        windows = walk_forward_windows(
+            TickStore(store_dir).list_file_dates(), self.train_days,
+            self.test_days, self.step_days, self.anchored
+        )
+        if self.engine == "vectorised":
+            run_one, simulate_one = _run_vectorised, _simulate_vectorised
+        else:
+            run_one, simulate_one = _run_event_driven, _simulate_event_driven
+        tasks = [
+            (train, params) for train, _ in windows
+            for params in self.params_list
+        ]
+        n = len(tasks)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            train_stats = list(executor.map(
+                run_one, [self.pairs] * n, [None] * n, [store_dir] * n,
+                [self.equity] * n, [t[1] for t in tasks],
+                [t[0] for t in tasks]
+            ))
+            best = []
+            for w in range(len(windows)):
+                scores = train_stats[
+                    w * len(self.params_list):(w + 1) * len(self.params_list)
+                ]
+                i = max(
+                    range(len(scores)),
+                    key=lambda k: _score(scores[k][self.metric])
+                )
+                best.append((self.params_list[i], scores[i][self.metric]))
+            m = len(windows)
+            results = list(executor.map(
+                simulate_one, [self.pairs] * m, [None] * m, [store_dir] * m,
+                [self.equity] * m, [b[0] for b in best],
+                [test for _, test in windows]
+            ))
+        rows = []
+        for (train, test), (params, score), (curve, trade_pnls) in zip(
+            windows, best, results
+        ):
+            row = {
+                "train_start": train[0], "train_end": train[-1],
+                "test_start": test[0], "test_end": test[-1],
+                "train_%s" % self.metric: score
+            }
+            row.update(params)
+            row.update(curve_statistics(curve, trade_pnls, self.equity))
+            rows.append(row)
+        self.curve = stitch_curves([r[0] for r in results], self.equity)
+        return pd.DataFrame(rows)
+
+
+def _score(value):
+    """
+    Le statistiche non definite (NaN, ad esempio lo Sharpe di una
+    finestra senza rendimenti) non sono mai preferite.
+    """
+    return value if value == value else float("-inf")
@@ -1,2 +1,4 @@
+from .pricebook import *
+from .price import *
 from .steaming import *
-from .price import *
\ No newline at end of file
+from .bars import *
\ No newline at end of file
@@ -0,0 +1,206 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import datetime
+import re
+
+import numpy as np
+import pandas as pd
+
+from event import BarEvent
+from fixedpoint import PRICE_SCALE
+
+from .store import VOLUME_SCALE
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+TIMEFRAME_UNITS = {"s": 1, "min": 60, "h": 3600, "d": 86400}
+
+
+def parse_timeframe(timeframe):
+    """
+    Converte un timeframe come "30s", "1min", "4h" o "1d" (oppure un
+    numero di secondi) in un timedelta.
+    """
+    if isinstance(timeframe, datetime.timedelta):
+        return timeframe
+    if isinstance(timeframe, int):
+        return datetime.timedelta(seconds=timeframe)
+    match = re.match(r"^(\d+)(s|min|h|d)$", timeframe)
+    if match is None:
+        raise ValueError("Unknown timeframe: %s" % timeframe)
+    return datetime.timedelta(
+        seconds=int(match.group(1)) * TIMEFRAME_UNITS[match.group(2)]
+    )
+
+
+class _BarState(object):
+    __slots__ = (
+        "start", "end", "open", "high", "low", "close", "volume", "ticks"
+    )
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+
+
+class BarAggregator(object):
+    """
+    Costruisce in streaming le barre OHLCV di più timeframe dai tick e
+    inserisce un BarEvent nella coda alla chiusura di ogni barra, cioè
+    all'arrivo del primo tick della barra successiva. Le barre sono
+    allineate all'epoch (es. le barre di 1 ora iniziano all'ora
+    esatta) e i periodi senza tick non producono barre.
+
+    Per ogni tick e timeframe il costo è un confronto con la fine della
+    barra corrente e l'aggiornamento di massimo, minimo e chiusura.
+
+    Parametri:
+    events_queue - La coda degli eventi a cui inviare le barre.
+    timeframes - L'elenco dei timeframe, es. ["1min", "1h"].
+    instruments - Gli strumenti da aggregare (None per tutti).
+    price - "bid" o "ask", il prezzo usato per le barre; il volume è
+        quello dello stesso lato, se disponibile.
+    """
+
+    def __init__(self, events_queue, timeframes, instruments=None, price="bid"):
+        if price not in ("bid", "ask"):
+            raise ValueError("price must be 'bid' or 'ask'")
+        self.events_queue = events_queue
+        self.timeframes = [(tf, parse_timeframe(tf)) for tf in timeframes]
+        self.instruments = set(instruments) if instruments is not None else None
+        self.price = price
+        self.states = {}
+        self.bars = 0
+
+    def _states(self, instrument):
+        try:
+            return self.states[instrument]
+        except KeyError:
+            states = self.states[instrument] = [
+                (tf, delta, _BarState()) for tf, delta in self.timeframes
+            ]
+            return states
+
+    def _emit(self, instrument, timeframe, state):
+        self.bars += 1
+        self.events_queue.put(BarEvent(
+            instrument, timeframe, state.start, state.open, state.high,
+            state.low, state.close, state.volume, state.ticks
+        ))
+
+    def on_tick(self, event):
+        instrument = event.instrument
+        if self.instruments is not None and instrument not in self.instruments:
+            return
+        if self.price == "bid":
+            price, volume = event.bid, event.bid_volume
+        else:
+            price, volume = event.ask, event.ask_volume
+        volume = volume or 0
+        time = event.time
+        for timeframe, delta, state in self._states(instrument):
+            if state.end is not None and time < state.end:
+                if price > state.high:
+                    state.high = price
+                elif price < state.low:
+                    state.low = price
+                state.close = price
+                state.volume += volume
+                state.ticks += 1
+                continue
+            if state.end is not None:
+                self._emit(instrument, timeframe, state)
+            state.start = EPOCH + ((time - EPOCH) // delta) * delta
+            state.end = state.start + delta
+            state.open = state.high = state.low = state.close = price
+            state.volume = volume
+            state.ticks = 1
+
+    def flush(self):
+        """
+        Emette le barre ancora aperte (ad esempio alla fine dei dati).
+        """
+        for instrument, states in self.states.items():
+            for timeframe, delta, state in states:
+                if state.end is not None:
+                    self._emit(instrument, timeframe, state)
+                    state.end = None
+
+    def get_state(self):
+        """
+        Restituisce le barre aperte e il numero di barre emesse, per i
+        checkpoint del backtest.
+        """
+        return {"states": self.states, "bars": self.bars}
+
+    def set_state(self, state):
+        self.states = state["states"]
+        self.bars = state["bars"]
+
+
+def resample_ticks(times, prices, timeframe, volumes=None):
+    """
+    Versione batch dell'aggregazione: raggruppa tick ordinati nel
+    tempo (times in datetime64[ns] o int64 ns dall'epoch) in barre
+    allineate all'epoch. Restituisce un dizionario di array time, open,
+    high, low, close, volume e ticks, uno per barra con almeno un tick.
+    """
+    delta = np.int64(parse_timeframe(timeframe).total_seconds() * 10**9)
+    times = np.asarray(times).astype("datetime64[ns]").view(np.int64)
+    prices = np.asarray(prices)
+    bucket = times // delta
+    starts = np.flatnonzero(np.diff(bucket, prepend=bucket[:1] - 1)) \
+        if len(bucket) else np.empty(0, dtype=np.int64)
+    ends = np.append(starts[1:], len(bucket)) - 1
+    if volumes is None:
+        volumes = np.zeros(len(prices))
+    return {
+        "time": (bucket[starts] * delta).view("datetime64[ns]"),
+        "open": prices[starts],
+        "high": np.maximum.reduceat(prices, starts) if len(starts) else prices[:0],
+        "low": np.minimum.reduceat(prices, starts) if len(starts) else prices[:0],
+        "close": prices[ends],
+        "volume": np.add.reduceat(np.asarray(volumes), starts) if len(starts)
+            else np.asarray(volumes)[:0],
+        "ticks": ends - starts + 1,
+    }
+
+
+def load_bars(store, pair, timeframe, dates=None, price="bid", fixed_point=False):
+    """
+    Calcola le barre di una coppia direttamente dall'archivio binario
+    (data.store.TickStore), giorno per giorno. Il timeframe deve
+    dividere esattamente il giorno, in modo che nessuna barra sia a
+    cavallo di due file. Restituisce un DataFrame con indice Time e
+    colonne Open, High, Low, Close, Volume e Ticks; i prezzi sono in
+    pipette se fixed_point=True.
+    """
+    seconds = parse_timeframe(timeframe).total_seconds()
+    if 86400 % seconds != 0:
+        raise ValueError(
+            "Batch bars need a timeframe that divides one day: %s" % timeframe
+        )
+    column = "Bid" if price == "bid" else "Ask"
+    frames = []
+    for date_str in (dates if dates is not None else store.list_file_dates()):
+        day = store.load_day(pair, date_str)
+        if not len(day["Time"]):
+            continue
+        bars = resample_ticks(
+            day["Time"], np.asarray(day[column]), timeframe,
+            np.asarray(day[column + "Volume"]) / VOLUME_SCALE
+        )
+        frames.append(pd.DataFrame({
+            "Open": bars["open"], "High": bars["high"],
+            "Low": bars["low"], "Close": bars["close"],
+            "Volume": bars["volume"], "Ticks": bars["ticks"]
+        }, index=pd.DatetimeIndex(bars["time"], name="Time")))
+    if not frames:
+        return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume", "Ticks"])
+    bars = pd.concat(frames)
+    if not fixed_point:
+        for c in ("Open", "High", "Low", "Close"):
+            bars[c] = bars[c] / PRICE_SCALE
+    return bars
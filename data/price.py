@@ -7,12 +7,43 @@ from abc import ABCMeta, abstractmethod
 from decimal import Decimal, getcontext, ROUND_HALF_DOWN
 
 import os, os.path, re, time, datetime
+import heapq
+import itertools
+from operator import itemgetter
 import pandas as pd
 import numpy as np
 
 from settings import settings
 
 from event import TickEvent
+from fixedpoint import PRICE_DECIMALS, pipettes_from_str
+
+from .pricebook import PriceBook, invert_price
+from .store import TickStore, STORE_HEADER, VOLUME_SCALE
+
+
+PIPETTE = Decimal("0.00001")
+
+
+def parse_tick_time(time_str):
+    """
+    Converte un timestamp dei file CSV di tick, nella forma
+    "dd.mm.YYYY HH:MM:SS.fff", in un oggetto datetime. Il parsing
+    a posizioni fisse è molto più veloce di strptime.
+    """
+    fraction = time_str[20:]
+    return datetime.datetime(
+        int(time_str[6:10]), int(time_str[3:5]), int(time_str[0:2]),
+        int(time_str[11:13]), int(time_str[14:16]), int(time_str[17:19]),
+        int(fraction.ljust(6, "0")[:6]) if fraction else 0
+    )
+
+
+def decimal_price(price_str):
+    """
+    Converte un prezzo testuale in Decimal arrotondato al pipette.
+    """
+    return Decimal(price_str).quantize(PIPETTE, ROUND_HALF_DOWN)
 
 
 class PriceHandler(object):
@@ -30,6 +61,10 @@ class PriceHandler(object):
 
     __metaclass__ = ABCMeta
 
+    # Se True i prezzi (tick, dizionario dei prezzi) sono interi in
+    # pipette invece che Decimal, vedi il modulo fixedpoint
+    fixed_point = False
+
     @abstractmethod
     def stream_next_tick(self):
         """
@@ -40,36 +75,23 @@ class PriceHandler(object):
 
     def _set_up_prices_dict(self):
         """
+        Crea il PriceBook delle coppie negoziate. Le coppie invertite
+        e i tassi incrociati sono calcolati solo quando richiesti.
+        Il PriceBook si usa anche come dizionario dei prezzi:
+        prices[pair]["bid"].
         """
-        prices_dict = dict(
-            (k, v) for k,v in [
-                (p, {"bid": None, "ask": None, "time": None}) for p in self.pairs
-            ]
-        )
-        inv_prices_dict = dict(
-            (k, v) for k,v in [
-                (
-                    "%s%s" % (p[3:], p[:3]),
-                    {"bid": None, "ask": None, "time": None}
-                ) for p in self.pairs
-            ]
-        )
-        prices_dict.update(inv_prices_dict)
-        return prices_dict
-
+        return PriceBook(self.pairs, self.fixed_point)
 
     def invert_prices(self, pair, bid, ask):
         """
+        Inverte il bid/ask di una coppia, ad esempio da "EURUSD" a
+        "USDEUR", arrotondando al pipette.
         """
-        getcontext().rounding = ROUND_HALF_DOWN
         inv_pair = "%s%s" % (pair[3:], pair[:3])
-        inv_bid = (Decimal("1.0")/bid).quantize(
-            Decimal("0.00001")
+        return (
+            inv_pair, invert_price(bid, self.fixed_point),
+            invert_price(ask, self.fixed_point)
         )
-        inv_ask = (Decimal("1.0")/ask).quantize(
-            Decimal("0.00001")
-        )
-        return inv_pair, inv_bid, inv_ask
 
 
 class HistoricCSVPriceHandler(PriceHandler):
@@ -79,7 +101,10 @@ class HistoricCSVPriceHandler(PriceHandler):
     alla coda degli eventi.
     """
 
-    def __init__(self, pairs, events_queue, csv_dir):
+    def __init__(
+        self, pairs, events_queue, csv_dir, fixed_point=False,
+        reuse_ticks=False, dates=None
+    ):
         """
         Inizializza il gestore dati storici richiedendo
         la posizione dei file CSV e un elenco di simboli.
@@ -92,22 +117,36 @@ class HistoricCSVPriceHandler(PriceHandler):
         pairs - L'elenco delle coppie di valute da ottenere.
         events_queue - La coda degli eventi a cui inviare i tick.
         csv_dir: percorso di directory assoluto per i file CSV.
+        fixed_point - Se True i prezzi sono interi in pipette.
+        reuse_ticks - Se True si riusa sempre lo stesso TickEvent, senza
+            allocare un oggetto per ogni tick. È sicuro nel backtest, dove
+            tutti gli eventi di un tick sono elaborati prima del tick
+            successivo, purché nessun gestore conservi l'evento.
+        dates - Se indicato, si usano solo i giorni "YYYYMMDD"
+            dell'elenco (es. una finestra di un walk-forward).
         """
         self.pairs = pairs
+        self.fixed_point = fixed_point
+        self.tick = TickEvent(None, None, None, None) if reuse_ticks else None
         self.events_queue = events_queue
         self.csv_dir = csv_dir
         self.prices = self._set_up_prices_dict()
-        self.pair_frames = {}
         self.file_dates = self._list_all_file_dates()
+        if dates is not None:
+            dates = set(dates)
+            self.file_dates = [d for d in self.file_dates if d in dates]
+            if not self.file_dates:
+                raise ValueError("No data for the requested dates")
         self.continue_backtest = True
         self.cur_date_idx = 0
+        self.cur_row = 0
         self.cur_date_pairs = self._open_convert_csv_files_for_day(
             self.file_dates[self.cur_date_idx]
         )
 
 
     def _list_all_csv_files(self):
-        files = os.listdir(settings.CSV_DATA_DIR)
+        files = os.listdir(self.csv_dir)
         pattern = re.compile("[A-Z]{6}_\d{8}.csv")
         matching_files = [f for f in files if pattern.search(f)]
         matching_files.sort()
@@ -124,20 +163,39 @@ class HistoricCSVPriceHandler(PriceHandler):
         de_dup_csv.sort()
         return de_dup_csv
 
-    def _open_convert_csv_files_for_day(self, date_str):
+    def _pair_reader(self, pair, date_str):
+        """
+        Legge in modo lazy il file CSV di una coppia per un giorno,
+        restituendo una tupla (time, pair, bid, ask, bid_volume,
+        ask_volume) per ogni riga. Il file è già in ordine temporale,
+        per cui in memoria resta solamente la riga corrente.
         """
-        Apre i file CSV dalla directory su disco, converte i dati
-        in un DataFrame di pandas con un dizionario di coppie.
+        pair_path = os.path.join(self.csv_dir, '%s_%s.csv' % (pair, date_str))
+        parse_price = pipettes_from_str if self.fixed_point else decimal_price
+        with open(pair_path) as csv_file:
+            next(csv_file)  # Intestazione
+            for line in csv_file:
+                time_str, ask, bid, ask_volume, bid_volume = \
+                    line.rstrip().split(",")
+                yield (
+                    parse_tick_time(time_str), pair,
+                    parse_price(bid), parse_price(ask),
+                    float(bid_volume), float(ask_volume)
+                )
+
+    def _open_convert_csv_files_for_day(self, date_str, start=0):
         """
-        for p in self.pairs:
-            pair_path = os.path.join(self.csv_dir, '%s_%s.csv' % (p, date_str))
-            self.pair_frames[p] = pd.io.parsers.read_csv(
-                pair_path, header=True, index_col=0,
-                parse_dates=True, dayfirst=True,
-                names=("Time", "Ask", "Bid", "AskVolume", "BidVolume")
-            )
-            self.pair_frames[p]["Pair"] = p
-        return pd.concat(self.pair_frames.values()).sort().iterrows()
+        Apre i file CSV di tutte le coppie per il giorno richiesto ed
+        esegue un merge k-way basato su heap dei lettori di ciascuna
+        coppia. I tick sono prodotti in modo lazy e in ordine temporale;
+        a parità di timestamp si mantiene l'ordine delle coppie.
+        Con start > 0 si saltano i primi start tick del giorno.
+        """
+        readers = [self._pair_reader(p, date_str) for p in self.pairs]
+        merged = heapq.merge(*readers, key=itemgetter(0))
+        if start:
+            return itertools.islice(merged, start, None)
+        return merged
 
     def _update_csv_for_day(self):
         try:
@@ -147,8 +205,60 @@ class HistoricCSVPriceHandler(PriceHandler):
         else:
             self.cur_date_pairs = self._open_convert_csv_files_for_day(dt)
             self.cur_date_idx += 1
+            self.cur_row = 0
             return True
 
+    def get_state(self):
+        """
+        Restituisce la posizione corrente nei dati (giorno e numero di
+        tick già letti del giorno) e gli ultimi prezzi, per i
+        checkpoint del backtest.
+        """
+        return {
+            "date": self.file_dates[self.cur_date_idx],
+            "row": self.cur_row,
+            "continue_backtest": self.continue_backtest,
+            "prices": self.prices.get_state()
+        }
+
+    def set_state(self, state):
+        """
+        Riprende la lettura dei dati dalla posizione di un checkpoint.
+        """
+        self.open_day(state["date"], state["row"])
+        self.continue_backtest = state["continue_backtest"]
+        self.prices.set_state(state["prices"])
+
+    def open_day(self, date_str, start=0):
+        """
+        Posiziona la lettura dei dati sul tick start del giorno
+        date_str. I file sono letti solo alla richiesta dei tick.
+        """
+        self.cur_date_idx = self.file_dates.index(date_str)
+        self.cur_row = start
+        self.cur_date_pairs = self._open_convert_csv_files_for_day(
+            date_str, start
+        )
+
+    def day_files(self, date_str):
+        """
+        Restituisce i percorsi dei file di dati di un giorno.
+        """
+        return [
+            os.path.join(self.csv_dir, "%s_%s.csv" % (p, date_str))
+            for p in self.pairs
+        ]
+
+    def count_ticks(self, data):
+        """
+        Restituisce il numero di tick del contenuto (bytes) di un file
+        di dati, senza eseguirne il parsing.
+        """
+        lines = data.count(b"\n")
+        if data and not data.endswith(b"\n"):
+            lines += 1
+        return max(lines - 1, 0)  # Intestazione
+
 
     def stream_next_tick(self):
         """
@@ -162,35 +272,100 @@ class HistoricCSVPriceHandler(PriceHandler):
         aggiornare l'attuale bid / ask e l'inverso bid / ask.
         """
         try:
-            index, row = next(self.cur_date_pairs)
+            tick = next(self.cur_date_pairs)
         except StopIteration:
             # Fine dei dati per un giorno
             if self._update_csv_for_day():
-                index, row = next(self.cur_date_pairs)
+                tick = next(self.cur_date_pairs)
             else:  # Fine dei dati
                 self.continue_backtest = False
                 return
+        self.cur_row += 1
+        index, pair, bid, ask, bid_volume, ask_volume = tick
 
-        getcontext().rounding = ROUND_HALF_DOWN
-        pair = row["Pair"]
-        bid = Decimal(str(row["Bid"])).quantize(
-            Decimal("0.00001")
+        # Aggiorna i prezzi della coppia negoziata: i prezzi della
+        # coppia invertita sono calcolati dal PriceBook se richiesti
+        self.prices.update(
+            self.prices.ids[pair], bid, ask, index, bid_volume, ask_volume
         )
-        ask = Decimal(str(row["Ask"])).quantize(
-            Decimal("0.00001")
+
+        # Create the tick event for the queue
+        tev = self.tick
+        if tev is None:
+            tev = TickEvent(pair, index, bid, ask, bid_volume, ask_volume)
+        else:
+            tev.instrument = pair
+            tev.time = index
+            tev.bid = bid
+            tev.ask = ask
+            tev.bid_volume = bid_volume
+            tev.ask_volume = ask_volume
+        self.events_queue.put(tev)
+
+
+class HistoricBinaryPriceHandler(HistoricCSVPriceHandler):
+    """
+    HistoricBinaryPriceHandler trasmette in streaming i tick letti
+    dall'archivio binario colonnare (vedi data.store) invece che dai
+    file CSV. Le colonne sono mappate in memoria, per cui l'avvio di un
+    backtest non richiede il parsing delle date e le esecuzioni
+    successive sugli stessi dati sfruttano la page cache.
+    """
+
+    def __init__(
+        self, pairs, events_queue, store_dir, fixed_point=False,
+        reuse_ticks=False, dates=None
+    ):
+        """
+        Parametri:
+        pairs - L'elenco delle coppie di valute da ottenere.
+        events_queue - La coda degli eventi a cui inviare i tick.
+        store_dir - Percorso della directory dell'archivio binario,
+            creato con data.store.convert_csv_dir.
+        fixed_point - Se True i prezzi sono passati direttamente come
+            interi in pipette, senza alcuna conversione.
+        reuse_ticks - Se True si riusa lo stesso TickEvent (vedi
+            HistoricCSVPriceHandler).
+        dates - Se indicato, si usano solo i giorni dell'elenco.
+        """
+        self.store = TickStore(store_dir)
+        HistoricCSVPriceHandler.__init__(
+            self, pairs, events_queue, store_dir, fixed_point, reuse_ticks,
+            dates
         )
 
-        # Create decimalised prices for traded pair
-        self.prices[pair]["bid"] = bid
-        self.prices[pair]["ask"] = ask
-        self.prices[pair]["time"] = index
+    def _list_all_file_dates(self):
+        return self.store.list_file_dates()
 
-        # Create decimalised prices for inverted pair
-        inv_pair, inv_bid, inv_ask = self.invert_prices(pair, bid, ask)
-        self.prices[inv_pair]["bid"] = inv_bid
-        self.prices[inv_pair]["ask"] = inv_ask
-        self.prices[inv_pair]["time"] = index
+    def day_files(self, date_str):
+        return [self.store.day_path(p, date_str) for p in self.pairs]
 
-        # Create the tick event for the queue
-        tev = TickEvent(pair, index, bid, ask)
-        self.events_queue.put(tev)
\ No newline at end of file
+    def count_ticks(self, data):
+        return STORE_HEADER.unpack(data[:STORE_HEADER.size])[1]
+
+    def _open_convert_csv_files_for_day(self, date_str, start=0, chunk_size=4096):
+        """
+        Ordina in blocco i tick del giorno di tutte le coppie in un
+        TickBatch (struct-of-arrays) e li restituisce come le tuple del
+        gestore CSV, a partire dalla riga start e a blocchi di
+        chunk_size righe: solo il blocco corrente viene convertito in
+        oggetti Python.
+        """
+        batch = self.store.load_batch(self.pairs, date_str)
+        pairs = batch.pairs
+        fixed_point = self.fixed_point
+        for start in range(start, len(batch), chunk_size):
+            stop = start + chunk_size
+            for t, pair_id, ask, bid, ask_volume, bid_volume in zip(
+                batch.time[start:stop].view("datetime64[ns]")
+                .astype("datetime64[us]").tolist(),
+                batch.pair[start:stop].tolist(),
+                batch.ask[start:stop].tolist(),
+                batch.bid[start:stop].tolist(),
+                (batch.ask_volume[start:stop] / VOLUME_SCALE).tolist(),
+                (batch.bid_volume[start:stop] / VOLUME_SCALE).tolist()
+            ):
+                if not fixed_point:
+                    bid = Decimal(bid).scaleb(-PRICE_DECIMALS)
+                    ask = Decimal(ask).scaleb(-PRICE_DECIMALS)
+                yield t, pairs[pair_id], bid, ask, bid_volume, ask_volume
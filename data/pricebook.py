@@ -0,0 +1,322 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from collections import deque
+from decimal import Decimal, ROUND_HALF_DOWN
+
+from fixedpoint import (
+    PRICE_SCALE, div_round_half_down, invert_pipettes
+)
+
+
+PIPETTE = Decimal("0.00001")
+
+
+def invert_price(price, fixed_point=False):
+    """
+    Restituisce 1/prezzo arrotondato al pipette, in pipette intere
+    oppure come Decimal.
+    """
+    if fixed_point:
+        return invert_pipettes(price)
+    return (Decimal("1.0") / price).quantize(PIPETTE, ROUND_HALF_DOWN)
+
+
+def multiply_prices(price_a, price_b, fixed_point=False):
+    """
+    Restituisce il prodotto di due prezzi arrotondato al pipette,
+    usato per comporre i tassi incrociati (es. GBPUSD * USDJPY).
+    """
+    if fixed_point:
+        return div_round_half_down(price_a * price_b, PRICE_SCALE)
+    return (price_a * price_b).quantize(PIPETTE, ROUND_HALF_DOWN)
+
+
+class PriceBook(object):
+    """
+    PriceBook conserva gli ultimi prezzi delle coppie negoziate in
+    array contigui (bid, ask, time) indicizzati da un id intero per
+    coppia. Una maschera di bit registra le coppie per cui sono
+    disponibili sia il bid che l'ask, per cui la verifica che tutti i
+    prezzi siano presenti è O(1).
+
+    Le coppie non negoziate (le coppie invertite, come "USDEUR" per
+    "EURUSD", e i tassi incrociati come GBPJPY da GBPUSD e USDJPY) sono
+    derivate: il percorso viene trovato una sola volta sul grafo delle
+    valute e il prezzo viene calcolato solo quando richiesto, con una
+    cache valida fino al tick successivo.
+
+    Come nei gestori dei prezzi, il bid invertito è 1/bid e l'ask
+    invertito è 1/ask; i tassi incrociati moltiplicano i bid e gli ask
+    delle singole tratte.
+
+    Per compatibilità il PriceBook si comporta anche come il vecchio
+    dizionario dei prezzi: prices["EURUSD"]["bid"] restituisce (e, per
+    le coppie negoziate, permette di assegnare) il bid della coppia.
+    """
+
+    def __init__(self, pairs, fixed_point=False):
+        """
+        Parametri:
+        pairs - L'elenco delle coppie negoziate. Le coppie invertite
+            sono registrate subito come coppie derivate.
+        fixed_point - Se True i prezzi sono interi in pipette.
+        """
+        self.fixed_point = fixed_point
+        self.one = PRICE_SCALE if fixed_point else Decimal("1.00000")
+        self.names = list(pairs)
+        self.ids = dict((p, i) for i, p in enumerate(self.names))
+        self.n_direct = len(self.names)
+        self.bid = [None] * self.n_direct
+        self.ask = [None] * self.n_direct
+        self.time = [None] * self.n_direct
+        self.bid_volume = [None] * self.n_direct
+        self.ask_volume = [None] * self.n_direct
+        self.complete_mask = 0
+        self.full_mask = (1 << self.n_direct) - 1
+        self.version = 0
+
+        # Grafo delle valute: ogni coppia negoziata AB è un arco A -> B
+        # e un arco invertito B -> A
+        self.graph = {}
+        for i, p in enumerate(self.names):
+            self.graph.setdefault(p[:3], []).append((p[3:], i, False))
+            self.graph.setdefault(p[3:], []).append((p[:3], i, True))
+
+        # Coppie derivate, con id a partire da n_direct
+        self.routes = []
+        self._cache = []
+        self._cache_version = []
+        for p in pairs:
+            self.pair_id("%s%s" % (p[3:], p[:3]))
+
+    def _find_route(self, pair):
+        """
+        Ricerca in ampiezza del percorso più breve tra la valuta base
+        e la valuta quotata. Restituisce la lista delle tratte
+        (id coppia negoziata, invertita) oppure None.
+        """
+        start, end = pair[:3], pair[3:]
+        if start == end:
+            return []
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            currency = queue.popleft()
+            for other, leg_id, inverted in self.graph.get(currency, []):
+                if other in previous:
+                    continue
+                previous[other] = (currency, leg_id, inverted)
+                if other == end:
+                    route = []
+                    while previous[other] is not None:
+                        other, leg_id, inverted = previous[other]
+                        route.append((leg_id, inverted))
+                    route.reverse()
+                    return route
+                queue.append(other)
+        return None
+
+    def pair_id(self, pair):
+        """
+        Restituisce l'id intero di una coppia. Una coppia non ancora
+        nota viene registrata come derivata se esiste un percorso sul
+        grafo delle valute, altrimenti si solleva KeyError.
+        """
+        try:
+            return self.ids[pair]
+        except KeyError:
+            route = self._find_route(pair)
+            if route is None:
+                raise KeyError(
+                    "No route to price %s from the traded pairs" % pair
+                )
+            pair_id = len(self.names)
+            self.names.append(pair)
+            self.ids[pair] = pair_id
+            self.routes.append(route)
+            self._cache.append((None, None))
+            self._cache_version.append(-1)
+            return pair_id
+
+    def update(
+        self, pair_id, bid, ask, time, bid_volume=None, ask_volume=None
+    ):
+        """
+        Aggiorna i prezzi di una coppia negoziata tramite il suo id e
+        invalida i prezzi derivati. I volumi disponibili al bid e
+        all'ask sono opzionali (lo stream live non li fornisce).
+        """
+        self.bid[pair_id] = bid
+        self.ask[pair_id] = ask
+        self.time[pair_id] = time
+        self.bid_volume[pair_id] = bid_volume
+        self.ask_volume[pair_id] = ask_volume
+        self.version += 1
+        if bid is not None and ask is not None:
+            self.complete_mask |= 1 << pair_id
+        else:
+            self.complete_mask &= ~(1 << pair_id)
+
+    def get_state(self):
+        """
+        Restituisce gli ultimi prezzi delle coppie negoziate, per i
+        checkpoint del backtest. I prezzi derivati sono ricalcolati.
+        """
+        return {
+            "bid": list(self.bid), "ask": list(self.ask),
+            "time": list(self.time), "bid_volume": list(self.bid_volume),
+            "ask_volume": list(self.ask_volume),
+            "complete_mask": self.complete_mask
+        }
+
+    def set_state(self, state):
+        self.bid = list(state["bid"])
+        self.ask = list(state["ask"])
+        self.time = list(state["time"])
+        self.bid_volume = list(state["bid_volume"])
+        self.ask_volume = list(state["ask_volume"])
+        self.complete_mask = state["complete_mask"]
+        self.version += 1
+
+    def _derive(self, route):
+        bid, ask = self.one, self.one
+        for leg_id, inverted in route:
+            leg_bid, leg_ask = self.bid[leg_id], self.ask[leg_id]
+            if leg_bid is None or leg_ask is None:
+                return None, None
+            if inverted:
+                leg_bid = invert_price(leg_bid, self.fixed_point)
+                leg_ask = invert_price(leg_ask, self.fixed_point)
+            if len(route) == 1:
+                return leg_bid, leg_ask
+            bid = multiply_prices(bid, leg_bid, self.fixed_point)
+            ask = multiply_prices(ask, leg_ask, self.fixed_point)
+        return bid, ask
+
+    def quote(self, pair_id):
+        """
+        Restituisce la tupla (bid, ask) di una coppia, calcolando i
+        prezzi derivati al più una volta per tick.
+        """
+        if pair_id < self.n_direct:
+            return self.bid[pair_id], self.ask[pair_id]
+        k = pair_id - self.n_direct
+        if self._cache_version[k] != self.version:
+            self._cache[k] = self._derive(self.routes[k])
+            self._cache_version[k] = self.version
+        return self._cache[k]
+
+    def quote_time(self, pair_id):
+        """
+        Restituisce il timestamp di una coppia; per le coppie derivate
+        è il più recente tra quelli delle tratte.
+        """
+        if pair_id < self.n_direct:
+            return self.time[pair_id]
+        route = self.routes[pair_id - self.n_direct]
+        times = [self.time[leg_id] for leg_id, _ in route]
+        if not times or None in times:
+            return None
+        return max(times)
+
+    def has_prices(self, pair_id):
+        return bool(self.complete_mask & (1 << pair_id))
+
+    def is_complete(self):
+        """
+        True se bid e ask sono disponibili per tutte le coppie
+        negoziate, e quindi anche per tutte le coppie derivate.
+        """
+        return self.complete_mask == self.full_mask
+
+    # Interfaccia compatibile con il dizionario dei prezzi
+
+    def __getitem__(self, pair):
+        return PriceBookEntry(self, self.pair_id(pair))
+
+    def __contains__(self, pair):
+        return pair in self.ids
+
+    def __iter__(self):
+        return iter(list(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return [(p, PriceBookEntry(self, i)) for i, p in enumerate(self.names)]
+
+    def values(self):
+        return [PriceBookEntry(self, i) for i in range(len(self.names))]
+
+    def get(self, pair, default=None):
+        try:
+            return self[pair]
+        except KeyError:
+            return default
+
+
+class PriceBookEntry(object):
+    """
+    Vista di una singola coppia del PriceBook che si comporta come il
+    dizionario {"bid": ..., "ask": ..., "time": ...} usato in precedenza.
+    """
+    __slots__ = ("book", "pair_id")
+
+    fields = ("bid", "ask", "time")
+
+    def __init__(self, book, pair_id):
+        self.book = book
+        self.pair_id = pair_id
+
+    def __getitem__(self, key):
+        if key == "bid":
+            return self.book.quote(self.pair_id)[0]
+        if key == "ask":
+            return self.book.quote(self.pair_id)[1]
+        if key == "time":
+            return self.book.quote_time(self.pair_id)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError(key)
+        book, i = self.book, self.pair_id
+        if i >= book.n_direct:
+            raise KeyError(
+                "%s is derived from the traded pairs and cannot be set" %
+                book.names[i]
+            )
+        values = {"bid": book.bid[i], "ask": book.ask[i], "time": book.time[i]}
+        values[key] = value
+        book.update(
+            i, values["bid"], values["ask"], values["time"],
+            book.bid_volume[i], book.ask_volume[i]
+        )
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def keys(self):
+        return list(self.fields)
+
+    def items(self):
+        return [(k, self[k]) for k in self.fields]
+
+    def get(self, key, default=None):
+        return self[key] if key in self.fields else default
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items()) \
+            if hasattr(other, "items") else NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
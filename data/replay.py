@@ -0,0 +1,177 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import asyncio
+import datetime
+import json
+import queue
+import threading
+
+from .price import HistoricCSVPriceHandler
+
+
+def load_recorded_stream(path):
+    """
+    Legge uno stream registrato (una riga JSON per messaggio, come
+    salvato da StreamingForexPrices con record_path).
+    """
+    with open(path, "rb") as in_file:
+        return [line.rstrip(b"\r\n") for line in in_file if line.strip()]
+
+
+def stream_lines_from_csv(csv_dir, pairs, date_str):
+    """
+    Converte i tick storici CSV di un giorno nelle righe JSON dello
+    stream dei prezzi di OANDA, in ordine temporale.
+    """
+    ticker = HistoricCSVPriceHandler(pairs, queue.Queue(), csv_dir)
+    lines = []
+    for time, pair, bid, ask in (
+        t[:4] for t in ticker._open_convert_csv_files_for_day(date_str)
+    ):
+        lines.append(json.dumps({"tick": {
+            "instrument": "%s_%s" % (pair[:3], pair[3:]),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "bid": float(bid), "ask": float(ask)
+        }}).encode("ascii"))
+    return lines
+
+
+class ReplayStreamServer(object):
+    """
+    Server HTTP locale che sostituisce lo stream dei prezzi di OANDA
+    nei test: riproduce le righe registrate con chunked transfer
+    encoding, inviando un heartbeat ogni heartbeat_interval secondi.
+
+    Con disconnect_after=N la connessione viene chiusa dopo N righe
+    per verificare la riconnessione del client; la connessione
+    successiva riprende dalla riga seguente. Finite le righe il server
+    continua a inviare solo heartbeat, come lo stream reale.
+    """
+
+    def __init__(
+        self, lines, host="127.0.0.1", port=0, interval=0.0,
+        heartbeat_interval=5.0, disconnect_after=None
+    ):
+        """
+        Parametri:
+        lines - Le righe (bytes) da riprodurre.
+        port - Porta in ascolto, 0 per una porta libera.
+        interval - Pausa in secondi tra due righe consecutive.
+        """
+        self.lines = list(lines)
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.heartbeat_interval = heartbeat_interval
+        self.disconnect_after = disconnect_after
+        self.position = 0
+        self.connections = 0
+        self.server = None
+        self.loop = None
+
+    @property
+    def domain(self):
+        return "%s:%s" % (self.host, self.port)
+
+    def _heartbeat(self):
+        return json.dumps({"heartbeat": {
+            "time": datetime.datetime.utcnow().strftime(
+                "%Y-%m-%dT%H:%M:%S.%fZ"
+            )
+        }}).encode("ascii")
+
+    async def _send_line(self, writer, line):
+        data = line + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if not request_line.startswith(b"GET /v1/prices"):
+                writer.write(
+                    b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+                )
+                return
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            loop = asyncio.get_running_loop()
+            last_heartbeat = loop.time()
+            sent = 0
+            while True:
+                if self.position < len(self.lines):
+                    if self.disconnect_after is not None and \
+                            sent >= self.disconnect_after:
+                        return
+                    await self._send_line(writer, self.lines[self.position])
+                    self.position += 1
+                    sent += 1
+                    if self.interval:
+                        await asyncio.sleep(self.interval)
+                else:
+                    await asyncio.sleep(
+                        max(0.0, last_heartbeat + self.heartbeat_interval
+                            - loop.time())
+                    )
+                if loop.time() - last_heartbeat >= self.heartbeat_interval:
+                    await self._send_line(writer, self._heartbeat())
+                    last_heartbeat = loop.time()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self._handle, self.host, self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start_in_thread(self):
+        """
+        Avvia il server in un thread daemon con il proprio event loop
+        e restituisce il dominio "host:porta" da passare al client.
+        """
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.start())
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return self.domain
+
+    async def _shutdown(self):
+        self.server.close()
+        tasks = [
+            t for t in asyncio.all_tasks() if t is not asyncio.current_task()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop.stop()
+
+    def stop(self):
+        """
+        Ferma il server avviato con start_in_thread().
+        """
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
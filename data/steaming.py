@@ -2,91 +2,269 @@
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
-import requests, logging
+import asyncio
 import json
-from decimal import Decimal, getcontext, ROUND_HALF_DOWN
+import logging
+import random
+import ssl
+import threading
+from decimal import Decimal, ROUND_HALF_DOWN
+from urllib.parse import urlencode
 
 from event import TickEvent
-from data import PriceHandler
+from fixedpoint import to_pipettes
+from .price import PriceHandler, PIPETTE
+
+
+class StreamError(Exception):
+    pass
+
+
+class StreamingForexPrices(PriceHandler):
+    """
+    Client asyncio per lo streaming dei prezzi di OANDA.
+
+    Lo stream viene letto a blocchi e diviso in righe in modo
+    incrementale; gli heartbeat sono riconosciuti senza il parsing
+    JSON e un messaggio malformato viene scartato senza chiudere lo
+    stream. Se la connessione cade, o non arrivano dati (nemmeno
+    heartbeat) per heartbeat_timeout secondi, il client si riconnette
+    con un backoff esponenziale.
+
+    Per limitare la memoria sotto carico si può usare come coda degli
+    eventi una event.BoundedTickQueue. Per i test si può puntare il
+    client a un data.replay.ReplayStreamServer locale, con
+    domain="127.0.0.1:porta" e secure=False.
+    """
 
-class StreamingForexPrices(object):
     def __init__(
         self, domain, access_token,
-        account_id, pairs, events_queue
+        account_id, pairs, events_queue, fixed_point=False,
+        secure=True, chunk_size=65536, heartbeat_timeout=20.0,
+        connect_timeout=10.0, min_backoff=1.0, max_backoff=60.0,
+        record_path=None
     ):
+        """
+        Parametri:
+        domain - Host dello stream, eventualmente con ":porta".
+        secure - Se False la connessione non usa TLS (replay locale).
+        chunk_size - Numero massimo di byte letti per volta.
+        heartbeat_timeout - Secondi senza dati dopo cui lo stream è
+            considerato interrotto (OANDA invia un heartbeat ogni 5 s).
+        min_backoff, max_backoff - Attesa iniziale e massima tra i
+            tentativi di riconnessione.
+        record_path - Se indicato, le righe ricevute sono salvate nel
+            file per poterle riprodurre con data.replay.
+        """
         self.domain = domain
         self.access_token = access_token
         self.account_id = account_id
         self.events_queue = events_queue
         self.pairs = pairs
+        self.fixed_point = fixed_point
         self.prices = self._set_up_prices_dict()
         self.logger = logging.getLogger(__name__)
 
-    def invert_prices(self, pair, bid, ask):
+        host, _, port = domain.partition(":")
+        self.host = host
+        self.secure = secure
+        self.port = int(port) if port else (443 if secure else 80)
+        self.chunk_size = chunk_size
+        self.heartbeat_timeout = heartbeat_timeout
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.record_path = record_path
+        self.stop_event = threading.Event()
+
+        self.connections = 0
+        self.ticks = 0
+        self.heartbeats = 0
+        self.malformed = 0
+
+    def stream_next_tick(self):
+        raise NotImplementedError(
+            "Live prices are pushed by stream_to_queue()"
+        )
+
+    def _parse_price(self, value):
+        if self.fixed_point:
+            return to_pipettes(value)
+        return Decimal(str(value)).quantize(PIPETTE, ROUND_HALF_DOWN)
+
+    def _request_path(self):
+        pairs_oanda = ["%s_%s" % (p[:3], p[3:]) for p in self.pairs]
+        return "/v1/prices?" + urlencode({
+            "instruments": ",".join(pairs_oanda),
+            "accountId": self.account_id
+        })
+
+    async def _connect(self):
         """
-        Inverte semplicemente i prexxi per una specifica coppia di valute.
-        Inverte il bid/ask di "EURUSD" nel bid/ask per "USDEUR"
-        e li inserische nel dizionario dei pressi.
+        Apre la connessione, invia la richiesta HTTP e legge gli header
+        della risposta. Restituisce (reader, writer, chunked).
         """
-        getcontext().rounding = ROUND_HALF_DOWN
-        inv_pair = "%s%s" % (pair[3:], pair[:3])
-        inv_bid = (Decimal("1.0") / bid).quantize(
-            Decimal("0.00001")
+        ssl_context = ssl.create_default_context() if self.secure else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context),
+            self.connect_timeout
         )
-        inv_ask = (Decimal("1.0") / ask).quantize(
-            Decimal("0.00001")
-        )
-        return inv_pair, inv_bid, inv_ask
+        try:
+            request = (
+                "GET %s HTTP/1.1\r\n"
+                "Host: %s\r\n"
+                "Authorization: Bearer %s\r\n"
+                "Accept-Encoding: identity\r\n"
+                "Connection: keep-alive\r\n\r\n"
+            ) % (self._request_path(), self.host, self.access_token)
+            writer.write(request.encode("ascii"))
+            await writer.drain()
+            status_line = await asyncio.wait_for(
+                reader.readline(), self.connect_timeout
+            )
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(
+                    reader.readline(), self.connect_timeout
+                )
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+            status = status_line.split()
+            if len(status) < 2 or status[1] != b"200":
+                raise StreamError(
+                    "Stream returned %s" % status_line.decode("latin-1").strip()
+                )
+        except BaseException:
+            writer.close()
+            raise
+        chunked = headers.get("transfer-encoding") == "chunked"
+        return reader, writer, chunked
 
-    def connect_to_stream(self):
-        pairs_oanda = ["%s_%s" % (p[:3], p[3:]) for p in self.pairs]
-        pair_list = ",".join(pairs_oanda)
+    async def _read_lines(self, reader, chunked):
+        """
+        Legge il corpo della risposta a blocchi (decodificando il
+        chunked transfer encoding) e restituisce le righe complete.
+        Ogni lettura deve completarsi entro heartbeat_timeout secondi.
+        """
+        timeout = self.heartbeat_timeout
+        buffer = b""
+        while True:
+            if chunked:
+                size_line = await asyncio.wait_for(reader.readline(), timeout)
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    return
+                data = await asyncio.wait_for(
+                    reader.readexactly(size + 2), timeout
+                )
+                data = data[:-2]
+            else:
+                data = await asyncio.wait_for(
+                    reader.read(self.chunk_size), timeout
+                )
+                if not data:
+                    return
+            buffer += data
+            if b"\n" not in data:
+                continue
+            lines = buffer.split(b"\n")
+            buffer = lines.pop()
+            for line in lines:
+                yield line
+
+    def _handle_line(self, line):
+        """
+        Elabora una riga dello stream: gli heartbeat sono scartati
+        senza parsing JSON, i tick aggiornano il PriceBook e vengono
+        inseriti nella coda degli eventi.
+        """
+        line = line.strip()
+        if not line:
+            return
+        if b'"heartbeat"' in line:
+            self.heartbeats += 1
+            return
+        msg = None
         try:
-            requests.packages.urllib3.disable_warnings()
-            s = requests.Session()
-            url = "https://" + self.domain + "/v1/prices"
-            headers = {'Authorization': 'Bearer ' + self.access_token}
-            params = {'instruments': pair_list, 'accountId': self.account_id}
-            req = requests.Request('GET', url, headers=headers, params=params)
-            pre = req.prepare()
-            resp = s.send(pre, stream=True, verify=False)
-            return resp
-        except Exception as e:
-            s.close()
-            print("Caught exception when connecting to stream\n" + str(e))
-
-
-    def stream_to_queue(self):
-        response = self.connect_to_stream()
-        if response.status_code != 200:
+            msg = json.loads(line)
+            tick = msg["tick"]
+            instrument = tick["instrument"].replace("_", "")
+            pair_id = self.prices.ids[instrument]
+            time = tick["time"]
+            bid = self._parse_price(tick["bid"])
+            ask = self._parse_price(tick["ask"])
+        except (ValueError, KeyError, TypeError, ArithmeticError) as e:
+            if isinstance(msg, dict) and "disconnect" in msg:
+                raise StreamError("Stream disconnected: %s" % msg["disconnect"])
+            self.malformed += 1
+            self.logger.warning("Skipping malformed stream message: %r" % e)
             return
-        for line in response.iter_lines(1):
-            if line:
+        # I prezzi invertiti (EUR_USD -> USD_EUR) sono
+        # calcolati dal PriceBook solo se richiesti
+        self.prices.update(pair_id, bid, ask, time)
+        self.ticks += 1
+        self.events_queue.put(TickEvent(instrument, time, bid, ask))
+
+    async def stream_async(self, max_connections=None):
+        """
+        Ciclo principale dello streaming: si connette, elabora le righe
+        ricevute e si riconnette con un backoff esponenziale (con
+        jitter) fino a quando viene chiamato stop(), oppure dopo
+        max_connections connessioni riuscite.
+        """
+        backoff = self.min_backoff
+        record_file = open(self.record_path, "ab") \
+            if self.record_path is not None else None
+        try:
+            while not self.stop_event.is_set():
                 try:
-                    dline = line.decode('utf-8')
-                    msg = json.loads(dline)
-                except Exception as e:
+                    reader, writer, chunked = await self._connect()
+                except (OSError, asyncio.TimeoutError, StreamError) as e:
                     self.logger.error(
-                        "Caught exception when converting message into json: %s" % str(e)
+                        "Caught exception when connecting to stream: %s" % e
                     )
-                    return
-                if "instrument" in msg or "tick" in msg:
-                    self.logger.debug(msg)
-                    getcontext().rounding = ROUND_HALF_DOWN
-                    instrument = msg["tick"]["instrument"].replace("_", "")
-                    time = msg["tick"]["time"]
-                    bid = Decimal(str(msg["tick"]["bid"])).quantize(
-                        Decimal("0.00001")
-                    )
-                    ask = Decimal(str(msg["tick"]["ask"])).quantize(
-                        Decimal("0.00001")
+                    await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+                self.connections += 1
+                backoff = self.min_backoff
+                self.logger.info("Connected to price stream %s" % self.domain)
+                try:
+                    async for line in self._read_lines(reader, chunked):
+                        if record_file is not None:
+                            record_file.write(line + b"\n")
+                        self._handle_line(line)
+                        if self.stop_event.is_set():
+                            break
+                except asyncio.TimeoutError:
+                    self.logger.warning(
+                        "No data for %s seconds, reconnecting" %
+                        self.heartbeat_timeout
                     )
-                    self.prices[instrument]["bid"] = bid
-                    self.prices[instrument]["ask"] = ask
-                    # Inverte i prezzi (EUR_USD -> USD_EUR)
-                    inv_pair, inv_bid, inv_ask = self.invert_prices(instrument, bid, ask)
-                    self.prices[inv_pair]["bid"] = inv_bid
-                    self.prices[inv_pair]["ask"] = inv_ask
-                    self.prices[inv_pair]["time"] = time
-                    tev = TickEvent(instrument, time, bid, ask)
-                    self.events_queue.put(tev)
\ No newline at end of file
+                except (
+                    OSError, ValueError, StreamError,
+                    asyncio.IncompleteReadError
+                ) as e:
+                    self.logger.warning("Price stream interrupted: %s" % e)
+                finally:
+                    writer.close()
+                if max_connections is not None and \
+                        self.connections >= max_connections:
+                    break
+                if not self.stop_event.is_set():
+                    await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+        finally:
+            if record_file is not None:
+                record_file.close()
+
+    def stream_to_queue(self, max_connections=None):
+        """
+        Esegue lo streaming in un event loop asyncio dedicato, per cui
+        può essere lanciato in un thread separato come in precedenza.
+        """
+        asyncio.run(self.stream_async(max_connections))
+
+    def stop(self):
+        self.stop_event.set()
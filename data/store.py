@@ -0,0 +1,173 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import os, os.path, re
+import struct
+
+import numpy as np
+import pandas as pd
+
+from fixedpoint import PRICE_SCALE
+
+
+# Prezzi in pipette (vedi fixedpoint) e volumi con 4 decimali
+VOLUME_SCALE = 10000
+
+STORE_MAGIC = b"TQTICKS1"
+STORE_HEADER = struct.Struct("<8sQ")
+STORE_COLUMNS = ("Time", "Ask", "Bid", "AskVolume", "BidVolume")
+STORE_EXTENSION = ".tqb"
+
+
+def convert_csv_file(csv_path, store_path):
+    """
+    Converte un file CSV di tick 'PAIR_YYYYMMDD.csv' in un file binario
+    colonnare: un'intestazione con il numero di righe seguita dalle
+    colonne contigue in int64 (timestamp epoch in ns, ask/bid in pipette,
+    volumi in punto fisso).
+
+    Il file viene scritto in modo atomico, quindi un backtest in
+    esecuzione non legge mai un file parziale.
+    """
+    frame = pd.read_csv(
+        csv_path, header=0,
+        names=("Time", "Ask", "Bid", "AskVolume", "BidVolume")
+    )
+    times = pd.to_datetime(
+        frame["Time"], format="%d.%m.%Y %H:%M:%S.%f"
+    ).values.astype("datetime64[ns]").view(np.int64)
+    columns = [
+        times,
+        np.rint(frame["Ask"].values * PRICE_SCALE).astype(np.int64),
+        np.rint(frame["Bid"].values * PRICE_SCALE).astype(np.int64),
+        np.rint(frame["AskVolume"].values * VOLUME_SCALE).astype(np.int64),
+        np.rint(frame["BidVolume"].values * VOLUME_SCALE).astype(np.int64),
+    ]
+    write_store_file(store_path, columns)
+
+
+def write_store_file(store_path, columns):
+    """
+    Scrive in modo atomico un file binario dell'archivio dalle colonne
+    int64 nell'ordine di STORE_COLUMNS.
+    """
+    tmp_path = store_path + ".tmp"
+    with open(tmp_path, "wb") as out_file:
+        out_file.write(STORE_HEADER.pack(STORE_MAGIC, len(columns[0])))
+        for column in columns:
+            out_file.write(np.ascontiguousarray(column, dtype="<i8").tobytes())
+    os.replace(tmp_path, store_path)
+
+
+def convert_csv_dir(csv_dir, store_dir, overwrite=False):
+    """
+    Conversione una tantum di tutti i file CSV di tick di una directory
+    nel formato binario. I file già convertiti e non più vecchi del CSV
+    di origine vengono saltati, a meno di specificare overwrite=True.
+
+    Restituisce l'elenco dei file binari scritti.
+    """
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+    pattern = re.compile("[A-Z]{6}_\d{8}.csv")
+    written = []
+    for f in sorted(os.listdir(csv_dir)):
+        if not pattern.search(f):
+            continue
+        csv_path = os.path.join(csv_dir, f)
+        store_path = os.path.join(store_dir, f[:-4] + STORE_EXTENSION)
+        if not overwrite and os.path.exists(store_path) and \
+                os.path.getmtime(store_path) >= os.path.getmtime(csv_path):
+            continue
+        convert_csv_file(csv_path, store_path)
+        written.append(store_path)
+    return written
+
+
+class TickStore(object):
+    """
+    Accesso in sola lettura all'archivio binario dei tick. Le colonne
+    sono mappate in memoria con np.memmap: l'apertura di un giorno non
+    legge dati dal disco e più backtest sugli stessi file condividono
+    la page cache del sistema operativo.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+    def list_file_dates(self):
+        """
+        Restituisce l'elenco ordinato delle date "YYYYMMDD" presenti.
+        """
+        pattern = re.compile("[A-Z]{6}_\d{8}\%s" % STORE_EXTENSION)
+        files = [f for f in os.listdir(self.store_dir) if pattern.search(f)]
+        return sorted(set([f[7:15] for f in files]))
+
+    def day_path(self, pair, date_str):
+        return os.path.join(
+            self.store_dir, "%s_%s%s" % (pair, date_str, STORE_EXTENSION)
+        )
+
+    def load_day(self, pair, date_str):
+        """
+        Restituisce un dizionario colonna -> array int64 mappato in
+        memoria per la coppia e il giorno richiesti.
+        """
+        path = self.day_path(pair, date_str)
+        with open(path, "rb") as in_file:
+            magic, rows = STORE_HEADER.unpack(in_file.read(STORE_HEADER.size))
+        if magic != STORE_MAGIC:
+            raise ValueError("%s is not a tick store file" % path)
+        if rows == 0:
+            return dict((c, np.empty(0, dtype=np.int64)) for c in STORE_COLUMNS)
+        return dict(
+            (c, np.memmap(
+                path, dtype="<i8", mode="r", shape=(rows,),
+                offset=STORE_HEADER.size + i * rows * 8
+            )) for i, c in enumerate(STORE_COLUMNS)
+        )
+
+    def load_batch(self, pairs, date_str):
+        """
+        Restituisce i tick di tutte le coppie per un giorno come un
+        unico TickBatch in ordine temporale (a parità di timestamp
+        nell'ordine delle coppie, come il merge dei gestori dei prezzi).
+        """
+        days = [self.load_day(pair, date_str) for pair in pairs]
+        times = np.concatenate([day["Time"] for day in days])
+        order = np.argsort(times, kind="stable")
+        pair_ids = np.concatenate([
+            np.full(len(day["Time"]), i, dtype=np.int16)
+            for i, day in enumerate(days)
+        ])
+        columns = dict(
+            (c, np.concatenate([day[c] for day in days])[order])
+            for c in STORE_COLUMNS[1:]
+        )
+        return TickBatch(
+            pairs, times[order], pair_ids[order], columns["Ask"],
+            columns["Bid"], columns["AskVolume"], columns["BidVolume"]
+        )
+
+
+class TickBatch(object):
+    """
+    Tick di più coppie in forma struct-of-arrays: un array int64 per
+    colonna (timestamp in ns, prezzi in pipette, volumi in punto fisso)
+    e l'indice della coppia in pairs per ogni riga. Un giorno di tick
+    occupa poche colonne contigue invece di milioni di oggetti Python.
+    """
+    __slots__ = ("pairs", "time", "pair", "ask", "bid", "ask_volume", "bid_volume")
+
+    def __init__(self, pairs, time, pair, ask, bid, ask_volume, bid_volume):
+        self.pairs = list(pairs)
+        self.time = time
+        self.pair = pair
+        self.ask = ask
+        self.bid = bid
+        self.ask_volume = ask_volume
+        self.bid_volume = bid_volume
+
+    def __len__(self):
+        return len(self.time)
@@ -0,0 +1,200 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import datetime
+import os, os.path
+
+import numpy as np
+
+from fixedpoint import PRICE_SCALE
+
+from .store import STORE_EXTENSION, VOLUME_SCALE, write_store_file
+
+
+DAY_NS = 86400 * 10**9
+
+
+def trading_days(start, days):
+    """
+    Restituisce i primi "days" giorni feriali a partire da start
+    (un datetime.date) come lista di datetime.date.
+    """
+    dates = []
+    d = start
+    while len(dates) < days:
+        if d.weekday() < 5:
+            dates.append(d)
+        d += datetime.timedelta(days=1)
+    return dates
+
+
+class SyntheticTickGenerator(object):
+    """
+    Generatore vettoriale di tick sintetici per più coppie di valute.
+
+    I prezzi medi seguono random walk correlate: le coppie hanno tempi
+    dei tick indipendenti (intervalli con media mean_interval_ms e
+    deviazione standard sigma_interval_ms) e i moti browniani
+    indipendenti sono campionati sull'unione di tutti i tempi del
+    giorno, poi combinati con la decomposizione di Cholesky della
+    matrice di correlazione. Bid e ask hanno uno spread fisso e i
+    volumi sono uniformi tra 1 e 3, come nello script originale.
+
+    Tutti i valori sono generati in blocco per ogni giorno con NumPy,
+    già nel formato dell'archivio binario (timestamp in ns, prezzi in
+    pipette, volumi in punto fisso).
+
+    Parametri:
+    pairs - L'elenco delle coppie, es. ["GBPUSD", "EURUSD"].
+    start_prices - Dizionario coppia -> prezzo iniziale (default 1.5).
+    correlation - Correlazione tra tutte le coppie (un numero) oppure
+        matrice di correlazione completa.
+    volatility - Deviazione standard giornaliera del prezzo medio.
+    spread - Spread fisso tra bid e ask.
+    mean_interval_ms, sigma_interval_ms - Media e deviazione standard
+        dell'intervallo tra due tick della stessa coppia.
+    seed - Il seme del generatore casuale.
+    """
+
+    def __init__(
+        self, pairs, start_prices=None, correlation=0.0, volatility=0.005,
+        spread=0.0002, mean_interval_ms=1400, sigma_interval_ms=100, seed=42
+    ):
+        self.pairs = list(pairs)
+        n = len(self.pairs)
+        start_prices = start_prices or {}
+        self.mid = np.array([
+            float(start_prices.get(p, 1.5)) for p in self.pairs
+        ]) * PRICE_SCALE
+        corr = np.asarray(correlation, dtype=float)
+        if corr.ndim == 0:
+            corr = np.full((n, n), float(correlation))
+            np.fill_diagonal(corr, 1.0)
+        self.cholesky = np.linalg.cholesky(corr)
+        self.volatility = volatility * PRICE_SCALE
+        self.half_spread = int(round(spread * PRICE_SCALE / 2.0))
+        self.mean_interval = mean_interval_ms * 10**6
+        self.sigma_interval = sigma_interval_ms * 10**6
+        self.random = np.random.default_rng(seed)
+
+    def _tick_times(self):
+        """
+        Offset in ns dall'inizio del giorno dei tick di una coppia,
+        arrotondati al millisecondo come nei file CSV.
+        """
+        n = int(DAY_NS / self.mean_interval * 1.1) + 100
+        while True:
+            dt = np.abs(self.random.normal(
+                self.mean_interval, self.sigma_interval, n
+            ))
+            times = np.cumsum(dt).astype(np.int64) // 10**6 * 10**6
+            if times[-1] >= DAY_NS:
+                return times[:np.searchsorted(times, DAY_NS)]
+            n *= 2
+
+    def generate_day(self, date):
+        """
+        Genera i tick di tutte le coppie per un giorno. Restituisce un
+        dizionario coppia -> colonne nell'ordine di STORE_COLUMNS
+        (Time, Ask, Bid, AskVolume, BidVolume) come array int64.
+        """
+        day_start = np.datetime64(date, "ns").astype(np.int64)
+        times = [self._tick_times() for _ in self.pairs]
+        offsets = np.cumsum([0] + [len(t) for t in times])
+        union = np.concatenate(times)
+        order = np.argsort(union, kind="stable")
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        dt = np.diff(union[order], prepend=0) / float(DAY_NS)
+
+        # Moti browniani indipendenti sull'unione dei tempi, poi
+        # correlati con la matrice di Cholesky
+        shocks = self.random.standard_normal((len(self.pairs), len(union)))
+        walks = np.cumsum(shocks * np.sqrt(dt), axis=1)
+        walks = self.cholesky.dot(walks) * self.volatility
+
+        day = {}
+        for i, pair in enumerate(self.pairs):
+            walk = walks[i, position[offsets[i]:offsets[i + 1]]]
+            mid = np.rint(self.mid[i] + walk).astype(np.int64)
+            n = len(mid)
+            day[pair] = [
+                day_start + times[i],
+                mid + self.half_spread,
+                mid - self.half_spread,
+                np.rint(self.random.uniform(1.0, 3.0, n) * 100).astype(np.int64)
+                * (VOLUME_SCALE // 100),
+                np.rint(self.random.uniform(1.0, 3.0, n) * 100).astype(np.int64)
+                * (VOLUME_SCALE // 100),
+            ]
+            if n:
+                self.mid[i] = mid[-1]
+        return day
+
+    def write(self, dates, csv_dir=None, store_dir=None):
+        """
+        Genera i giorni indicati e li scrive come file CSV
+        'PAIR_YYYYMMDD.csv' in csv_dir e/o come file binari in
+        store_dir. Restituisce il numero totale di tick generati.
+        """
+        ticks = 0
+        for dirname in (csv_dir, store_dir):
+            if dirname is not None and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+        for date in dates:
+            date_str = date.strftime("%Y%m%d")
+            for pair, columns in self.generate_day(date).items():
+                ticks += len(columns[0])
+                name = "%s_%s" % (pair, date_str)
+                if csv_dir is not None:
+                    write_csv_file(
+                        os.path.join(csv_dir, name + ".csv"), columns
+                    )
+                if store_dir is not None:
+                    write_store_file(
+                        os.path.join(store_dir, name + STORE_EXTENSION), columns
+                    )
+        return ticks
+
+
+def _fixed_str(values, scale, decimals):
+    """
+    Formatta in blocco interi in punto fisso come numeri decimali.
+    """
+    integer = (values // scale).astype(str)
+    fraction = np.char.zfill((values % scale).astype(str), decimals)
+    return np.char.add(np.char.add(integer, "."), fraction)
+
+
+def write_csv_file(csv_path, columns):
+    """
+    Scrive un file CSV di tick (Time,Ask,Bid,AskVolume,BidVolume) dalle
+    colonne in formato binario, nello stesso formato dei file di dati
+    ("dd.mm.YYYY HH:MM:SS.fff", prezzi con 5 decimali).
+    """
+    times, ask, bid, ask_volume, bid_volume = columns
+    stamps = np.datetime_as_string(
+        times.view("datetime64[ns]").astype("datetime64[ms]")
+    ).astype("<U23")
+    if len(stamps):
+        # "YYYY-mm-ddTHH:MM:SS.fff" -> "dd.mm.YYYY HH:MM:SS.fff"
+        iso = stamps[0]
+        prefix = "%s.%s.%s " % (iso[8:10], iso[5:7], iso[0:4])
+        clock = stamps.view("<U1").reshape(len(stamps), -1)[:, 11:]
+        stamps = np.char.add(prefix, clock.copy().view("<U12").ravel())
+    volume_decimals = len(str(VOLUME_SCALE)) - 1
+    rows = np.char.add(stamps, ",")
+    for values, scale, decimals in (
+        (ask, PRICE_SCALE, 5), (bid, PRICE_SCALE, 5),
+        (ask_volume, VOLUME_SCALE, volume_decimals),
+        (bid_volume, VOLUME_SCALE, volume_decimals)
+    ):
+        rows = np.char.add(rows, _fixed_str(values, scale, decimals))
+        if values is not bid_volume:
+            rows = np.char.add(rows, ",")
+    with open(csv_path, "w") as out_file:
+        out_file.write("Time,Ask,Bid,AskVolume,BidVolume\n")
+        if len(rows):
+            out_file.write("\n".join(rows.tolist()))
+            out_file.write("\n")
@@ -1 +1,2 @@
-from .events import *
\ No newline at end of file
+from .events import *
+from .queues import *
\ No newline at end of file
@@ -0,0 +1,238 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import queue
+import time
+
+from performance.latency import LatencyHistogram
+
+from .events import EVENT_KINDS, EVENT_ORDER, EVENT_SIGNAL, EVENT_TICK, EVENT_TYPES
+
+
+class EventDispatcher(object):
+    """
+    Smista gli eventi della coda ai componenti registrati tramite una
+    tabella tipo evento -> gestori, invece di una catena di if/elif.
+
+    Nel trading live il dispatcher resta bloccato sulla coda fino
+    all'arrivo di un evento (con un timeout), senza cicli di polling
+    né pause fisse; nel backtest elabora in blocco tutti gli eventi
+    generati da un tick prima di richiedere il tick successivo.
+
+    Vengono misurate le latenze tick -> segnale, segnale -> ordine e
+    tick -> ordine: il tempo tra l'inizio dell'elaborazione di un tick
+    (o di un segnale) e l'evento che ne deriva.
+    """
+
+    def __init__(self, events, handlers=None, instrumentation=None):
+        """
+        Parametri:
+        events - La coda degli eventi.
+        handlers - Dizionario opzionale tipo evento -> elenco di
+            funzioni, es. {"TICK": [strategy.calculate_signals]}.
+        instrumentation - Oggetto Instrumentation opzionale (vedi
+            performance.instrumentation) per misurare il tempo di
+            ogni gestore e la profondità della coda. Senza di esso il
+            dispatch misura solo le latenze tick -> segnale -> ordine.
+        """
+        self.events = events
+        self.handlers = {}
+        # Tabella dei gestori indicizzata dal tag intero (event.kind)
+        self.table = [[] for _ in EVENT_TYPES]
+        self.instrumentation = instrumentation
+        for event_type, funcs in (handlers or {}).items():
+            for func in funcs:
+                self.register(event_type, func)
+        self.tick_to_signal = LatencyHistogram("tick_to_signal")
+        self.signal_to_order = LatencyHistogram("signal_to_order")
+        self.tick_to_order = LatencyHistogram("tick_to_order")
+        self.last_tick_start = None
+        self.last_signal_start = None
+        self.dispatched = 0
+        if instrumentation is not None:
+            self.dispatch = self._dispatch_instrumented
+
+    def register(self, event_type, handler):
+        """
+        Aggiunge un gestore per un tipo di evento. I gestori dello
+        stesso tipo sono chiamati nell'ordine di registrazione.
+        """
+        handlers = self.handlers.setdefault(event_type, [])
+        handlers.append(handler)
+        if event_type in EVENT_KINDS:
+            self.table[EVENT_KINDS[event_type]] = handlers
+
+    def dispatch(self, event):
+        """
+        Inoltra un singolo evento ai gestori del suo tipo.
+        """
+        kind = event.kind
+        if kind == EVENT_TICK:
+            self.last_tick_start = time.perf_counter()
+        else:
+            self._record_latency(kind)
+        for handler in self._handlers_for(event, kind):
+            handler(event)
+        self.dispatched += 1
+
+    def _handlers_for(self, event, kind):
+        if kind is None:
+            # Eventi senza tag intero, definiti fuori da event.events
+            return self.handlers.get(event.type, ())
+        return self.table[kind]
+
+    def _record_latency(self, kind):
+        if kind == EVENT_SIGNAL:
+            now = self.last_signal_start = time.perf_counter()
+            if self.last_tick_start is not None:
+                self.tick_to_signal.record(now - self.last_tick_start)
+        elif kind == EVENT_ORDER:
+            now = time.perf_counter()
+            if self.last_tick_start is not None:
+                self.tick_to_order.record(now - self.last_tick_start)
+            if self.last_signal_start is not None:
+                self.signal_to_order.record(now - self.last_signal_start)
+
+    def _dispatch_instrumented(self, event):
+        """
+        Come dispatch, misurando anche il tempo di ogni gestore e
+        campionando la profondità della coda.
+        """
+        inst = self.instrumentation
+        event_type = event.type
+        kind = event.kind
+        if kind == EVENT_TICK:
+            self.last_tick_start = time.perf_counter()
+        else:
+            self._record_latency(kind)
+        perf_counter = time.perf_counter
+        for handler in self._handlers_for(event, kind):
+            stats = inst.handler_stats(event_type, handler)
+            start = perf_counter()
+            handler(event)
+            stats.add(perf_counter() - start)
+        inst.events[event_type] = inst.events.get(event_type, 0) + 1
+        self.dispatched += 1
+        if self.dispatched % inst.queue_sample_every == 0:
+            inst.queue_depth.record(self.events.qsize())
+
+    def report(self):
+        """
+        Restituisce il report della strumentazione con gli istogrammi
+        di latenza; senza strumentazione solo gli istogrammi. Può
+        essere chiamato da un altro thread durante il trading live.
+        """
+        latencies = (self.tick_to_signal, self.signal_to_order, self.tick_to_order)
+        if self.instrumentation is None:
+            return {
+                "events": {"total": self.dispatched},
+                "latency": dict((h.name, h.summary()) for h in latencies)
+            }
+        return self.instrumentation.report(latencies)
+
+    def drain(self):
+        """
+        Elabora tutti gli eventi presenti nella coda, inclusi quelli
+        generati durante l'elaborazione, e restituisce il loro numero.
+        """
+        events = self.events
+        dispatch = self.dispatch
+        n = 0
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                return n
+            if event is not None:
+                dispatch(event)
+                n += 1
+
+    def run_backtest(self, ticker, max_iters=None, heartbeat=0.0):
+        """
+        Ciclo del backtest: richiede un tick al gestore dei prezzi ed
+        elabora in blocco gli eventi che ne derivano, fino alla fine
+        dei dati o a max_iters tick. Restituisce il numero di tick
+        elaborati.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.start()
+        try:
+            iters = 0
+            while ticker.continue_backtest and \
+                    (max_iters is None or iters < max_iters):
+                ticker.stream_next_tick()
+                self.drain()
+                if heartbeat:
+                    time.sleep(heartbeat)
+                iters += 1
+        finally:
+            if self.instrumentation is not None:
+                self.instrumentation.stop()
+        return iters
+
+    def run_live(self, timeout=1.0, stop_event=None):
+        """
+        Ciclo del trading live: resta in attesa di un evento per al più
+        timeout secondi, poi elabora tutti gli eventi disponibili.
+        Termina quando stop_event (un threading.Event) viene impostato.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.start()
+        try:
+            while stop_event is None or not stop_event.is_set():
+                try:
+                    event = self.events.get(True, timeout)
+                except queue.Empty:
+                    continue
+                if event is not None:
+                    self.dispatch(event)
+                self.drain()
+        finally:
+            if self.instrumentation is not None:
+                self.instrumentation.stop()
+
+
+class EventRouter(object):
+    """
+    Instrada gli eventi di un tipo (tick o barre) ai soli gestori
+    sottoscritti al loro strumento e, per le barre, al loro timeframe.
+    L'elenco dei gestori di ogni chiave (strumento, timeframe) viene
+    calcolato una sola volta, per cui l'instradamento di un evento è
+    una ricerca in un dizionario.
+    """
+
+    def __init__(self):
+        self.subscriptions = []
+        self.routes = {}
+
+    def subscribe(self, handler, instruments=None, timeframes=None):
+        """
+        Sottoscrive handler agli eventi degli strumenti e dei timeframe
+        indicati (None per tutti).
+        """
+        self.subscriptions.append((
+            handler,
+            frozenset(instruments) if instruments is not None else None,
+            frozenset(timeframes) if timeframes is not None else None
+        ))
+        self.routes = {}
+
+    def handlers(self, instrument, timeframe=None):
+        key = (instrument, timeframe)
+        try:
+            return self.routes[key]
+        except KeyError:
+            handlers = self.routes[key] = [
+                handler for handler, instruments, timeframes
+                in self.subscriptions
+                if (instruments is None or instrument in instruments) and
+                (timeframes is None or timeframe in timeframes)
+            ]
+            return handlers
+
+    def route(self, event):
+        for handler in self.handlers(
+            event.instrument, getattr(event, "timeframe", None)
+        ):
+            handler(event)
@@ -2,17 +2,46 @@
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
+# Tag interi dei tipi di evento, usati dal dispatcher per indicizzare
+# la tabella dei gestori; EVENT_TYPES[kind] è il nome del tipo
+EVENT_TICK, EVENT_BAR, EVENT_SIGNAL, EVENT_ORDER, EVENT_FILL = range(5)
+EVENT_TYPES = ("TICK", "BAR", "SIGNAL", "ORDER", "FILL")
+EVENT_KINDS = dict((name, kind) for kind, name in enumerate(EVENT_TYPES))
+
+
 class Event(object):
-    pass
+    """
+    Classe base degli eventi. Il tipo è un attributo di classe, sia
+    come stringa (type, es. 'TICK') che come intero (kind), e gli
+    eventi usano __slots__: nessun __dict__ per istanza e meno memoria
+    per ognuno dei milioni di eventi creati in un backtest.
+    """
+    __slots__ = ()
+    type = None
+    kind = None
 
 
 class TickEvent(Event):
-    def __init__(self, instrument, time, bid, ask):
-        self.type = 'TICK'
+    """
+    Tick di uno strumento. Nel replay storico il gestore dei prezzi
+    può riusare la stessa istanza per ogni tick (reuse_ticks=True),
+    per cui i gestori non devono conservare riferimenti all'evento.
+    """
+    __slots__ = (
+        "instrument", "time", "bid", "ask", "bid_volume", "ask_volume"
+    )
+    type = 'TICK'
+    kind = EVENT_TICK
+
+    def __init__(
+        self, instrument, time, bid, ask, bid_volume=None, ask_volume=None
+    ):
         self.instrument = instrument
         self.time = time
         self.bid = bid
         self.ask = ask
+        self.bid_volume = bid_volume
+        self.ask_volume = ask_volume
 
     def __str__(self):
         return "Type: %s, Instrument: %s, Time: %s, Bid: %s, Ask: %s" % (
@@ -25,12 +54,35 @@ class TickEvent(Event):
 
 
 class SignalEvent(Event):
-    def __init__(self, instrument, order_type, side, time):
-        self.type = 'SIGNAL'
+    __slots__ = (
+        "instrument", "order_type", "side", "time", "price",
+        "take_profit", "stop_loss", "strategy_id"
+    )
+    type = 'SIGNAL'
+    kind = EVENT_SIGNAL
+
+    def __init__(
+        self, instrument, order_type, side, time,
+        price=None, take_profit=None, stop_loss=None, strategy_id=None
+    ):
+        """
+        order_type può essere "market", "limit" o "stop" (con il
+        livello in price) oppure "cancel" per annullare gli ordini in
+        attesa dello strumento. take_profit e stop_loss sono i livelli
+        di uscita della posizione aperta dal segnale.
+
+        strategy_id identifica la strategia che ha generato il segnale
+        quando più strategie condividono la coda (vedi StrategyHost);
+        è propagato agli ordini e alle esecuzioni.
+        """
         self.instrument = instrument
         self.order_type = order_type
         self.side = side
         self.time = time
+        self.price = price
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+        self.strategy_id = strategy_id
 
     def __str__(self):
         return "Type: %s, Instrument: %s, Order Type: %s, Side: %s" % (
@@ -43,12 +95,31 @@ class SignalEvent(Event):
 
 
 class OrderEvent(Event):
-    def __init__(self, instrument, units, order_type, side):
-        self.type = 'ORDER'
+    __slots__ = (
+        "instrument", "units", "order_type", "side", "price", "strategy_id",
+        "client_id"
+    )
+    type = 'ORDER'
+    kind = EVENT_ORDER
+
+    def __init__(
+        self, instrument, units, order_type, side, price=None,
+        strategy_id=None, client_id=None
+    ):
+        """
+        price è il livello degli ordini "limit" e "stop".
+
+        client_id è l'identificativo assegnato all'ordine da chi lo
+        invia, riportato nei FillEvent: un ordine "cancel" annulla gli
+        ordini non ancora eseguiti con lo stesso client_id.
+        """
         self.instrument = instrument
         self.units = units
         self.order_type = order_type
         self.side = side
+        self.price = price
+        self.strategy_id = strategy_id
+        self.client_id = client_id
 
     def __str__(self):
         return "Type: %s, Instrument: %s, Units: %s, Order Type: %s, Side: %s" % (
@@ -57,4 +128,85 @@ class OrderEvent(Event):
         )
 
     def __repr__(self):
-        return str(self)
\ No newline at end of file
+        return str(self)
+
+
+class FillEvent(Event):
+    """
+    Esecuzione (anche parziale) di un ordine, inviata dal gestore di
+    esecuzione alla coda degli eventi. remaining indica le unità
+    dell'ordine ancora da eseguire.
+
+    Con order_type "cancel" conferma l'annullamento degli ordini con
+    il client_id indicato: units è zero e remaining sono le unità
+    annullate.
+    """
+    __slots__ = (
+        "instrument", "units", "side", "price", "time", "order_type",
+        "order_id", "remaining", "strategy_id", "client_id"
+    )
+    type = 'FILL'
+    kind = EVENT_FILL
+
+    def __init__(
+        self, instrument, units, side, price, time,
+        order_type="market", order_id=None, remaining=0,
+        strategy_id=None, client_id=None
+    ):
+        self.instrument = instrument
+        self.units = units
+        self.side = side
+        self.price = price
+        self.time = time
+        self.order_type = order_type
+        self.order_id = order_id
+        self.remaining = remaining
+        self.strategy_id = strategy_id
+        self.client_id = client_id
+
+    def __str__(self):
+        return "Type: %s, Instrument: %s, Units: %s, Side: %s, Price: %s, Remaining: %s" % (
+            str(self.type), str(self.instrument), str(self.units),
+            str(self.side), str(self.price), str(self.remaining)
+        )
+
+    def __repr__(self):
+        return str(self)
+
+
+class BarEvent(Event):
+    """
+    Barra OHLCV chiusa di uno strumento per un timeframe (es. "1min").
+    time è l'istante di apertura della barra, ticks il numero di tick
+    aggregati.
+    """
+    __slots__ = (
+        "instrument", "timeframe", "time", "open", "high", "low", "close",
+        "volume", "ticks"
+    )
+    type = 'BAR'
+    kind = EVENT_BAR
+
+    def __init__(
+        self, instrument, timeframe, time, open, high, low, close,
+        volume, ticks
+    ):
+        self.instrument = instrument
+        self.timeframe = timeframe
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.ticks = ticks
+
+    def __str__(self):
+        return "Type: %s, Instrument: %s, Timeframe: %s, Time: %s, O: %s, H: %s, L: %s, C: %s, V: %s" % (
+            str(self.type), str(self.instrument), str(self.timeframe),
+            str(self.time), str(self.open), str(self.high), str(self.low),
+            str(self.close), str(self.volume)
+        )
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,167 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from collections import deque
+import queue
+import threading
+
+from .events import EVENT_TICK
+
+
+class BoundedTickQueue(object):
+    """
+    Coda degli eventi thread-safe, compatibile con queue.Queue per
+    put/get, che limita il numero di tick in attesa a maxsize.
+
+    Quando la coda è piena, un nuovo tick sostituisce il tick più
+    vecchio ancora in attesa dello stesso strumento (oppure, se non ce
+    ne sono, il tick più vecchio in assoluto), per cui sotto carico la
+    memoria resta limitata e ogni strumento conserva i prezzi più
+    recenti. Gli eventi diversi dai tick (segnali, ordini) non sono mai
+    scartati e put() non si blocca mai, dato che anche il thread di
+    trading inserisce eventi nella stessa coda.
+
+    Il numero di tick scartati per strumento è disponibile in dropped.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        # Ogni elemento è una lista [seq, event]: un tick scartato
+        # viene marcato con event = None e saltato da get(); quando i
+        # tick scartati superano maxsize sono rimossi da _entries
+        self._entries = deque()
+        self._tombstones = 0
+        self._ticks = {}
+        self._n_ticks = 0
+        self._size = 0
+        self._seq = 0
+        self.dropped = {}
+
+    def qsize(self):
+        with self.mutex:
+            return self._size
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def full(self):
+        with self.mutex:
+            return self._n_ticks >= self.maxsize
+
+    def _drop_oldest_tick(self, instrument):
+        ticks = self._ticks.get(instrument)
+        if not ticks:
+            # Nessun tick dello stesso strumento: si scarta il più
+            # vecchio tra quelli di tutti gli strumenti
+            ticks = min(
+                (t for t in self._ticks.values() if t),
+                key=lambda t: t[0][0]
+            )
+        entry = ticks.popleft()
+        dropped = entry[1].instrument
+        self.dropped[dropped] = self.dropped.get(dropped, 0) + 1
+        entry[1] = None
+        self._n_ticks -= 1
+        self._size -= 1
+        self._tombstones += 1
+        if self._tombstones > self.maxsize:
+            self._entries = deque(e for e in self._entries if e[1] is not None)
+            self._tombstones = 0
+
+    def _put_tick(self, event):
+        """
+        Inserisce un tick, con il lock della coda già acquisito.
+        Restituisce True se la coda cresce di un elemento.
+        """
+        if self._n_ticks >= self.maxsize:
+            self._drop_oldest_tick(event.instrument)
+        entry = [self._seq, event]
+        self._entries.append(entry)
+        self._ticks.setdefault(event.instrument, deque()).append(entry)
+        self._n_ticks += 1
+        return True
+
+    def put(self, event, block=True, timeout=None):
+        """
+        Inserisce un evento senza mai bloccarsi (block e timeout sono
+        accettati solo per compatibilità con queue.Queue).
+        """
+        with self.mutex:
+            self._seq += 1
+            if getattr(event, "kind", None) == EVENT_TICK:
+                if self._put_tick(event):
+                    self._size += 1
+            else:
+                self._entries.append([self._seq, event])
+                self._size += 1
+            self.not_empty.notify()
+
+    def put_nowait(self, event):
+        self.put(event, False)
+
+    def _pop(self):
+        entries = self._entries
+        while True:
+            entry = entries.popleft()
+            event = entry[1]
+            if event is not None:
+                break
+            self._tombstones -= 1
+        if getattr(event, "kind", None) == EVENT_TICK:
+            self._ticks[event.instrument].popleft()
+            self._n_ticks -= 1
+        self._size -= 1
+        return event
+
+    def get(self, block=True, timeout=None):
+        """
+        Estrae il prossimo evento come queue.Queue.get, sollevando
+        queue.Empty se non ci sono eventi entro il timeout.
+        """
+        with self.not_empty:
+            if not block:
+                if not self._size:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self._size:
+                    self.not_empty.wait()
+            elif not self.not_empty.wait_for(lambda: self._size, timeout):
+                raise queue.Empty
+            return self._pop()
+
+    def get_nowait(self):
+        return self.get(False)
+
+
+class ConflatingTickQueue(BoundedTickQueue):
+    """
+    Coda degli eventi che conflaziona i tick per strumento: se nella
+    coda c'è già un tick non ancora elaborato dello stesso strumento,
+    il nuovo tick lo sostituisce mantenendone la posizione. In coda
+    resta quindi al più un tick per strumento, sempre il più recente,
+    e durante i picchi di traffico la strategia lavora sui prezzi
+    aggiornati con memoria limitata.
+
+    Il numero di tick conflazionati per strumento è disponibile in
+    conflated.
+    """
+
+    def __init__(self, maxsize=10000):
+        BoundedTickQueue.__init__(self, maxsize)
+        self.conflated = {}
+
+    def _put_tick(self, event):
+        ticks = self._ticks.get(event.instrument)
+        if ticks:
+            ticks[-1][1] = event
+            self.conflated[event.instrument] = \
+                self.conflated.get(event.instrument, 0) + 1
+            return False
+        return BoundedTickQueue._put_tick(self, event)
+
+    def total_conflated(self):
+        with self.mutex:
+            return sum(self.conflated.values())
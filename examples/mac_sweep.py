@@ -0,0 +1,24 @@
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from backtest.sweep import ParameterSweep, grid_parameters
+from settings import settings
+
+if __name__ == "__main__":
+    # Trading su GBP/USD e EUR/USD
+    pairs = ["GBPUSD", "EURUSD"]
+
+    # Griglia dei parametri per MovingAverageCrossStrategy
+    params_list = grid_parameters({
+        "short_window": [100, 250, 500],
+        "long_window": [1000, 2000, 4000]
+    })
+
+    # Esegue i backtest in parallelo leggendo l'archivio binario
+    # (creato con scripts/convert_csv_to_store.py)
+    sweep = ParameterSweep(
+        pairs, params_list, csv_dir=settings.CSV_DATA_DIR,
+        store_dir=settings.TICK_STORE_DIR, equity=settings.EQUITY
+    )
+    results = sweep.run()
+    print(results.to_string())
@@ -0,0 +1,19 @@
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from backtest.vectorised import VectorisedBacktest
+from settings import settings
+
+if __name__ == "__main__":
+    # Trading su GBP/USD e EUR/USD
+    pairs = ["GBPUSD", "EURUSD"]
+
+    # Crea ed esegue il backtest vettoriale della
+    # MovingAverageCrossStrategy sugli array giornalieri
+    backtest = VectorisedBacktest(
+        pairs, settings.CSV_DATA_DIR,
+        short_window=500, long_window=2000,
+        equity=settings.EQUITY
+    )
+    curve = backtest.simulate_trading()
+    print("Final balance: %0.2f" % backtest.balance)
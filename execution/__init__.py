@@ -1 +1,2 @@
+from .orderbook import *
 from .execution import *
\ No newline at end of file
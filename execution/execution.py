@@ -3,11 +3,28 @@
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
 from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+from decimal import Decimal, ROUND_HALF_DOWN
 import http.client as httplib
+import itertools
+import json
 from urllib.parse import urlencode
 import logging
-import urllib3
-urllib3.disable_warnings()
+import queue
+import ssl
+import threading
+import time
+
+from event import FillEvent
+from fixedpoint import div_round_half_down
+from performance.latency import LatencyHistogram
+
+from .orderbook import PendingOrder, PendingOrderBook
+
+
+PIPETTE = Decimal("0.00001")
 
 class ExecutionHandler(object):
     """
@@ -27,32 +44,347 @@ class ExecutionHandler(object):
 
 class SimulatedExecution(object):
     """
-    Fornisce un ambiente per la gesione di esecuzioni simulate. In realtà
-    questa classe non fa niente - essa riceve semplicemente un ordine da
-    eseguire. Invece, è l'oggetto portafoglio che fornisce la gestione
-    degli eseguiti.
-    Da modificare nella prossima versione
+    Simulatore delle esecuzioni per il backtest, che invia alla coda
+    degli eventi un FillEvent per ogni esecuzione.
+
+    - Latenza: un ordine diventa attivo dopo latency_ticks tick e
+      latency_ms millisecondi (tempo dei tick) dal suo invio.
+    - Slippage: gli acquisti sono eseguiti all'ask e le vendite al bid,
+      peggiorati di spread_slippage volte lo spread più impact_slippage
+      volte lo spread per il rapporto tra le unità eseguite e il volume
+      disponibile (colonne AskVolume/BidVolume, in volume_unit unità).
+    - Esecuzioni parziali: con partial_fills=True ad ogni tick si
+      esegue al più il volume disponibile e il resto dell'ordine resta
+      attivo per i tick successivi.
+    - Ordini limit e stop: sono conservati in un PendingOrderBook
+      indicizzato per prezzo, per cui ad ogni tick si esaminano solo
+      gli ordini il cui livello è stato superato.
+    - Annullamenti: un ordine "cancel", soggetto alla stessa latenza,
+      annulla gli ordini non ancora eseguiti con il suo client_id e lo
+      conferma con un FillEvent di tipo "cancel".
+
+    Senza coda degli eventi (events_queue=None) il simulatore non fa
+    nulla e il Portfolio esegue gli ordini al prezzo corrente, come
+    nelle versioni precedenti.
     """
+
+    def __init__(
+        self, events_queue=None, ticker=None, latency_ticks=0,
+        latency_ms=0, spread_slippage=0.0, impact_slippage=0.0,
+        partial_fills=False, volume_unit=1000000
+    ):
+        self.events_queue = events_queue
+        self.ticker = ticker
+        self.fixed_point = getattr(ticker, "fixed_point", False)
+        self.latency_ticks = latency_ticks
+        self.latency = datetime.timedelta(milliseconds=latency_ms) \
+            if latency_ms else None
+        self.spread_slippage = spread_slippage
+        self.impact_slippage = impact_slippage
+        self.partial_fills = partial_fills
+        self.volume_unit = volume_unit
+        self.pending = PendingOrderBook()
+        self.delayed = deque()
+        self.working = {}
+        self.order_ids = itertools.count(1)
+        self.ticks = 0
+        self.last_time = None
+        self.fills = 0
+
+    def _slippage(self, spread, units, liquidity):
+        fraction = self.spread_slippage
+        if self.impact_slippage and liquidity:
+            fraction += self.impact_slippage * units / liquidity
+        if not fraction:
+            return 0
+        fraction = Decimal(str(fraction))
+        if self.fixed_point:
+            # Stesso arrotondamento ROUND_HALF_DOWN del calcolo Decimal,
+            # in aritmetica intera sulla frazione esatta
+            num, den = fraction.as_integer_ratio()
+            return div_round_half_down(spread * num, den)
+        return (spread * fraction).quantize(PIPETTE, ROUND_HALF_DOWN)
+
+    def _fill(self, order):
+        """
+        Esegue l'ordine, o parte di esso, ai prezzi correnti.
+        Restituisce True se l'ordine è stato eseguito completamente.
+        """
+        book = self.ticker.prices
+        pair_id = book.ids[order.instrument]
+        bid, ask = book.bid[pair_id], book.ask[pair_id]
+        if bid is None or ask is None:
+            return False
+        if order.side == "buy":
+            price, volume = ask, book.ask_volume[pair_id]
+        else:
+            price, volume = bid, book.bid_volume[pair_id]
+        liquidity = volume * self.volume_unit if volume is not None else None
+        units = order.remaining
+        if self.partial_fills and liquidity is not None:
+            units = min(units, int(liquidity))
+            if units <= 0:
+                return False
+        slippage = self._slippage(ask - bid, units, liquidity)
+        if order.side == "buy":
+            price = price + slippage
+            if order.order_type == "limit":
+                price = min(price, order.price)
+        else:
+            price = price - slippage
+            if order.order_type == "limit":
+                price = max(price, order.price)
+        order.remaining -= units
+        self.fills += 1
+        self.events_queue.put(FillEvent(
+            order.instrument, units, order.side, price,
+            book.time[pair_id], order.order_type, order.order_id,
+            order.remaining, order.strategy_id, order.client_id
+        ))
+        return order.remaining == 0
+
+    def _cancel(self, order):
+        """
+        Annulla gli ordini a mercato e limit/stop dello strumento con
+        il client_id dell'ordine "cancel" e invia la conferma con le
+        unità annullate (zero se gli ordini sono già stati eseguiti).
+        """
+        instrument, client_id = order.instrument, order.client_id
+        cancelled = 0
+        if client_id is not None:
+            working = self.working.get(instrument)
+            if working:
+                kept = []
+                for other in working:
+                    if other.client_id == client_id:
+                        cancelled += other.remaining
+                    else:
+                        kept.append(other)
+                self.working[instrument] = kept
+            for other in self.pending.orders(instrument):
+                if other.client_id == client_id and self.pending.cancel(other):
+                    cancelled += other.remaining
+        book = self.ticker.prices
+        self.events_queue.put(FillEvent(
+            instrument, 0, order.side, None,
+            book.time[book.ids[instrument]], "cancel", order.order_id,
+            cancelled, order.strategy_id, client_id
+        ))
+
+    def _activate(self, order):
+        if order.order_type == "cancel":
+            self._cancel(order)
+        elif order.order_type == "market":
+            if not self._fill(order):
+                self.working.setdefault(order.instrument, []).append(order)
+        else:
+            self.pending.add(order)
+            self._check_pending(order.instrument)
+
+    def _check_pending(self, instrument):
+        book = self.ticker.prices
+        pair_id = book.ids[instrument]
+        bid, ask = book.bid[pair_id], book.ask[pair_id]
+        if bid is None or ask is None:
+            return
+        unfilled = []
+        for order in self.pending.pop_triggered(instrument, bid, ask):
+            if not self._fill(order):
+                unfilled.append(order)
+        for order in unfilled:
+            # Il resto di un limit torna nel book, uno stop attivato
+            # prosegue come ordine a mercato
+            if order.order_type == "limit":
+                self.pending.add(order)
+            else:
+                self.working.setdefault(instrument, []).append(order)
+
     def execute_order(self, event):
-        pass
+        if self.events_queue is None:
+            return
+        due_time = None
+        if self.latency is not None and self.last_time is not None:
+            due_time = self.last_time + self.latency
+        order = PendingOrder(
+            next(self.order_ids), event.instrument, event.units,
+            event.side, event.order_type, event.price,
+            self.ticks + self.latency_ticks, due_time
+        )
+        order.strategy_id = event.strategy_id
+        order.client_id = event.client_id
+        if self.latency_ticks or due_time is not None:
+            self.delayed.append(order)
+        else:
+            self._activate(order)
+
+    def on_tick(self, event):
+        """
+        Attiva gli ordini la cui latenza è trascorsa ed esegue gli
+        ordini a mercato e i limit/stop attivati dello strumento del
+        tick. Senza ordini aperti il costo è di pochi confronti.
+        """
+        self.ticks += 1
+        self.last_time = event.time
+        delayed = self.delayed
+        while delayed and delayed[0].due_tick <= self.ticks and (
+            delayed[0].due_time is None or delayed[0].due_time <= event.time
+        ):
+            self._activate(delayed.popleft())
+        instrument = event.instrument
+        working = self.working.get(instrument)
+        if working:
+            self.working[instrument] = [o for o in working if not self._fill(o)]
+        if self.pending.count:
+            self._check_pending(instrument)
+
+    def get_state(self):
+        """
+        Restituisce gli ordini in latenza, a mercato e limit/stop non
+        ancora eseguiti e i contatori, per i checkpoint del backtest.
+        """
+        next_id = next(self.order_ids)
+        self.order_ids = itertools.count(next_id)
+        return {
+            "ticks": self.ticks, "last_time": self.last_time,
+            "delayed": self.delayed, "working": self.working,
+            "pending": self.pending, "next_order_id": next_id,
+            "fills": self.fills
+        }
+
+    def set_state(self, state):
+        self.ticks = state["ticks"]
+        self.last_time = state["last_time"]
+        self.delayed = state["delayed"]
+        self.working = state["working"]
+        self.pending = state["pending"]
+        self.order_ids = itertools.count(state["next_order_id"])
+        self.fills = state["fills"]
+
+
+class HTTPConnectionPool(object):
+    """
+    Pool di connessioni HTTP(S) keep-alive verso un singolo host.
+    Le connessioni inattive sono riutilizzate (LIFO), per cui gli
+    ordini successivi non pagano l'handshake TCP/TLS.
+
+    Se una connessione riutilizzata risulta chiusa dal server prima
+    di ricevere la richiesta, questa viene ripetuta una sola volta su
+    una nuova connessione. Tutti gli altri errori, inclusi i timeout
+    in attesa della risposta, sono sollevati: il server potrebbe aver
+    già accettato l'ordine, per cui ripeterlo rischierebbe di inviarlo
+    due volte e lo stato dell'ordine va verificato dal chiamante.
+    """
+
+    def __init__(self, domain, size=4, secure=True, timeout=10.0):
+        host, _, port = domain.partition(":")
+        self.host = host
+        self.port = int(port) if port else None
+        self.size = size
+        self.secure = secure
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.ssl_context = ssl.create_default_context() if secure else None
+        self.connections = 0
+        self.reconnects = 0
+
+    def _new_connection(self):
+        self.connections += 1
+        if self.secure:
+            return httplib.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout,
+                context=self.ssl_context
+            )
+        return httplib.HTTPConnection(
+            self.host, self.port, timeout=self.timeout
+        )
+
+    def _release(self, conn):
+        if self.idle.qsize() < self.size:
+            self.idle.put(conn)
+        else:
+            conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Esegue una richiesta e restituisce (status, corpo in bytes).
+        """
+        try:
+            conn, reused = self.idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._new_connection(), False
+        while True:
+            sent = False
+            try:
+                conn.request(method, path, body, headers or {})
+                sent = True
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, httplib.HTTPException) as e:
+                conn.close()
+                # La connessione keep-alive era già chiusa dal server se
+                # l'invio fallisce o se la risposta manca del tutto
+                if sent:
+                    stale = isinstance(e, httplib.RemoteDisconnected)
+                else:
+                    stale = isinstance(
+                        e, (BrokenPipeError, ConnectionResetError)
+                    )
+                if not (reused and stale):
+                    raise
+                self.reconnects += 1
+                conn, reused = self._new_connection(), False
+                continue
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
 
 
 class OANDAExecutionHandler(ExecutionHandler):
-    def __init__(self, domain, access_token, account_id):
+    """
+    Invia gli ordini a OANDA tramite un pool di connessioni keep-alive.
+
+    execute_order non blocca il thread di trading: l'ordine viene
+    inviato da un pool di thread (uno per connessione) e, se è stata
+    indicata una coda degli eventi, l'esecuzione ritorna nella coda
+    come FillEvent. submit_order restituisce anche il Future con il
+    FillEvent (None se l'ordine è stato rifiutato).
+
+    Il tempo di andata e ritorno di ogni ordine è registrato
+    nell'istogramma order_latency.
+    """
+
+    def __init__(
+        self, domain, access_token, account_id, events_queue=None,
+        pool_size=4, secure=True, timeout=10.0
+    ):
         self.domain = domain
         self.access_token = access_token
         self.account_id = account_id
-        self.conn = self.obtain_connection()
+        self.events_queue = events_queue
+        self.pool = HTTPConnectionPool(domain, pool_size, secure, timeout)
+        self.executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="oanda-orders"
+        )
+        self.order_latency = LatencyHistogram("order_round_trip")
+        self.latency_lock = threading.Lock()
+        self.errors = 0
         self.logger = logging.getLogger(__name__)
 
-    def obtain_connection(self):
-        return httplib.HTTPSConnection(self.domain)
-
-    def execute_order(self, event):
+    def _order_request(self, event):
         instrument = "%s_%s" % (event.instrument[:3], event.instrument[3:])
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
-            "Authorization": "Bearer " + self.access_token
+            "Authorization": "Bearer " + self.access_token,
+            "Connection": "keep-alive"
         }
         params = urlencode({
             "instrument" : instrument,
@@ -60,10 +392,80 @@ class OANDAExecutionHandler(ExecutionHandler):
             "type" : event.order_type,
             "side" : event.side
         })
-        self.conn.request(
-            "POST",
-            "/v1/accounts/%s/orders" % str(self.account_id),
-            params, headers
+        path = "/v1/accounts/%s/orders" % str(self.account_id)
+        return path, params, headers
+
+    def _parse_fill(self, event, body):
+        """
+        Crea il FillEvent dalla risposta di OANDA, che contiene il
+        prezzo di esecuzione e la posizione aperta o ridotta.
+        """
+        response = json.loads(body)
+        trade = response.get("tradeOpened") or response.get("tradeReduced")
+        units = trade.get("units", event.units) if trade else event.units
+        order_id = trade.get("id") if trade else None
+        return FillEvent(
+            event.instrument, units, event.side,
+            Decimal(str(response["price"])), response.get("time"),
+            event.order_type, order_id, strategy_id=event.strategy_id
         )
-        response = self.conn.getresponse().read().decode("utf-8").replace("\n","").replace("\t","")
-        self.logger.debug(response)
\ No newline at end of file
+
+    def send_order(self, event):
+        """
+        Invia l'ordine in modo sincrono e restituisce il FillEvent,
+        oppure None se l'ordine non è stato eseguito.
+        """
+        path, params, headers = self._order_request(event)
+        start = time.perf_counter()
+        try:
+            status, body = self.pool.request("POST", path, params, headers)
+        except (OSError, httplib.HTTPException) as e:
+            self.errors += 1
+            if isinstance(e, TimeoutError):
+                # L'ordine può essere stato eseguito: non si ripete
+                self.logger.error(
+                    "No response for order %s, check its status: %s"
+                    % (event, e)
+                )
+            else:
+                self.logger.error("Unable to send order %s: %s" % (event, e))
+            return None
+        with self.latency_lock:
+            self.order_latency.record(time.perf_counter() - start)
+        body = body.decode("utf-8")
+        self.logger.debug(body)
+        if status not in (200, 201):
+            self.errors += 1
+            self.logger.error("Order %s rejected (%s): %s" % (event, status, body))
+            return None
+        try:
+            return self._parse_fill(event, body)
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            self.logger.error("Unable to parse order response: %s" % e)
+            return None
+
+    def _send_and_queue(self, event):
+        fill = self.send_order(event)
+        if fill is not None and self.events_queue is not None:
+            self.events_queue.put(fill)
+        return fill
+
+    def submit_order(self, event):
+        """
+        Invia l'ordine in modo asincrono e restituisce un Future.
+        """
+        return self.executor.submit(self._send_and_queue, event)
+
+    def execute_order(self, event):
+        if event.order_type == "cancel":
+            self.logger.warning("Order cancellation not supported: %s" % event)
+            return
+        self.submit_order(event)
+
+    def close(self):
+        """
+        Attende l'invio degli ordini in corso e chiude le connessioni.
+        """
+        self.executor.shutdown(wait=True)
+        self.pool.close()
\ No newline at end of file
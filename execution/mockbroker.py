@@ -0,0 +1,109 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+
+
+class MockBrokerServer(object):
+    """
+    Server HTTP locale che simula l'endpoint degli ordini di OANDA
+    (POST /v1/accounts/<id>/orders) per i test dell'esecuzione live.
+
+    Ogni ordine è eseguito per intero al prezzo restituito da
+    price_func(instrument, side), dopo una pausa di latency secondi.
+    Con drop_every=N il server chiude bruscamente la connessione
+    keep-alive dopo ogni N risposte, per verificare la riconnessione
+    del client. Gli ordini ricevuti sono conservati in orders.
+    """
+
+    def __init__(
+        self, host="127.0.0.1", port=0, price_func=None,
+        latency=0.0, drop_every=None
+    ):
+        self.price_func = price_func or (lambda instrument, side: 1.0)
+        self.latency = latency
+        self.drop_every = drop_every
+        self.orders = []
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+
+    @property
+    def domain(self):
+        return "%s:%s" % (self.host, self.port)
+
+    def _fill(self, params):
+        instrument = params["instrument"]
+        side = params["side"]
+        with self.lock:
+            self.orders.append(params)
+            order_id = next(self.ids)
+            drop = self.drop_every is not None and \
+                order_id % self.drop_every == 0
+        response = {
+            "instrument": instrument,
+            "time": datetime.datetime.utcnow().strftime(
+                "%Y-%m-%dT%H:%M:%S.%fZ"
+            ),
+            "price": self.price_func(instrument, side),
+            "tradeOpened": {
+                "id": order_id, "units": int(params["units"]), "side": side
+            },
+            "tradesClosed": [],
+            "tradeReduced": {}
+        }
+        return json.dumps(response).encode("utf-8"), drop
+
+    def _handler_class(self):
+        broker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8")
+                if not re.match(r"^/v1/accounts/[^/]+/orders$", self.path):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                params = dict((k, v[0]) for k, v in parse_qs(body).items())
+                if broker.latency:
+                    time.sleep(broker.latency)
+                data, drop = broker._fill(params)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                # Chiusura senza "Connection: close": il client se ne
+                # accorge solo alla richiesta successiva
+                self.close_connection = drop
+
+        return Handler
+
+    def start_in_thread(self):
+        """
+        Avvia il server in un thread daemon e restituisce il dominio
+        "host:porta" da passare a OANDAExecutionHandler.
+        """
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.domain
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
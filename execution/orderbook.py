@@ -0,0 +1,186 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from bisect import bisect_left
+
+
+class PendingOrder(object):
+    """
+    Ordine in attesa di esecuzione nel simulatore. remaining sono le
+    unità non ancora eseguite, price il livello di un ordine limit o
+    stop (None per gli ordini market). take_profit e stop_loss sono
+    i livelli di uscita da applicare alla posizione aperta dall'ordine.
+    client_id è l'identificativo assegnato dal mittente dell'ordine.
+    """
+    __slots__ = (
+        "order_id", "instrument", "units", "side", "order_type",
+        "price", "remaining", "due_tick", "due_time",
+        "take_profit", "stop_loss", "strategy_id", "client_id"
+    )
+
+    def __init__(
+        self, order_id, instrument, units, side, order_type="market",
+        price=None, due_tick=0, due_time=None
+    ):
+        self.order_id = order_id
+        self.instrument = instrument
+        self.units = units
+        self.side = side
+        self.order_type = order_type
+        self.price = price
+        self.remaining = units
+        self.due_tick = due_tick
+        self.due_time = due_time
+        self.take_profit = None
+        self.stop_loss = None
+        self.strategy_id = None
+        self.client_id = None
+
+    def __lt__(self, other):
+        return self.order_id < other.order_id
+
+    def __repr__(self):
+        return "PendingOrder(%s, %s, %s %s %s @ %s, remaining %s)" % (
+            self.order_id, self.instrument, self.order_type, self.side,
+            self.units, self.price, self.remaining
+        )
+
+
+class TriggerIndex(object):
+    """
+    Array ordinato di chiavi (prezzi o prezzi negati) con gli ordini
+    corrispondenti. Un ordine scatta quando la sua chiave è maggiore o
+    uguale alla soglia, per cui gli ordini da eseguire sono sempre in
+    coda all'array: trovarli e rimuoverli costa O(log n + k).
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.orders = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, order):
+        i = bisect_left(self.keys, key)
+        # A parità di chiave si mantiene l'ordine di inserimento
+        while i < len(self.keys) and self.keys[i] == key:
+            i += 1
+        self.keys.insert(i, key)
+        self.orders.insert(i, order)
+
+    def remove(self, key, order):
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.orders[i] is order:
+                del self.keys[i]
+                del self.orders[i]
+                return True
+            i += 1
+        return False
+
+    def __iter__(self):
+        return iter(list(self.orders))
+
+    def pop_triggered(self, threshold):
+        """
+        Rimuove e restituisce gli ordini con chiave >= threshold.
+        """
+        if not self.keys or self.keys[-1] < threshold:
+            return []
+        i = bisect_left(self.keys, threshold)
+        triggered = self.orders[i:]
+        del self.keys[i:]
+        del self.orders[i:]
+        return triggered
+
+
+class PendingOrderBook(object):
+    """
+    Ordini limit e stop in attesa, indicizzati per strumento e per
+    prezzo. Ogni strumento ha quattro indici:
+
+    - buy limit: scatta se ask <= prezzo (chiave prezzo, soglia ask)
+    - sell stop: scatta se bid <= prezzo (chiave prezzo, soglia bid)
+    - sell limit: scatta se bid >= prezzo (chiave -prezzo, soglia -bid)
+    - buy stop: scatta se ask >= prezzo (chiave -prezzo, soglia -ask)
+
+    per cui ad ogni tick si esaminano solo gli ordini il cui livello è
+    stato superato, senza scorrere tutti gli ordini aperti.
+    """
+
+    def __init__(self):
+        self.books = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _indices(self, instrument):
+        try:
+            return self.books[instrument]
+        except KeyError:
+            indices = self.books[instrument] = {
+                ("buy", "limit"): TriggerIndex(),
+                ("sell", "stop"): TriggerIndex(),
+                ("sell", "limit"): TriggerIndex(),
+                ("buy", "stop"): TriggerIndex(),
+            }
+            return indices
+
+    @staticmethod
+    def _key(order):
+        if (order.side, order.order_type) in (("buy", "limit"), ("sell", "stop")):
+            return order.price
+        return -order.price
+
+    def add(self, order):
+        if order.order_type not in ("limit", "stop"):
+            raise ValueError(
+                "Unsupported pending order type: %s" % order.order_type
+            )
+        self._indices(order.instrument)[(order.side, order.order_type)].add(
+            self._key(order), order
+        )
+        self.count += 1
+
+    def cancel(self, order):
+        """
+        Cancella un ordine in attesa. Restituisce False se l'ordine
+        non è (più) nel book.
+        """
+        indices = self.books.get(order.instrument)
+        if indices is None:
+            return False
+        removed = indices[(order.side, order.order_type)].remove(
+            self._key(order), order
+        )
+        if removed:
+            self.count -= 1
+        return removed
+
+    def orders(self, instrument):
+        """
+        Restituisce gli ordini in attesa dello strumento, in ordine di
+        inserimento.
+        """
+        indices = self.books.get(instrument, {})
+        return sorted(o for index in indices.values() for o in index)
+
+    def pop_triggered(self, instrument, bid, ask):
+        """
+        Rimuove e restituisce, in ordine di inserimento, gli ordini
+        dello strumento attivati dai prezzi bid/ask correnti.
+        """
+        indices = self.books.get(instrument)
+        if indices is None or self.count == 0:
+            return []
+        triggered = indices[("buy", "limit")].pop_triggered(ask)
+        triggered += indices[("sell", "stop")].pop_triggered(bid)
+        triggered += indices[("sell", "limit")].pop_triggered(-bid)
+        triggered += indices[("buy", "stop")].pop_triggered(-ask)
+        if triggered:
+            self.count -= len(triggered)
+            triggered.sort()
+        return triggered
@@ -0,0 +1 @@
+from .fixedpoint import *
\ No newline at end of file
@@ -0,0 +1,90 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from decimal import Decimal, ROUND_HALF_DOWN
+
+
+# I prezzi sono rappresentati come interi in pipette (1e-5) e gli
+# importi monetari come interi in micro-unità (1e-6)
+PRICE_DECIMALS = 5
+PRICE_SCALE = 10 ** PRICE_DECIMALS
+MONEY_DECIMALS = 6
+MONEY_SCALE = 10 ** MONEY_DECIMALS
+
+
+def div_round_half_down(num, den):
+    """
+    Divisione tra interi con arrotondamento ROUND_HALF_DOWN, lo stesso
+    usato dai calcoli Decimal: al valore più vicino e, in caso di
+    parità, verso lo zero.
+    """
+    if den < 0:
+        num, den = -num, -den
+    q, r = divmod(abs(num), den)
+    if 2 * r > den:
+        q += 1
+    return q if num >= 0 else -q
+
+
+def to_pipettes(value):
+    """
+    Converte un prezzo (Decimal, stringa o float) in pipette intere.
+    """
+    return int(
+        Decimal(str(value)).scaleb(PRICE_DECIMALS).to_integral_value(
+            ROUND_HALF_DOWN
+        )
+    )
+
+
+def pipettes_from_str(price_str):
+    """
+    Conversione veloce di un prezzo testuale come "1.25035" in pipette,
+    senza creare oggetti Decimal. Le stringhe con più di cinque decimali
+    o in notazione esponenziale passano da to_pipettes.
+    """
+    whole, _, fraction = price_str.strip().partition(".")
+    sign = 1
+    if whole.startswith("-"):
+        sign, whole = -1, whole[1:]
+    if (whole + fraction).isdigit() and len(fraction) <= PRICE_DECIMALS:
+        return sign * (
+            int(whole or "0") * PRICE_SCALE +
+            int(fraction.ljust(PRICE_DECIMALS, "0"))
+        )
+    return to_pipettes(price_str)
+
+
+def from_pipettes(pipettes):
+    """
+    Converte un prezzo in pipette nel corrispondente Decimal.
+    """
+    return Decimal(pipettes).scaleb(-PRICE_DECIMALS)
+
+
+def invert_pipettes(pipettes):
+    """
+    Restituisce l'inverso di un prezzo in pipette, arrotondato al
+    pipette come (Decimal("1.0") / prezzo).quantize(Decimal("0.00001")).
+    """
+    return div_round_half_down(PRICE_SCALE * PRICE_SCALE, pipettes)
+
+
+def to_micros(value):
+    """
+    Converte un importo monetario (Decimal, stringa o float)
+    in micro-unità intere.
+    """
+    return int(
+        Decimal(str(value)).scaleb(MONEY_DECIMALS).to_integral_value(
+            ROUND_HALF_DOWN
+        )
+    )
+
+
+def from_micros(micros):
+    """
+    Converte un importo in micro-unità nel corrispondente Decimal.
+    """
+    return Decimal(micros).scaleb(-MONEY_DECIMALS)
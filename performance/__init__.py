@@ -1 +1,4 @@
-from .performance import *
\ No newline at end of file
+from .performance import *
+from .latency import *
+from .instrumentation import *
+from .montecarlo import *
@@ -0,0 +1,289 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import cProfile
+import json
+import math
+import pstats
+import sys
+import threading
+import time
+
+
+def handler_name(handler):
+    """
+    Nome leggibile di un gestore, es. "Portfolio.update_portfolio".
+    """
+    return getattr(handler, "__qualname__", None) or repr(handler)
+
+
+class HandlerStats(object):
+    """
+    Numero di chiamate e tempo cumulato (in secondi) di un gestore.
+    """
+    __slots__ = ("event_type", "name", "calls", "total", "max")
+
+    def __init__(self, event_type, name):
+        self.event_type = event_type
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        return {
+            "event": self.event_type,
+            "handler": self.name,
+            "calls": self.calls,
+            "total": self.total,
+            "mean": self.total / self.calls if self.calls else math.nan,
+            "max": self.max,
+        }
+
+
+class DepthStats(object):
+    """
+    Statistiche dei campioni della profondità della coda degli eventi.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def record(self, depth):
+        self.count += 1
+        self.total += depth
+        self.last = depth
+        if depth > self.max:
+            self.max = depth
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "samples": self.count,
+            "mean": self.total / self.count if self.count else math.nan,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class SamplingProfiler(object):
+    """
+    Profiler statistico: un thread separato legge ogni interval
+    secondi lo stack del thread profilato e conta le funzioni in
+    esecuzione (self) e quelle presenti nello stack (cumulative). Il
+    costo sul ciclo degli eventi è molto più basso di cProfile.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = 0
+        self.own = {}
+        self.cumulative = {}
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def _key(self, code):
+        return "%s:%s(%s)" % (code.co_filename, code.co_firstlineno, code.co_name)
+
+    def _run(self, thread_id):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            key = self._key(frame.f_code)
+            self.own[key] = self.own.get(key, 0) + 1
+            seen = set()
+            while frame is not None:
+                key = self._key(frame.f_code)
+                if key not in seen:
+                    seen.add(key)
+                    self.cumulative[key] = self.cumulative.get(key, 0) + 1
+                frame = frame.f_back
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run, args=(threading.get_ident(),), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def top(self, n=25):
+        rows = sorted(self.cumulative.items(), key=lambda kv: -kv[1])[:n]
+        return [{
+            "function": key,
+            "own": self.own.get(key, 0) / float(self.samples),
+            "cumulative": count / float(self.samples),
+        } for key, count in rows]
+
+
+class Instrumentation(object):
+    """
+    Strumentazione a basso costo del ciclo degli eventi, da passare
+    all'EventDispatcher: conta le chiamate e il tempo cumulato di ogni
+    gestore, il numero di eventi per tipo e campiona la profondità
+    della coda ogni queue_sample_every eventi.
+
+    profile può essere None, "cprofile" (profilo deterministico
+    completo, più lento) oppure "sampling" (SamplingProfiler); il
+    profilo copre la durata di run_backtest o run_live.
+
+    report() restituisce un dizionario con tutti i dati e può essere
+    chiamato anche da un altro thread durante il trading live.
+    """
+
+    def __init__(
+        self, profile=None, queue_sample_every=64,
+        sampling_interval=0.001, top=25
+    ):
+        if profile not in (None, "cprofile", "sampling"):
+            raise ValueError("Unknown profile mode: %s" % profile)
+        self.profile = profile
+        self.queue_sample_every = queue_sample_every
+        self.top = top
+        self.handlers = {}
+        self.events = {}
+        self.queue_depth = DepthStats("queue_depth")
+        self.profiler = None
+        if profile == "cprofile":
+            self.profiler = cProfile.Profile()
+        elif profile == "sampling":
+            self.profiler = SamplingProfiler(sampling_interval)
+        self.started = None
+        self.elapsed = 0.0
+
+    def handler_stats(self, event_type, handler):
+        key = (event_type, handler)
+        try:
+            return self.handlers[key]
+        except KeyError:
+            stats = self.handlers[key] = HandlerStats(
+                event_type, handler_name(handler)
+            )
+            return stats
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.profiler is not None:
+            if self.profile == "cprofile":
+                self.profiler.enable()
+            else:
+                self.profiler.start()
+
+    def stop(self):
+        if self.profiler is not None:
+            if self.profile == "cprofile":
+                self.profiler.disable()
+            else:
+                self.profiler.stop()
+        if self.started is not None:
+            self.elapsed += time.perf_counter() - self.started
+            self.started = None
+
+    def _profile_report(self):
+        if self.profile == "sampling":
+            return self.profiler.top(self.top)
+        stats = pstats.Stats(self.profiler)
+        rows = sorted(
+            stats.stats.items(), key=lambda kv: -kv[1][3]
+        )[:self.top]
+        return [{
+            "function": "%s:%s(%s)" % func,
+            "calls": nc,
+            "own": tt,
+            "cumulative": ct,
+        } for func, (cc, nc, tt, ct, callers) in rows]
+
+    def report(self, latencies=()):
+        """
+        Restituisce il report strutturato: durata, eventi per tipo,
+        gestori ordinati per tempo cumulato, profondità della coda,
+        istogrammi di latenza indicati ed eventuale profilo.
+        """
+        elapsed = self.elapsed
+        if self.started is not None:
+            elapsed += time.perf_counter() - self.started
+        report = {
+            "elapsed": elapsed,
+            "events": dict(self.events),
+            "handlers": sorted(
+                [s.summary() for s in list(self.handlers.values())],
+                key=lambda s: -s["total"]
+            ),
+            "queue_depth": self.queue_depth.summary(),
+            "latency": dict((h.name, h.summary()) for h in latencies),
+        }
+        if self.profiler is not None and self.started is None:
+            report["profile"] = {
+                "mode": self.profile, "top": self._profile_report()
+            }
+        return report
+
+
+def _json_value(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return dict((k, _json_value(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_json_value(v) for v in value]
+    return value
+
+
+def write_report(report, path):
+    """
+    Esporta il report in JSON (i valori NaN diventano null).
+    """
+    with open(path, "w") as out_file:
+        json.dump(_json_value(report), out_file, indent=2)
+
+
+def format_report(report):
+    """
+    Restituisce il report come testo, per la stampa o il log.
+    """
+    lines = ["Elapsed: %.3fs, events: %s" % (
+        report["elapsed"], ", ".join(
+            "%s=%s" % kv for kv in sorted(report["events"].items())
+        )
+    )]
+    for s in report["handlers"]:
+        lines.append("%-6s %-45s calls=%-9s total=%.3fs mean=%.1fus" % (
+            s["event"], s["handler"], s["calls"], s["total"], s["mean"] * 1e6
+        ))
+    depth = report["queue_depth"]
+    lines.append("Queue depth: mean=%.2f max=%s (%s samples)" % (
+        depth["mean"], depth["max"], depth["samples"]
+    ))
+    for s in report["latency"].values():
+        if s["count"]:
+            lines.append(
+                "%s: count=%s mean=%.1fus p50<=%.1fus p99<=%.1fus max=%.1fus" % (
+                    s["name"], s["count"], s["mean"] * 1e6, s["p50"] * 1e6,
+                    s["p99"] * 1e6, s["max"] * 1e6
+                )
+            )
+    if "profile" in report:
+        lines.append("Profile (%s):" % report["profile"]["mode"])
+        for row in report["profile"]["top"]:
+            lines.append("  own=%-10.4g cumulative=%-10.4g %s" % (
+                row["own"], row["cumulative"], row["function"]
+            ))
+    return "\n".join(lines)
@@ -0,0 +1,79 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import math
+
+
+class LatencyHistogram(object):
+    """
+    Istogramma delle latenze con bucket logaritmici (potenze di due in
+    microsecondi), a costo costante per ogni registrazione e con
+    memoria fissa indipendente dal numero di campioni.
+    """
+
+    def __init__(self, name="", buckets=40):
+        self.name = name
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        """
+        Registra una latenza espressa in secondi.
+        """
+        micros = seconds * 1e6
+        bucket = int(micros).bit_length()
+        if bucket >= len(self.counts):
+            bucket = len(self.counts) - 1
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, q):
+        """
+        Restituisce il limite superiore (in secondi) del bucket che
+        contiene il percentile q (tra 0 e 100).
+        """
+        if not self.count:
+            return math.nan
+        target = q / 100.0 * self.count
+        cumulative = 0
+        for bucket, n in enumerate(self.counts):
+            cumulative += n
+            if n and cumulative >= target:
+                return min((2 ** bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Restituisce un dizionario con le statistiche principali.
+        """
+        return {
+            "name": self.name,
+            "count": self.count,
+            "mean": self.mean(),
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        if not s["count"]:
+            return "%s: no samples" % self.name
+        return "%s: count=%s mean=%.1fus p50<=%.1fus p99<=%.1fus max=%.1fus" % (
+            self.name, s["count"], s["mean"] * 1e6, s["p50"] * 1e6,
+            s["p99"] * 1e6, s["max"] * 1e6
+        )
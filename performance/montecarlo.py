@@ -0,0 +1,239 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from .performance import _values, period_returns
+
+
+# Numero massimo di elementi (percorsi x periodi) simulati per blocco
+CHUNK_ELEMENTS = 2000000
+
+
+def block_bootstrap_indices(rng, n, n_sims, block_size):
+    """
+    Restituisce una matrice (n_sims, n) di indici del block bootstrap
+    circolare: ogni percorso è formato da blocchi di block_size
+    periodi consecutivi con inizio casuale, per cui l'autocorrelazione
+    dei rendimenti entro un blocco è conservata.
+    """
+    block_size = max(1, min(block_size, n))
+    blocks = -(-n // block_size)
+    starts = rng.integers(0, n, size=(n_sims, blocks))
+    indices = (starts[:, :, None] + np.arange(block_size)) % n
+    return indices.reshape(n_sims, blocks * block_size)[:, :n]
+
+
+def reshuffle_indices(rng, n, n_sims):
+    """
+    Restituisce una matrice (n_sims, n) di permutazioni casuali: ogni
+    percorso contiene gli stessi elementi in un ordine diverso.
+    """
+    return np.argsort(rng.random((n_sims, n)), axis=1)
+
+
+def path_statistics(values, kind, equity=100000.0, periods=252):
+    """
+    Calcola in blocco le statistiche di una matrice di percorsi
+    (n_sims, n) di rendimenti periodici (kind="returns") o di P&L dei
+    trade (kind="trades").
+
+    Restituisce gli array dell'equity finale, del massimo drawdown (in
+    frazione del massimo precedente, capitale iniziale compreso) e
+    dello Sharpe ratio annualizzato di ogni percorso.
+    """
+    equity = float(equity)
+    if kind == "returns":
+        curve = equity * np.cumprod(1.0 + values, axis=1)
+        returns = values
+    else:
+        curve = equity + np.cumsum(values, axis=1)
+        previous = np.concatenate(
+            [np.full((len(curve), 1), equity), curve[:, :-1]], axis=1
+        )
+        returns = values / previous
+    hwm = np.maximum(np.maximum.accumulate(curve, axis=1), equity)
+    max_drawdown = np.max((hwm - curve) / hwm, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = returns.std(axis=1, ddof=1)
+        sharpe = np.where(
+            std > 0, math.sqrt(periods) * returns.mean(axis=1) / std, np.nan
+        )
+    return curve[:, -1], max_drawdown, sharpe
+
+
+def _simulate_chunk(
+    values, kind, method, block_size, n_sims, equity, periods, seed
+):
+    """
+    Esegue un blocco di n_sims simulazioni, eventualmente in un
+    processo di lavoro. seed è un np.random.SeedSequence, per cui i
+    risultati non dipendono dal numero di processi.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    if method == "block":
+        indices = block_bootstrap_indices(rng, n, n_sims, block_size)
+    elif method == "reshuffle":
+        indices = reshuffle_indices(rng, n, n_sims)
+    else:
+        indices = rng.integers(0, n, size=(n_sims, n))
+    return path_statistics(values[indices], kind, equity, periods)
+
+
+def load_equity_returns(path, freq="1D"):
+    """
+    Restituisce la serie dei rendimenti del file equity.csv scritto da
+    Portfolio.output_results, ricampionata alla frequenza freq (per
+    default giornaliera). La colonna Returns contiene i rendimenti tra
+    due tick consecutivi, per cui la lunghezza dei blocchi e
+    l'annualizzazione dello Sharpe (periods) non avrebbero una durata
+    definita: i rendimenti sono invece calcolati dal valore di Total
+    alla fine di ogni periodo, a partire dal valore iniziale.
+    """
+    df = pd.read_csv(path, index_col=0, parse_dates=True)
+    return period_returns(df["Total"], freq)
+
+
+class MonteCarlo(object):
+    """
+    Analisi di robustezza Monte Carlo dei risultati di un backtest:
+    a partire dalla serie dei rendimenti (es. equity.csv) o dei P&L dei
+    trade (Portfolio.trade_pnls) si generano migliaia di percorsi
+    alternativi e si stimano le distribuzioni dell'equity finale, del
+    massimo drawdown e dello Sharpe ratio, con i relativi intervalli di
+    confidenza.
+
+    I metodi di ricampionamento sono:
+    "block" - block bootstrap circolare, adatto ai rendimenti
+        perché conserva l'autocorrelazione entro ogni blocco;
+    "reshuffle" - permutazione dell'ordine dei trade: l'equity finale
+        non cambia, mentre drawdown e Sharpe mostrano quanto dipendono
+        dalla sequenza dei trade;
+    "resample" - bootstrap semplice con reinserimento.
+
+    Le simulazioni sono vettoriali ed eseguite a blocchi di percorsi,
+    per cui la memoria usata non dipende da n_sims, e i blocchi sono
+    distribuiti su più processi.
+    """
+
+    def __init__(
+        self, values, kind="returns", method="block", n_sims=10000,
+        block_size=20, equity=100000.0, periods=252, chunk_size=None,
+        max_workers=None, seed=42
+    ):
+        """
+        Parametri:
+        values - La serie dei rendimenti periodici o dei P&L dei trade.
+        kind - "returns" o "trades".
+        method - "block", "reshuffle" o "resample".
+        n_sims - Il numero di percorsi simulati.
+        block_size - La lunghezza dei blocchi del block bootstrap.
+        equity - Il capitale iniziale di ogni percorso.
+        periods - I periodi per anno usati per annualizzare lo Sharpe.
+        chunk_size - Il numero di percorsi simulati per blocco, per
+            default tale da avere al più CHUNK_ELEMENTS valori.
+        max_workers - Il numero di processi, per default i core
+            disponibili; con 1 le simulazioni sono eseguite nel
+            processo corrente.
+        seed - Il seme del generatore, per ripetere la stessa analisi.
+        """
+        if kind not in ("returns", "trades"):
+            raise ValueError("Unknown series kind: %s" % kind)
+        if method not in ("block", "reshuffle", "resample"):
+            raise ValueError("Unknown resampling method: %s" % method)
+        self.values = _values(values)
+        self.values = self.values[~np.isnan(self.values)]
+        if not len(self.values):
+            raise ValueError("The series is empty")
+        self.kind = kind
+        self.method = method
+        self.n_sims = n_sims
+        self.block_size = block_size
+        self.equity = float(equity)
+        self.periods = periods
+        self.chunk_size = chunk_size or max(
+            1, CHUNK_ELEMENTS // len(self.values)
+        )
+        self.max_workers = max_workers or os.cpu_count()
+        self.seed = seed
+        self.results = None
+
+    def observed(self):
+        """
+        Restituisce le statistiche della serie originale.
+        """
+        final_equity, max_drawdown, sharpe = path_statistics(
+            self.values[None, :], self.kind, self.equity, self.periods
+        )
+        return {
+            "final_equity": final_equity[0],
+            "max_drawdown": max_drawdown[0],
+            "sharpe": sharpe[0]
+        }
+
+    def run(self):
+        """
+        Esegue le simulazioni e restituisce un DataFrame con una riga
+        per percorso e le colonne final_equity, max_drawdown e sharpe.
+        """
+        sizes = [
+            min(self.chunk_size, self.n_sims - start)
+            for start in range(0, self.n_sims, self.chunk_size)
+        ]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        n = len(sizes)
+        args = (
+            [self.values] * n, [self.kind] * n, [self.method] * n,
+            [self.block_size] * n, sizes, [self.equity] * n,
+            [self.periods] * n, seeds
+        )
+        if self.max_workers > 1 and n > 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                chunks = list(executor.map(_simulate_chunk, *args))
+        else:
+            chunks = list(map(_simulate_chunk, *args))
+        self.results = pd.DataFrame({
+            "final_equity": np.concatenate([c[0] for c in chunks]),
+            "max_drawdown": np.concatenate([c[1] for c in chunks]),
+            "sharpe": np.concatenate([c[2] for c in chunks]),
+        })
+        return self.results
+
+    def summary(self, confidence=0.95):
+        """
+        Restituisce un DataFrame con una riga per statistica: il valore
+        della serie originale, media, deviazione standard, mediana e
+        intervallo di confidenza dei percorsi simulati.
+        """
+        if self.results is None:
+            self.run()
+        observed = self.observed()
+        lower_q = (1.0 - confidence) / 2.0 * 100.0
+        rows = []
+        for name in ("final_equity", "max_drawdown", "sharpe"):
+            values = self.results[name].values
+            rows.append({
+                "statistic": name,
+                "observed": observed[name],
+                "mean": np.nanmean(values),
+                "std": np.nanstd(values),
+                "lower": np.nanpercentile(values, lower_q),
+                "median": np.nanmedian(values),
+                "upper": np.nanpercentile(values, 100.0 - lower_q),
+            })
+        return pd.DataFrame(rows).set_index("statistic")
+
+    def prob_loss(self):
+        """
+        Restituisce la frazione dei percorsi che chiudono in perdita.
+        """
+        if self.results is None:
+            self.run()
+        return float(np.mean(self.results["final_equity"].values < self.equity))
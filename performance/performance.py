@@ -2,10 +2,45 @@
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
+import math
+
 import numpy as np
 import pandas as pd
 
 
+def _values(series):
+    """
+    Restituisce i valori float di una Serie di pandas o di un array.
+    """
+    return np.asarray(series, dtype=float)
+
+
+def drawdown_series(equity):
+    """
+    Parametri:
+    equity - Una Serie di pandas (o un array) con la curva di equity.
+
+    Restituisce:
+    drawdown, duration - gli array del drawdown dal massimo precedente
+    (high water mark, primo valore compreso) e del numero di periodi
+    trascorsi dall'ultimo massimo. Calcolati con il massimo cumulativo
+    e senza cicli Python; dove la curva è NaN (es. la prima riga di una
+    curva ottenuta dai rendimenti) anche il drawdown è NaN.
+    """
+    values = _values(equity)
+    hwm = np.fmax.accumulate(values)
+    drawdown = hwm - values
+    drawdown[np.isnan(values)] = np.nan
+
+    # Durata: distanza dall'ultimo periodo con drawdown nullo
+    idx = np.arange(len(values))
+    at_high = ~(drawdown > 0)
+    last_high = np.maximum.accumulate(np.where(at_high, idx, 0))
+    duration = (idx - last_high).astype(float)
+    duration[np.isnan(drawdown)] = np.nan
+    return drawdown, duration
+
+
 def create_drawdowns(pnl):
     """
     Parametri:
@@ -14,19 +49,198 @@ def create_drawdowns(pnl):
     Restituisce:
     drawdown, duration - il massimo drawdown e la durata massima.
     """
+    drawdown, duration = drawdown_series(pnl)
+    drawdown = pd.Series(drawdown, index=getattr(pnl, "index", None))
+    return drawdown, drawdown.max(), np.nanmax(duration) if len(duration) else np.nan
+
+
+def period_returns(equity, freq="1D"):
+    """
+    Restituisce i rendimenti di una curva di equity (Serie con indice
+    temporale) ricampionata alla frequenza freq, per default
+    giornaliera: il valore alla fine di ogni periodo è confrontato con
+    quello del periodo precedente e il primo con il valore iniziale.
+
+    I rendimenti tra tick consecutivi non hanno una durata definita,
+    per cui Sharpe e Sortino annualizzati con periods=252 vanno
+    calcolati su questi rendimenti giornalieri.
+    """
+    equity = equity.dropna()
+    if not len(equity):
+        return pd.Series([], dtype=float, name="Returns")
+    closes = equity.resample(freq).last().dropna()
+    returns = closes / closes.shift(1).fillna(equity.iloc[0]) - 1.0
+    returns.name = "Returns"
+    return returns
+
+
+def sharpe_ratio(returns, periods=252):
+    """
+    Sharpe ratio annualizzato di una serie di rendimenti periodici,
+    con tasso privo di rischio nullo.
+    """
+    values = _values(returns)
+    values = values[~np.isnan(values)]
+    std = values.std(ddof=1) if len(values) > 1 else np.nan
+    if not std:
+        return np.nan
+    return math.sqrt(periods) * values.mean() / std
+
+
+def sortino_ratio(returns, periods=252):
+    """
+    Sortino ratio annualizzato: come lo Sharpe ratio ma usando solo
+    la deviazione dei rendimenti negativi.
+    """
+    values = _values(returns)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return np.nan
+    downside = np.sqrt(np.mean(np.minimum(values, 0.0) ** 2))
+    if not downside:
+        return np.nan
+    return math.sqrt(periods) * values.mean() / downside
+
+
+def calmar_ratio(returns, periods=252):
+    """
+    Calmar ratio: rendimento annualizzato composto diviso
+    per il massimo drawdown percentuale.
+    """
+    values = _values(returns)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return np.nan
+    equity = np.cumprod(1.0 + values)
+    max_dd = np.max(1.0 - equity / np.maximum.accumulate(np.maximum(equity, 1.0)))
+    if not max_dd:
+        return np.nan
+    annual_return = equity[-1] ** (float(periods) / len(values)) - 1.0
+    return annual_return / max_dd
+
+
+def rolling_volatility(returns, window, periods=252):
+    """
+    Volatilità annualizzata su una finestra mobile di window periodi.
+    Restituisce una Serie se returns è una Serie, altrimenti un array.
+    """
+    series = returns if isinstance(returns, pd.Series) else pd.Series(_values(returns))
+    vol = series.rolling(window).std() * math.sqrt(periods)
+    return vol if isinstance(returns, pd.Series) else vol.values
+
+
+def trade_stats(trade_pnls):
+    """
+    Statistiche dei singoli trade a partire dal P&L realizzato
+    di ciascun trade chiuso.
+
+    Restituisce un dizionario con numero di trade, percentuale di
+    trade vincenti, vincita e perdita media, profit factor, valore
+    atteso per trade e massimo numero di perdite consecutive.
+    """
+    pnls = _values(trade_pnls)
+    wins = pnls[pnls > 0]
+    losses = pnls[pnls < 0]
+    gross_loss = -losses.sum()
+
+    # Massima sequenza di perdite consecutive
+    losing = (pnls < 0).astype(np.int64)
+    if len(losing):
+        breaks = np.flatnonzero(np.diff(np.concatenate([[0], losing, [0]])))
+        max_losing_run = int(np.max(breaks[1::2] - breaks[::2])) if len(breaks) else 0
+    else:
+        max_losing_run = 0
+
+    return {
+        "trades": len(pnls),
+        "win_rate": len(wins) / float(len(pnls)) if len(pnls) else np.nan,
+        "avg_win": float(wins.mean()) if len(wins) else 0.0,
+        "avg_loss": float(losses.mean()) if len(losses) else 0.0,
+        "profit_factor": float(wins.sum() / gross_loss) if gross_loss else np.nan,
+        "expectancy": float(pnls.mean()) if len(pnls) else np.nan,
+        "max_consecutive_losses": max_losing_run,
+    }
+
+
+class IncrementalPerformance(object):
+    """
+    Versione incrementale delle statistiche di performance, aggiornata
+    dal Portfolio ad ogni tick in O(1) senza conservare l'intera curva
+    di equity: drawdown e durata correnti e massimi, media e varianza
+    dei rendimenti (algoritmo di Welford) e deviazione negativa.
+    """
+
+    def __init__(self, periods=252):
+        self.periods = periods
+        self.count = 0
+        self.last_equity = None
+        self.hwm = None
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.duration = 0
+        self.max_duration = 0
+        self.n_returns = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+
+    def update(self, equity):
+        """
+        Aggiorna le statistiche con un nuovo valore della curva di equity.
+        """
+        equity = float(equity)
+        self.count += 1
+        if self.last_equity:
+            ret = equity / self.last_equity - 1.0
+            self.n_returns += 1
+            delta = ret - self.mean
+            self.mean += delta / self.n_returns
+            self.m2 += delta * (ret - self.mean)
+            if ret < 0.0:
+                self.downside_sq += ret * ret
+        self.last_equity = equity
+
+        if self.hwm is None or equity >= self.hwm:
+            self.hwm = equity
+            self.drawdown = 0.0
+            self.duration = 0
+        else:
+            self.drawdown = (self.hwm - equity) / self.hwm
+            self.duration += 1
+            if self.drawdown > self.max_drawdown:
+                self.max_drawdown = self.drawdown
+            if self.duration > self.max_duration:
+                self.max_duration = self.duration
+
+    def volatility(self):
+        if self.n_returns < 2:
+            return np.nan
+        return math.sqrt(self.m2 / (self.n_returns - 1) * self.periods)
 
-    # Calcula la curva cumulativa dei rendimenti
-    # e imposta il High Water Mark
-    hwm = [0]
+    def sharpe_ratio(self):
+        if self.n_returns < 2 or not self.m2:
+            return np.nan
+        std = math.sqrt(self.m2 / (self.n_returns - 1))
+        return math.sqrt(self.periods) * self.mean / std
 
-    # Crea le Serie del drawdown e durata
-    idx = pnl.index
-    drawdown = pd.Series(index = idx)
-    duration = pd.Series(index = idx)
+    def sortino_ratio(self):
+        if not self.n_returns or not self.downside_sq:
+            return np.nan
+        downside = math.sqrt(self.downside_sq / self.n_returns)
+        return math.sqrt(self.periods) * self.mean / downside
 
-    # ciclo sul range dell'indice
-    for t in range(1, len(idx)):
-        hwm.append(max(hwm[t-1], pnl.ix[t]))
-        drawdown.ix[t]= (hwm[t]-pnl.ix[t])
-        duration.ix[t]= (0 if drawdown.ix[t] == 0 else duration.ix[t-1]+1)
-    return drawdown, drawdown.max(), duration.max()
\ No newline at end of file
+    def summary(self):
+        """
+        Restituisce un dizionario con le statistiche correnti.
+        """
+        return {
+            "ticks": self.count,
+            "equity": self.last_equity,
+            "drawdown": self.drawdown,
+            "max_drawdown": self.max_drawdown,
+            "drawdown_duration": self.duration,
+            "max_drawdown_duration": self.max_duration,
+            "volatility": self.volatility(),
+            "sharpe": self.sharpe_ratio(),
+            "sortino": self.sortino_ratio(),
+        }
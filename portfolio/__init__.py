@@ -1,2 +1,3 @@
-from .portfolio import *
-from .position import *
\ No newline at end of file
+from .position import *
+from .recorder import *
+from .portfolio import *
\ No newline at end of file
@@ -4,14 +4,20 @@
 
 from copy import deepcopy
 from decimal import Decimal, getcontext, ROUND_HALF_DOWN
+import itertools
 import logging
 import os
 
 import pandas as pd
 
-from event import OrderEvent
-from portfolio import Position
-from performance import create_drawdowns
+from event import OrderEvent, SignalEvent
+from execution.orderbook import PendingOrder, PendingOrderBook
+from fixedpoint import MONEY_SCALE, to_micros, from_micros
+from portfolio import Position, FixedPointPosition, NumpyEquityRecorder
+from performance import (
+    create_drawdowns, period_returns, sharpe_ratio, sortino_ratio,
+    trade_stats
+)
 
 from settings import OUTPUT_RESULTS_DIR
 
@@ -19,85 +25,134 @@ class Portfolio(object):
     def __init__(
             self, ticker, events, home_currency="GBP",
             leverage=20, equity=Decimal("100000.00"),
-            risk_per_trade=Decimal("0.02"), backtest=True
+            risk_per_trade=Decimal("0.02"), backtest=True,
+            recorder=None, performance=None, fill_events=False
     ):
+        """
+        recorder è l'EquityRecorder che registra la curva di equity
+        durante il backtest; per default si usa un NumpyEquityRecorder
+        che alla fine scrive backtest.npz in OUTPUT_RESULTS_DIR.
+
+        performance è un oggetto IncrementalPerformance opzionale,
+        aggiornato ad ogni tick con l'equity totale senza conservare
+        l'intera curva (utile soprattutto nel trading live).
+
+        Con fill_events=True il portfolio non esegue gli ordini al
+        prezzo corrente: invia solamente l'OrderEvent e aggiorna le
+        posizioni quando riceve i FillEvent del gestore di esecuzione,
+        al prezzo e per le unità effettivamente eseguite.
+
+        Gli ordini limit e stop dei segnali e i livelli di take profit
+        e stop loss delle posizioni sono conservati nel PendingOrderBook
+        pending: ad ogni tick si attivano solo gli ordini il cui livello
+        è stato superato.
+        """
         self.ticker = ticker
         self.events = events
         self.home_currency = home_currency
         self.leverage = leverage
         self.equity = equity
-        self.balance = deepcopy(self.equity)
+        # In modalità fixed point (prezzi del ticker in pipette) il
+        # saldo e i P&L sono interi in micro-unità
+        self.fixed_point = getattr(ticker, "fixed_point", False)
+        if self.fixed_point:
+            self.balance = to_micros(self.equity)
+            self.position_class = FixedPointPosition
+        else:
+            self.balance = deepcopy(self.equity)
+            self.position_class = Position
         self.risk_per_trade = risk_per_trade
         self.backtest = backtest
+        self.fill_events = fill_events
         self.trade_units = self.calc_risk_position_size()
         self.positions = {}
+        self.performance = performance
+        self.trade_pnls = []
+        self.pending = PendingOrderBook()
+        self.brackets = {}
+        self.bracket_exits = {}
+        self.bracket_requests = {}
+        self.bracket_replacements = {}
+        self.order_ids = itertools.count(1)
         if self.backtest:
-            self.backtest_file = self.create_equity_file()
+            self.recorder = recorder if recorder is not None \
+                else self.create_equity_recorder()
         self.logger = logging.getLogger(__name__)
 
     def calc_risk_position_size(self):
         return self.equity * self.risk_per_trade
 
     def add_new_position(
-            self, position_type, currency_pair, units, ticker
+            self, position_type, currency_pair, units, ticker, price=None
     ):
-        ps = Position(
+        ps = self.position_class(
             self.home_currency, position_type,
-            currency_pair, units, ticker
+            currency_pair, units, ticker, price
         )
         self.positions[currency_pair] = ps
 
-    def add_position_units(self, currency_pair, units):
+    def add_position_units(self, currency_pair, units, price=None):
         if currency_pair not in self.positions:
             return False
         else:
             ps = self.positions[currency_pair]
-            ps.add_units(units)
+            ps.add_units(units, price)
             return True
 
-    def remove_position_units(self, currency_pair, units):
+    def remove_position_units(self, currency_pair, units, price=None):
         if currency_pair not in self.positions:
             return False
         else:
             ps = self.positions[currency_pair]
-            pnl = ps.remove_units(units)
+            pnl = ps.remove_units(units, price)
             self.balance += pnl
+            self.trade_pnls.append(self._float_money(pnl))
             return True
 
-    def close_position(self, currency_pair):
+    def close_position(self, currency_pair, price=None):
         if currency_pair not in self.positions:
             return False
         else:
+            self._cancel_brackets(currency_pair)
             ps = self.positions[currency_pair]
-            pnl = ps.close_position()
+            pnl = ps.close_position(price)
             self.balance += pnl
+            self.trade_pnls.append(self._float_money(pnl))
             del [self.positions[currency_pair]]
             return True
 
-    def create_equity_file(self):
-        filename = "backtest.csv"
-        out_file = open(os.path.join(OUTPUT_RESULTS_DIR, filename), "w")
-        header = "Timestamp,Balance"
-        for pair in self.ticker.pairs:
-            header += ",%s" % pair
-        header += "\n"
-        out_file.write(header)
-        if self.backtest:
-            print(header[:-2])
-        return out_file
+    def _money(self, value):
+        """
+        Restituisce un importo nella valuta di riferimento,
+        convertendo le micro-unità in modalità fixed point.
+        """
+        return from_micros(value) if self.fixed_point else value
+
+    def _float_money(self, value):
+        """
+        Converte un importo in float per la curva di equity.
+        """
+        if self.fixed_point:
+            return value / MONEY_SCALE
+        return float(value)
+
+    def create_equity_recorder(self):
+        path = None
+        if OUTPUT_RESULTS_DIR is not None:
+            path = os.path.join(OUTPUT_RESULTS_DIR, "backtest.npz")
+        return NumpyEquityRecorder(self.ticker.pairs, path=path)
 
     def output_results(self):
-        # Chiusura del file csv del backtest.csv cosiì da poter
-        # essere caricato con Pandas senza errori
-        self.backtest_file.close()
+        # Completa la registrazione della curva di equity, che
+        # viene passata direttamente come array senza rileggere
+        # alcun file
+        self.recorder.close()
 
-        in_filename = "backtest.csv"
         out_filename = "equity.csv"
-        in_file = os.path.join(OUTPUT_RESULTS_DIR, in_filename)
         out_file = os.path.join(OUTPUT_RESULTS_DIR, out_filename)
 
         # Crea il dataframe della curva di equity
-        df = pd.read_csv(in_file, index_col=0)
+        df = self.recorder.to_frame()
         df.dropna(inplace=True)
         df["Total"] = df.sum(axis=1)
         df["Returns"] = df["Total"].pct_change()
@@ -108,9 +163,67 @@ class Portfolio(object):
         df["Drawdown"] = drawdown
         df.to_csv(out_file, index=True)
 
+        stats = trade_stats(self.trade_pnls)
+        daily_returns = period_returns(df["Total"])
+        print("Max Drawdown: %0.5f, Drawdown Duration: %s" % (max_dd, dd_duration))
+        print("Sharpe Ratio: %0.4f, Sortino Ratio: %0.4f" % (
+            sharpe_ratio(daily_returns), sortino_ratio(daily_returns)
+        ))
+        print("Trades: %s, Win Rate: %0.4f, Profit Factor: %0.4f" % (
+            stats["trades"], stats["win_rate"], stats["profit_factor"]
+        ))
+
         print("Simulation complete and results exported to %s" % out_filename)
 
 
+    def get_state(self, directory, name="portfolio"):
+        """
+        Restituisce lo stato del portfolio per i checkpoint del
+        backtest: saldo, posizioni, ordini in attesa e livelli di uscita
+        (nello stesso dizionario, per cui i riferimenti condivisi tra
+        pending e brackets sono conservati), P&L dei trade e stato del
+        recorder, che salva le righe della curva di equity nel file
+        name_equity.bin di directory.
+        """
+        next_id = next(self.order_ids)
+        self.order_ids = itertools.count(next_id)
+        state = {
+            "balance": self.balance,
+            "positions": self.positions,
+            "trade_pnls": self.trade_pnls,
+            "pending": self.pending,
+            "brackets": self.brackets,
+            "bracket_exits": self.bracket_exits,
+            "bracket_requests": self.bracket_requests,
+            "bracket_replacements": self.bracket_replacements,
+            "next_order_id": next_id,
+            "performance": self.performance
+        }
+        if self.backtest:
+            state["recorder"] = self.recorder.get_state(
+                os.path.join(directory, "%s_equity.bin" % name)
+            )
+        return state
+
+    def set_state(self, state, directory, name="portfolio"):
+        self.balance = state["balance"]
+        self.positions = state["positions"]
+        for ps in self.positions.values():
+            ps.ticker = self.ticker
+        self.trade_pnls = state["trade_pnls"]
+        self.pending = state["pending"]
+        self.brackets = state["brackets"]
+        self.bracket_exits = state["bracket_exits"]
+        self.bracket_requests = state["bracket_requests"]
+        self.bracket_replacements = state["bracket_replacements"]
+        self.order_ids = itertools.count(state["next_order_id"])
+        self.performance = state["performance"]
+        if self.backtest:
+            self.recorder.set_state(
+                state["recorder"],
+                os.path.join(directory, "%s_equity.bin" % name)
+            )
+
     def update_portfolio(self, tick_event):
         """
         Aggiorna tutte le posizione assicurandosi di aggiornarne
@@ -120,26 +233,35 @@ class Portfolio(object):
         if currency_pair in self.positions:
             ps = self.positions[currency_pair]
             ps.update_position_price()
-        if self.backtest:
-            out_line = "%s,%s" % (tick_event.time, self.balance)
-            for pair in self.ticker.pairs:
-                if pair in self.positions:
-                    out_line += ",%s" % self.positions[pair].profit_base
-                else:
-                    out_line += ",0.00"
-            out_line += "\n"
-            print(out_line[:-2])
-            self.backtest_file.write(out_line)
+        if self.pending.count:
+            self._check_pending_orders(tick_event)
+        if self.backtest or self.performance is not None:
+            positions = self.positions
+            balance = self._float_money(self.balance)
+            profits = [
+                self._float_money(positions[pair].profit_base)
+                if pair in positions else 0.0
+                for pair in self.ticker.pairs
+            ]
+            if self.backtest:
+                self.recorder.record(tick_event.time, balance, profits)
+            if self.performance is not None:
+                self.performance.update(balance + sum(profits))
 
 
     def execute_signal(self, signal_event):
+        # Gli ordini limit e stop restano in attesa fino a quando
+        # il prezzo raggiunge il loro livello
+        if signal_event.order_type in ("limit", "stop"):
+            self.add_pending_order(signal_event)
+            return
+        if signal_event.order_type == "cancel":
+            self.cancel_pending_orders(signal_event.instrument)
+            return
+
         # Controlla se il ticker dei prezzi contiene tutte
         # le coppie di valute per eseguire l'ordine
-        execute = True
-        tp = self.ticker.prices
-        for pair in tp:
-            if tp[pair]["ask"] is None or tp[pair]["bid"] is None:
-                execute = False
+        execute = self.ticker.prices.is_complete()
 
         # Tutti i dati dei prezzi sono dispponibile
         # è possibile eseguire l'ordine
@@ -150,6 +272,10 @@ class Portfolio(object):
             units = int(self.trade_units)
             time = signal_event.time
 
+            if self.fill_events:
+                self._send_order(signal_event, units)
+                return
+
             # Se non c'è una posizione, si crea una nuova
             if currency_pair not in self.positions:
                 if side == "buy":
@@ -160,6 +286,10 @@ class Portfolio(object):
                     position_type, currency_pair,
                     units, self.ticker
                 )
+                self._place_brackets(
+                    currency_pair, signal_event.take_profit,
+                    signal_event.stop_loss
+                )
 
             # Se la posizione esiste, si aggiunge o rimuove unità
             else:
@@ -198,8 +328,280 @@ class Portfolio(object):
             order = OrderEvent(currency_pair, units, "market", side)
             self.events.put(order)
 
-            self.logger.info("Portfolio Balance: %s" % self.balance)
+            self.logger.info("Portfolio Balance: %s", self._money(self.balance))
         else:
             self.logger.info("Unable to execute order as price data was insufficient.")
 
+    def _send_order(self, signal_event, units):
+        """
+        Invia l'ordine senza modificare le posizioni, che saranno
+        aggiornate da execute_fill. Un segnale opposto alla posizione
+        aperta la chiude: l'ordine ha le unità della posizione, che
+        dopo un'esecuzione parziale possono essere meno di trade_units.
+        """
+        side = signal_event.side
+        currency_pair = signal_event.instrument
+        ps = self.positions.get(currency_pair)
+        if ps is not None and (side == "buy") != (ps.position_type == "long"):
+            units = int(ps.units)
+        elif signal_event.take_profit is not None or \
+                signal_event.stop_loss is not None:
+            # I livelli valgono per la posizione aperta dall'ordine,
+            # anche se viene eseguito dopo la chiusura di quella attuale
+            self.bracket_requests[currency_pair] = (
+                signal_event.take_profit, signal_event.stop_loss
+            )
+        else:
+            self.bracket_requests.pop(currency_pair, None)
+        order = OrderEvent(
+            currency_pair, units, signal_event.order_type, side,
+            signal_event.price
+        )
+        self.events.put(order)
+
+    def execute_fill(self, fill_event):
+        """
+        Aggiorna le posizioni con un'esecuzione (anche parziale): apre
+        o incrementa la posizione sullo stesso lato, la riduce o la
+        chiude sul lato opposto e, se le unità eseguite superano la
+        posizione, apre la rimanenza sul lato opposto. I livelli di
+        uscita restano associati alla posizione fino alla chiusura e
+        sono adeguati ad ogni esecuzione. Le conferme di annullamento
+        ("cancel") riguardano solo le uscite in corso.
+        """
+        if fill_event.order_type == "cancel":
+            self._exit_cancelled(fill_event)
+            return
+        currency_pair = fill_event.instrument
+        units = fill_event.units
+        price = fill_event.price
+        if fill_event.side == "buy":
+            position_type = "long"
+        else:
+            position_type = "short"
 
+        if currency_pair not in self.positions:
+            self.add_new_position(
+                position_type, currency_pair, units, self.ticker, price
+            )
+            self._place_brackets(
+                currency_pair,
+                *self.bracket_requests.get(currency_pair, (None, None))
+            )
+        else:
+            ps = self.positions[currency_pair]
+            if ps.position_type == position_type:
+                self.add_position_units(currency_pair, units, price)
+                self._resize_brackets(fill_event)
+            elif units < ps.units:
+                self.remove_position_units(currency_pair, units, price)
+                self._resize_brackets(fill_event)
+            else:
+                remainder = units - ps.units
+                self._exit_filled(fill_event)
+                self.close_position(currency_pair, price)
+                if remainder > 0:
+                    self.add_new_position(
+                        position_type, currency_pair, int(remainder),
+                        self.ticker, price
+                    )
+                    self._place_brackets(
+                        currency_pair,
+                        *self.bracket_requests.get(currency_pair, (None, None))
+                    )
+        self.logger.info("Portfolio Balance: %s", self._money(self.balance))
+
+    def add_pending_order(self, signal_event):
+        """
+        Registra un ordine limit o stop di ingresso, che sarà eseguito
+        quando il prezzo raggiunge signal_event.price.
+        """
+        order = PendingOrder(
+            next(self.order_ids), signal_event.instrument,
+            int(self.trade_units), signal_event.side,
+            signal_event.order_type, signal_event.price
+        )
+        order.take_profit = signal_event.take_profit
+        order.stop_loss = signal_event.stop_loss
+        self.pending.add(order)
+        return order
+
+    def cancel_pending_orders(self, currency_pair):
+        """
+        Annulla gli ordini di ingresso in attesa di una coppia (i
+        livelli di uscita delle posizioni aperte restano attivi).
+        """
+        exits = self.brackets.get(currency_pair, [])
+        for order in self.pending.orders(currency_pair):
+            if order not in exits:
+                self.pending.cancel(order)
+
+    def _place_brackets(self, currency_pair, take_profit, stop_loss):
+        """
+        Registra i livelli di take profit (limit) e stop loss (stop)
+        della posizione aperta: quando uno scatta, l'altro è annullato.
+        """
+        if take_profit is None and stop_loss is None:
+            return
+        ps = self.positions[currency_pair]
+        side = "sell" if ps.position_type == "long" else "buy"
+        orders = []
+        for order_type, price in (("limit", take_profit), ("stop", stop_loss)):
+            if price is not None:
+                order = PendingOrder(
+                    next(self.order_ids), currency_pair, int(ps.units),
+                    side, order_type, price
+                )
+                self.pending.add(order)
+                orders.append(order)
+        self.brackets[currency_pair] = orders
+
+    def _resize_brackets(self, fill_event):
+        """
+        Adegua i livelli di uscita dopo un'esecuzione parziale: l'uscita
+        in corso a cui appartiene l'esecuzione (stesso client_id) è
+        ridotta delle unità eseguite, le unità aggiunte alla posizione
+        durante un'uscita escono con la stessa uscita e i livelli
+        ancora attivi coprono l'intera posizione.
+        """
+        currency_pair = fill_event.instrument
+        ps = self.positions[currency_pair]
+        exits = self.bracket_exits.get(currency_pair)
+        if exits and fill_event.side == exits[0].side:
+            self._exit_filled(fill_event)
+        elif exits and currency_pair not in self.bracket_replacements:
+            # Con un'uscita in sostituzione in attesa le unità aggiunte
+            # sono coperte da quest'ultima
+            order = exits[0]
+            order.units += fill_event.units
+            order.remaining += fill_event.units
+            self.events.put(OrderEvent(
+                currency_pair, fill_event.units, order.order_type,
+                order.side, order.price, client_id=order.order_id
+            ))
+        for order in self.brackets.get(currency_pair, []):
+            order.units = order.remaining = int(ps.units)
+
+    def _exit_filled(self, fill_event):
+        """
+        Riduce l'uscita in corso dell'esecuzione delle unità eseguite e
+        rimuove le uscite completate.
+        """
+        currency_pair = fill_event.instrument
+        exits = self.bracket_exits.get(currency_pair)
+        if not exits:
+            return
+        for order in exits:
+            if order.order_id == fill_event.client_id:
+                order.remaining -= min(fill_event.units, order.remaining)
+        self.bracket_exits[currency_pair] = [
+            order for order in exits if order.remaining
+        ]
+
+    def _cancel_brackets(self, currency_pair):
+        """
+        Annulla i livelli di uscita di una posizione chiusa e, presso il
+        gestore di esecuzione, le uscite in corso non ancora eseguite.
+        """
+        for order in self.brackets.pop(currency_pair, []):
+            self.pending.cancel(order)
+        for order in self.bracket_exits.pop(currency_pair, []):
+            if order.remaining:
+                self._send_cancel(order)
+        self.bracket_replacements.pop(currency_pair, None)
+
+    def _send_exit(self, order, units):
+        order.units = order.remaining = units
+        self.bracket_exits.setdefault(order.instrument, []).append(order)
+        self.events.put(OrderEvent(
+            order.instrument, units, order.order_type, order.side,
+            order.price, client_id=order.order_id
+        ))
+
+    def _send_cancel(self, order):
+        self.events.put(OrderEvent(
+            order.instrument, 0, "cancel", order.side,
+            client_id=order.order_id
+        ))
+
+    def _exit_cancelled(self, fill_event):
+        """
+        Gestisce la conferma di annullamento di un'uscita in corso:
+        quando non restano altre uscite si invia quella del livello
+        attivato nel frattempo, per le unità ancora aperte.
+        """
+        currency_pair = fill_event.instrument
+        exits = self.bracket_exits.get(currency_pair)
+        if exits is None:
+            return
+        exits = [
+            order for order in exits
+            if order.order_id != fill_event.client_id
+        ]
+        self.bracket_exits[currency_pair] = exits
+        if exits or currency_pair not in self.bracket_replacements:
+            return
+        order = self.bracket_replacements.pop(currency_pair)
+        if currency_pair in self.positions:
+            self._send_exit(order, int(self.positions[currency_pair].units))
+
+    def _check_pending_orders(self, tick_event):
+        """
+        Esegue gli ordini della coppia del tick il cui livello è stato
+        superato dai prezzi correnti.
+        """
+        currency_pair = tick_event.instrument
+        book = self.ticker.prices
+        bid, ask = book.quote(book.ids[currency_pair])
+        if bid is None or ask is None:
+            return
+        triggered = self.pending.pop_triggered(currency_pair, bid, ask)
+        for order in triggered:
+            if order in self.brackets.get(currency_pair, []):
+                self._execute_exit(order)
+            elif self.fill_events:
+                # L'ordine attivato è inviato con il suo livello, per
+                # cui un limit non viene eseguito a un prezzo peggiore
+                self._send_order(SignalEvent(
+                    currency_pair, order.order_type, order.side,
+                    tick_event.time, order.price,
+                    order.take_profit, order.stop_loss
+                ), order.units)
+            else:
+                self.execute_signal(SignalEvent(
+                    currency_pair, "market", order.side, tick_event.time,
+                    take_profit=order.take_profit, stop_loss=order.stop_loss
+                ))
+
+    def _execute_exit(self, order):
+        """
+        Chiude la posizione per un take profit o uno stop loss e
+        annulla l'altro livello.
+
+        Con fill_events l'ordine di uscita copre l'intera posizione e
+        l'altro livello resta attivo, per cui dopo un'esecuzione
+        parziale la rimanenza mantiene i suoi livelli di uscita fino
+        alla chiusura della posizione (vedi execute_fill). Se scatta
+        mentre l'uscita dell'altro livello è ancora in corso (ad
+        esempio un take profit rimasto nel book del gestore di
+        esecuzione per la latenza), questa viene annullata e l'uscita
+        del livello attivato è inviata alla conferma dell'annullamento.
+        """
+        currency_pair = order.instrument
+        if currency_pair not in self.positions:
+            self._cancel_brackets(currency_pair)
+            return
+        if not self.fill_events:
+            self.close_position(currency_pair)
+            self.logger.info("Portfolio Balance: %s", self._money(self.balance))
+            return
+        self.brackets[currency_pair].remove(order)
+        exits = self.bracket_exits.get(currency_pair)
+        if exits:
+            for other in exits:
+                self._send_cancel(other)
+            self.bracket_replacements[currency_pair] = order
+        else:
+            self._send_exit(
+                order, int(self.positions[currency_pair].units)
+            )
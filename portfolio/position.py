@@ -2,36 +2,54 @@
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
-from decimal import Decimal, getcontext, ROUND_HALF_DOWN
+from decimal import Decimal, ROUND_HALF_DOWN
+
+from fixedpoint import (
+    PRICE_SCALE, MONEY_SCALE, div_round_half_down
+)
+
+
+PIPETTE = Decimal("0.00001")
+CENT = Decimal("0.01")
 
 
 class Position(object):
     def __init__(
             self, home_currency, position_type,
-            currency_pair, units, ticker
+            currency_pair, units, ticker, price=None
     ):
+        """
+        price è il prezzo di esecuzione dell'apertura; se non è
+        indicato si usa l'ask (long) o il bid (short) corrente.
+        """
         self.position_type = position_type  # Long o short
         self.home_currency = home_currency
         self.currency_pair = currency_pair
         self.units = units
         self.ticker = ticker
-        self.set_up_currencies()
+        self.set_up_currencies(price)
         self.profit_base = self.calculate_profit_base()
         self.profit_perc = self.calculate_profit_perc()
 
-    def set_up_currencies(self):
+    def set_up_currencies(self, price=None):
         self.base_currency = self.currency_pair[:3]
         self.quote_currency = self.currency_pair[3:]
 
         self.quote_home_currency_pair = "%s%s" % (self.quote_currency, self.home_currency)
 
-        ticker_cur = self.ticker.prices[self.currency_pair]
+        book = self.ticker.prices
+        self.pair_id = book.pair_id(self.currency_pair)
+        # La coppia quote/home può essere negoziata, invertita o
+        # ottenuta per triangolazione dalle coppie negoziate
+        self.qh_pair_id = book.pair_id(self.quote_home_currency_pair)
         if self.position_type == "long":
-            self.avg_price = Decimal(str(ticker_cur["ask"]))
-            self.cur_price = Decimal(str(ticker_cur["bid"]))
+            self.avg_price = Decimal(str(book.ask[self.pair_id]))
+            self.cur_price = Decimal(str(book.bid[self.pair_id]))
         else:
-            self.avg_price = Decimal(str(ticker_cur["bid"]))
-            self.cur_price = Decimal(str(ticker_cur["ask"]))
+            self.avg_price = Decimal(str(book.bid[self.pair_id]))
+            self.cur_price = Decimal(str(book.ask[self.pair_id]))
+        if price is not None:
+            self.avg_price = Decimal(str(price))
 
 
     def calculate_pips(self):
@@ -41,86 +59,198 @@ class Position(object):
         elif self.position_type == "short":
             mult = Decimal("-1")
         pips = (mult * (self.cur_price - self.avg_price)).quantize(
-            Decimal("0.00001"), ROUND_HALF_DOWN
+            PIPETTE, ROUND_HALF_DOWN
         )
         return pips
 
-    def calculate_profit_base(self, exposure):
+    def calculate_profit_base(self):
         pips = self.calculate_pips()
-        ticker_qh = self.ticker.prices[self.quote_home_currency_pair]
+        qh_bid, qh_ask = self.ticker.prices.quote(self.qh_pair_id)
         if self.position_type == "long":
-            qh_close = ticker_qh["bid"]
+            qh_close = qh_bid
         else:
-            qh_close = ticker_qh["ask"]
+            qh_close = qh_ask
         profit = pips * qh_close * self.units
         return profit.quantize(
-            Decimal("0.00001"), ROUND_HALF_DOWN
+            PIPETTE, ROUND_HALF_DOWN
         )
 
     def calculate_profit_perc(self):
         return (self.profit_base / self.units * Decimal("100.00")).quantize(
-            Decimal("0.00001"), ROUND_HALF_DOWN
+            PIPETTE, ROUND_HALF_DOWN
         )
 
-    def update_position_price(self):
-        ticker_cur = self.ticker.prices[self.currency_pair]
-        if self.position_type == "long":
-            self.cur_price = Decimal(str(ticker_cur["bid"]))
+    def update_position_price(self, price=None):
+        """
+        Aggiorna il prezzo corrente e il P&L della posizione; price è
+        l'eventuale prezzo di esecuzione, altrimenti si usa il bid
+        (long) o l'ask (short) corrente.
+        """
+        book = self.ticker.prices
+        if price is not None:
+            self.cur_price = Decimal(str(price))
+        elif self.position_type == "long":
+            self.cur_price = Decimal(str(book.bid[self.pair_id]))
         else:
-            self.cur_price = Decimal(str(ticker_cur["ask"]))
+            self.cur_price = Decimal(str(book.ask[self.pair_id]))
         self.profit_base = self.calculate_profit_base()
         self.profit_perc = self.calculate_profit_perc()
 
-    def add_units(self, units):
-        cp = self.ticker.prices[self.currency_pair]
-        if self.position_type == "long":
-            add_price = cp["ask"]
+    def add_units(self, units, price=None):
+        book = self.ticker.prices
+        if price is not None:
+            add_price = price
+        elif self.position_type == "long":
+            add_price = book.ask[self.pair_id]
         else:
-            add_price = cp["bid"]
-        new_total_units = self.units + units
-        new_total_cost = self.avg_price * self.units + add_price * units
-        self.avg_price = new_total_cost / new_total_units
-        self.units = new_total_units
-        self.update_position_price()
-
-    def add_units(self, units):
-        cp = self.ticker.prices[self.currency_pair]
-        if self.position_type == "long":
-            add_price = cp["ask"]
-        else:
-            add_price = cp["bid"]
+            add_price = book.bid[self.pair_id]
         new_total_units = self.units + units
         new_total_cost = self.avg_price*self.units + add_price*units
         self.avg_price = new_total_cost/new_total_units
         self.units = new_total_units
         self.update_position_price()
 
-    def remove_units(self, units):
+    def remove_units(self, units, price=None):
+        """
+        Riduce la posizione e restituisce il P&L realizzato; price è
+        l'eventuale prezzo di esecuzione, altrimenti si chiude al bid
+        (long) o all'ask (short) corrente.
+        """
         dec_units = Decimal(str(units))
-        ticker_cp = self.ticker.prices[self.currency_pair]
-        ticker_qh = self.ticker.prices[self.quote_home_currency_pair]
+        qh_bid, qh_ask = self.ticker.prices.quote(self.qh_pair_id)
         if self.position_type == "long":
-            remove_price = ticker_cp["bid"]
-            qh_close = ticker_qh["ask"]
+            qh_close = qh_ask
         else:
-            remove_price = ticker_cp["ask"]
-            qh_close = ticker_qh["bid"]
+            qh_close = qh_bid
         self.units -= dec_units
-        self.update_position_price()
+        self.update_position_price(price)
         # Calculate PnL
         pnl = self.calculate_pips() * qh_close * dec_units
-        getcontext().rounding = ROUND_HALF_DOWN
-        return pnl.quantize(Decimal("0.01"))
+        return pnl.quantize(CENT, ROUND_HALF_DOWN)
 
-    def close_position(self):
-        ticker_cp = self.ticker.prices[self.currency_pair]
-        ticker_qh = self.ticker.prices[self.quote_home_currency_pair]
+    def close_position(self, price=None):
+        qh_bid, qh_ask = self.ticker.prices.quote(self.qh_pair_id)
         if self.position_type == "long":
-            qh_close = ticker_qh["ask"]
+            qh_close = qh_ask
         else:
-            qh_close = ticker_qh["bid"]
-        self.update_position_price()
+            qh_close = qh_bid
+        self.update_position_price(price)
         # Calculate PnL
         pnl = self.calculate_pips() * qh_close * self.units
-        getcontext().rounding = ROUND_HALF_DOWN
-        return pnl.quantize(Decimal("0.01"))
\ No newline at end of file
+        return pnl.quantize(CENT, ROUND_HALF_DOWN)
+
+    def __getstate__(self):
+        # Il ticker non fa parte dello stato della posizione: viene
+        # riassegnato dal Portfolio quando si riprende un checkpoint
+        state = self.__dict__.copy()
+        state["ticker"] = None
+        return state
+
+class FixedPointPosition(Position):
+    """
+    Variante di Position in aritmetica intera, usata quando il ticker
+    fornisce i prezzi in pipette (fixed_point=True). I prezzi sono in
+    pipette e gli importi in micro-unità della valuta di riferimento;
+    gli arrotondamenti replicano quelli della versione Decimal.
+
+    Il prezzo medio è conservato come frazione avg_num / avg_den, in
+    modo che l'aggiunta di unità non introduca errori di arrotondamento.
+    """
+
+    def set_up_currencies(self, price=None):
+        self.base_currency = self.currency_pair[:3]
+        self.quote_currency = self.currency_pair[3:]
+
+        self.quote_home_currency_pair = "%s%s" % (self.quote_currency, self.home_currency)
+
+        book = self.ticker.prices
+        self.pair_id = book.pair_id(self.currency_pair)
+        # La coppia quote/home può essere negoziata, invertita o
+        # ottenuta per triangolazione dalle coppie negoziate
+        self.qh_pair_id = book.pair_id(self.quote_home_currency_pair)
+        if self.position_type == "long":
+            self.avg_price = book.ask[self.pair_id]
+            self.cur_price = book.bid[self.pair_id]
+        else:
+            self.avg_price = book.bid[self.pair_id]
+            self.cur_price = book.ask[self.pair_id]
+        if price is not None:
+            self.avg_price = price
+        self.avg_num = self.avg_price
+        self.avg_den = 1
+
+    def calculate_pips(self):
+        mult = 1 if self.position_type == "long" else -1
+        return div_round_half_down(
+            mult * (self.cur_price * self.avg_den - self.avg_num),
+            self.avg_den
+        )
+
+    def calculate_profit_base(self):
+        pips = self.calculate_pips()
+        qh_bid, qh_ask = self.ticker.prices.quote(self.qh_pair_id)
+        if self.position_type == "long":
+            qh_close = qh_bid
+        else:
+            qh_close = qh_ask
+        # pipette * pipette -> arrotondamento a 1e-5, poi micro-unità
+        return div_round_half_down(
+            pips * qh_close * self.units, PRICE_SCALE
+        ) * (MONEY_SCALE // PRICE_SCALE)
+
+    def calculate_profit_perc(self):
+        return div_round_half_down(
+            self.profit_base * 100, self.units * (MONEY_SCALE // PRICE_SCALE)
+        ) * (MONEY_SCALE // PRICE_SCALE)
+
+    def update_position_price(self, price=None):
+        book = self.ticker.prices
+        if price is not None:
+            self.cur_price = price
+        elif self.position_type == "long":
+            self.cur_price = book.bid[self.pair_id]
+        else:
+            self.cur_price = book.ask[self.pair_id]
+        self.profit_base = self.calculate_profit_base()
+        self.profit_perc = self.calculate_profit_perc()
+
+    def add_units(self, units, price=None):
+        book = self.ticker.prices
+        if price is not None:
+            add_price = price
+        elif self.position_type == "long":
+            add_price = book.ask[self.pair_id]
+        else:
+            add_price = book.bid[self.pair_id]
+        new_total_units = self.units + units
+        self.avg_num = self.avg_num * self.units + add_price * units * self.avg_den
+        self.avg_den = self.avg_den * new_total_units
+        self.avg_price = div_round_half_down(self.avg_num, self.avg_den)
+        self.units = new_total_units
+        self.update_position_price()
+
+    def _realised_pnl(self, qh_close, units):
+        # pipette * pipette -> arrotondamento al centesimo, poi micro-unità
+        return div_round_half_down(
+            self.calculate_pips() * qh_close * units,
+            PRICE_SCALE * PRICE_SCALE // 100
+        ) * (MONEY_SCALE // 100)
+
+    def remove_units(self, units, price=None):
+        qh_bid, qh_ask = self.ticker.prices.quote(self.qh_pair_id)
+        if self.position_type == "long":
+            qh_close = qh_ask
+        else:
+            qh_close = qh_bid
+        self.units -= units
+        self.update_position_price(price)
+        return self._realised_pnl(qh_close, units)
+
+    def close_position(self, price=None):
+        qh_bid, qh_ask = self.ticker.prices.quote(self.qh_pair_id)
+        if self.position_type == "long":
+            qh_close = qh_ask
+        else:
+            qh_close = qh_bid
+        self.update_position_price(price)
+        return self._realised_pnl(qh_close, self.units)
@@ -0,0 +1,270 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+
+class EquityRecorder(object):
+    """
+    Classe base per la registrazione della curva di equity del
+    Portfolio: per ogni tick riceve il timestamp, il saldo e il P&L non
+    realizzato di ogni coppia (come float nella valuta di riferimento).
+
+    Il campionamento può essere ridotto registrando un tick ogni
+    every_n_ticks, oppure solo quando cambia il saldo
+    (on_balance_change=True).
+    """
+
+    def __init__(self, pairs, every_n_ticks=1, on_balance_change=False):
+        self.pairs = list(pairs)
+        self.columns = ["Balance"] + self.pairs
+        self.every_n_ticks = every_n_ticks
+        self.on_balance_change = on_balance_change
+        self.ticks = 0
+        self.last_balance = None
+
+    def record(self, time, balance, profits):
+        """
+        Registra una riga della curva di equity se rispetta
+        il criterio di campionamento.
+        """
+        self.ticks += 1
+        if self.on_balance_change:
+            if balance == self.last_balance:
+                return
+        elif self.ticks % self.every_n_ticks != 0:
+            return
+        self.last_balance = balance
+        self._append(time, balance, profits)
+
+    def _append(self, time, balance, profits):
+        raise NotImplementedError("Should implement _append()")
+
+    def cache_key(self):
+        """
+        Restituisce la configurazione del campionamento, che fa parte
+        della chiave della DayCache (le righe già registrate e i file
+        di uscita no).
+        """
+        return {
+            "pairs": self.pairs, "every_n_ticks": self.every_n_ticks,
+            "on_balance_change": self.on_balance_change
+        }
+
+    def close(self):
+        """
+        Completa la registrazione e scrive gli eventuali dati su disco.
+        """
+        pass
+
+    def get_state(self, spill_path):
+        """
+        Restituisce lo stato del campionamento per i checkpoint del
+        backtest. Le righe registrate sono salvate dalle sottoclassi in
+        modo incrementale, eventualmente nel file spill_path.
+        """
+        return {"ticks": self.ticks, "last_balance": self.last_balance}
+
+    def set_state(self, state, spill_path):
+        self.ticks = state["ticks"]
+        self.last_balance = state["last_balance"]
+
+    def to_frame(self):
+        """
+        Restituisce la curva di equity come DataFrame con indice
+        Timestamp e colonne Balance più una colonna per coppia.
+        """
+        raise NotImplementedError("Should implement to_frame()")
+
+
+class NumpyEquityRecorder(EquityRecorder):
+    """
+    Registra la curva di equity in buffer NumPy preallocati a blocchi di
+    chunk_size righe, senza formattare stringhe né scrivere su disco ad
+    ogni tick. Alla chiusura, se è indicato un path, i dati sono scritti
+    in un file binario .npz oppure in un file Parquet (se il path
+    termina con ".parquet", richiede pyarrow o fastparquet).
+    """
+
+    def __init__(
+        self, pairs, path=None, chunk_size=65536,
+        every_n_ticks=1, on_balance_change=False
+    ):
+        EquityRecorder.__init__(
+            self, pairs, every_n_ticks, on_balance_change
+        )
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.chunked_rows = 0
+        self.spilled = 0
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self.times = np.empty(self.chunk_size, dtype=object)
+        self.values = np.empty((self.chunk_size, len(self.columns)))
+        self.row = 0
+
+    def _append(self, time, balance, profits):
+        if self.row == self.chunk_size:
+            self.chunks.append((self.times, self.values))
+            self.chunked_rows += self.chunk_size
+            self._new_chunk()
+        row = self.row
+        self.times[row] = time
+        values = self.values[row]
+        values[0] = balance
+        values[1:] = profits
+        self.row = row + 1
+
+    def __len__(self):
+        return self.chunked_rows + self.row
+
+    def arrays(self, start=0):
+        """
+        Restituisce gli array (timestamp, valori) delle righe registrate
+        a partire dalla riga start, con i valori nell'ordine di
+        self.columns.
+        """
+        chunks = self.chunks + [(self.times[:self.row], self.values[:self.row])]
+        times = np.concatenate([c[0] for c in chunks])[start:]
+        values = np.concatenate([c[1] for c in chunks])[start:]
+        return times, values
+
+    def _spill_dtype(self):
+        return np.dtype([
+            ("time", "<i8"), ("values", "<f8", (len(self.columns),))
+        ])
+
+    def get_state(self, spill_path):
+        """
+        Accoda al file binario spill_path solo le righe registrate dopo
+        il checkpoint precedente, per cui il costo di un checkpoint non
+        cresce con la lunghezza della curva di equity. Le righe sono
+        scritte su disco prima che lo stato che le conta sia salvato.
+        """
+        state = EquityRecorder.get_state(self, spill_path)
+        times, values = self.arrays(self.spilled)
+        records = np.empty(len(times), dtype=self._spill_dtype())
+        records["time"] = pd.to_datetime(times).values \
+            .astype("datetime64[ns]").view("<i8")
+        records["values"] = values
+        with open(spill_path, "ab" if self.spilled else "wb") as spill_file:
+            records.tofile(spill_file)
+            spill_file.flush()
+            os.fsync(spill_file.fileno())
+        self.spilled += len(records)
+        state["rows"] = self.spilled
+        return state
+
+    def set_state(self, state, spill_path):
+        """
+        Ricarica dal file spill_path le righe del checkpoint, scartando
+        quelle eventualmente scritte dopo.
+        """
+        EquityRecorder.set_state(self, state, spill_path)
+        rows = state["rows"]
+        records = np.fromfile(spill_path, dtype=self._spill_dtype(), count=rows)
+        if len(records) < rows:
+            raise ValueError(
+                "Equity spill file %s holds %s of %s rows"
+                % (spill_path, len(records), rows)
+            )
+        with open(spill_path, "r+b") as spill_file:
+            spill_file.truncate(rows * self._spill_dtype().itemsize)
+        times = records["time"].view("datetime64[ns]") \
+            .astype("datetime64[us]").astype(object)
+        self.chunks = [(times, records["values"].copy())] if rows else []
+        self.chunked_rows = rows
+        self.spilled = rows
+        self._new_chunk()
+
+    def to_frame(self):
+        times, values = self.arrays()
+        return pd.DataFrame(
+            values, columns=self.columns,
+            index=pd.DatetimeIndex(pd.to_datetime(times), name="Timestamp")
+        )
+
+    def close(self):
+        if self.path is None:
+            return
+        if self.path.endswith(".parquet"):
+            self.to_frame().to_parquet(self.path)
+        else:
+            times, values = self.arrays()
+            np.savez(
+                self.path, times=pd.to_datetime(times).values,
+                values=values, columns=np.array(self.columns)
+            )
+
+
+class CSVEquityRecorder(EquityRecorder):
+    """
+    Scrive la curva di equity nel file CSV backtest.csv, come faceva
+    in precedenza il Portfolio (senza la stampa su stdout).
+    """
+
+    def __init__(
+        self, pairs, path, every_n_ticks=1, on_balance_change=False
+    ):
+        EquityRecorder.__init__(
+            self, pairs, every_n_ticks, on_balance_change
+        )
+        self.path = path
+        self.spilled = 0
+        self.out_file = open(path, "w")
+        self.out_file.write("Timestamp,%s\n" % ",".join(self.columns))
+
+    def _append(self, time, balance, profits):
+        self.out_file.write("%s,%s,%s\n" % (
+            time, balance, ",".join(["%s" % p for p in profits])
+        ))
+
+    def close(self):
+        if not self.out_file.closed:
+            self.out_file.close()
+
+    def get_state(self, spill_path):
+        """
+        Copia in spill_path le righe del file CSV scritte dopo il
+        checkpoint precedente: alla ripresa il file viene ricreato.
+        """
+        state = EquityRecorder.get_state(self, spill_path)
+        self.out_file.flush()
+        offset = self.out_file.tell()
+        with open(self.path, "rb") as out_file:
+            out_file.seek(self.spilled)
+            data = out_file.read(offset - self.spilled)
+        with open(spill_path, "ab" if self.spilled else "wb") as spill_file:
+            spill_file.write(data)
+            spill_file.flush()
+            os.fsync(spill_file.fileno())
+        self.spilled = state["offset"] = offset
+        return state
+
+    def set_state(self, state, spill_path):
+        EquityRecorder.set_state(self, state, spill_path)
+        self.out_file.close()
+        self.spilled = state["offset"]
+        with open(spill_path, "r+b") as spill_file:
+            data = spill_file.read(self.spilled)
+            if len(data) < self.spilled:
+                raise ValueError(
+                    "Equity spill file %s holds %s of %s bytes"
+                    % (spill_path, len(data), self.spilled)
+                )
+            spill_file.truncate(self.spilled)
+        with open(self.path, "wb") as out_file:
+            out_file.write(data)
+        self.out_file = open(self.path, "a")
+
+    def to_frame(self):
+        self.close()
+        df = pd.read_csv(self.path, index_col=0)
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.index), name="Timestamp")
+        return df
@@ -0,0 +1,326 @@
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import argparse
+import datetime
+import gc
+import json
+import multiprocessing
+import os, os.path
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from backtest import Backtest
+from data.price import HistoricCSVPriceHandler, HistoricBinaryPriceHandler
+from data.synthetic import SyntheticTickGenerator, trading_days
+from event import TickEvent, SignalEvent, OrderEvent
+from execution import SimulatedExecution
+from portfolio import Portfolio, NumpyEquityRecorder
+from settings import settings
+from strategy import MovingAverageCrossStrategy
+
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+
+
+class NullQueue(object):
+    """
+    Coda che scarta gli eventi, per misurare un solo componente.
+    """
+
+    def put(self, event, block=True, timeout=None):
+        pass
+
+
+class ListQueue(list):
+    """
+    Coda che conserva gli eventi in una lista.
+    """
+
+    def put(self, event, block=True, timeout=None):
+        self.append(event)
+
+
+def load_ticks(pairs, store_dir):
+    """
+    Legge tutti i TickEvent dall'archivio binario.
+    """
+    events = ListQueue()
+    ticker = HistoricBinaryPriceHandler(pairs, events, store_dir)
+    while ticker.continue_backtest:
+        ticker.stream_next_tick()
+    return events
+
+
+def bench_price_handler(handler, pairs, data_dir):
+    ticker = handler(pairs, NullQueue(), data_dir)
+    ticks = 0
+    start = time.perf_counter()
+    while ticker.continue_backtest:
+        ticker.stream_next_tick()
+        ticks += 1
+    return ticks - 1, time.perf_counter() - start
+
+
+def bench_strategy(pairs, data_dir, csv_dir):
+    ticks = load_ticks(pairs, data_dir)
+    strategy = MovingAverageCrossStrategy(pairs, NullQueue(), 500, 2000)
+    calculate_signals = strategy.calculate_signals
+    start = time.perf_counter()
+    for tick in ticks:
+        calculate_signals(tick)
+    return len(ticks), time.perf_counter() - start
+
+
+def bench_portfolio(pairs, data_dir, csv_dir):
+    """
+    Aggiornamento del PriceBook e del Portfolio ad ogni tick, con una
+    posizione aperta su ogni coppia.
+    """
+    ticks = load_ticks(pairs, data_dir)
+    ticker = HistoricBinaryPriceHandler(pairs, NullQueue(), data_dir)
+    portfolio = Portfolio(
+        ticker, NullQueue(), equity=settings.EQUITY, backtest=True,
+        recorder=NumpyEquityRecorder(pairs)
+    )
+    book = ticker.prices
+    ids = book.ids
+    opened = False
+    start = time.perf_counter()
+    for tick in ticks:
+        book.update(
+            ids[tick.instrument], tick.bid, tick.ask, tick.time,
+            tick.bid_volume, tick.ask_volume
+        )
+        if not opened and book.is_complete():
+            for pair in pairs:
+                portfolio.add_new_position(
+                    "long", pair, int(portfolio.trade_units), ticker
+                )
+            opened = True
+        portfolio.update_portfolio(tick)
+    return len(ticks), time.perf_counter() - start
+
+
+def bench_backtest(handler, fixed_point, pairs, data_dir, **kwargs):
+    backtest = Backtest(
+        pairs, handler, MovingAverageCrossStrategy,
+        {"short_window": 500, "long_window": 2000},
+        Portfolio, SimulatedExecution, equity=settings.EQUITY,
+        data_dir=data_dir, fixed_point=fixed_point,
+        portfolio_params={"recorder": NumpyEquityRecorder(pairs)},
+        **kwargs
+    )
+    start = time.perf_counter()
+    backtest.dispatcher.run_backtest(backtest.ticker)
+    return backtest.dispatcher.dispatched, time.perf_counter() - start
+
+
+def benchmarks(pairs, csv_dir, store_dir):
+    """
+    Restituisce i benchmark come dizionario nome -> funzione senza
+    argomenti che restituisce (numero di tick, secondi). Per il
+    backtest completo il conteggio comprende tutti gli eventi.
+    """
+    return {
+        "price_handler_csv": lambda: bench_price_handler(
+            HistoricCSVPriceHandler, pairs, csv_dir
+        ),
+        "price_handler_binary": lambda: bench_price_handler(
+            HistoricBinaryPriceHandler, pairs, store_dir
+        ),
+        "strategy": lambda: bench_strategy(pairs, store_dir, csv_dir),
+        "portfolio": lambda: bench_portfolio(pairs, store_dir, csv_dir),
+        "backtest": lambda: bench_backtest(
+            HistoricBinaryPriceHandler, False, pairs, store_dir
+        ),
+        "backtest_fixed_point": lambda: bench_backtest(
+            HistoricBinaryPriceHandler, True, pairs, store_dir
+        ),
+        "backtest_reuse_ticks": lambda: bench_backtest(
+            HistoricBinaryPriceHandler, True, pairs, store_dir,
+            reuse_ticks=True
+        ),
+    }
+
+
+def event_bytes(n=10000):
+    """
+    Memoria allocata in media per evento (in byte), misurata con
+    tracemalloc creando n eventi di ogni tipo.
+    """
+    now = datetime.datetime(2017, 1, 2)
+    factories = {
+        "TickEvent": lambda i: TickEvent("EURUSD", now, i, i + 20, 1.5, 2.5),
+        "SignalEvent": lambda i: SignalEvent("EURUSD", "market", "buy", now),
+        "OrderEvent": lambda i: OrderEvent("EURUSD", 1000, "market", "buy"),
+    }
+    sizes = {}
+    for name, factory in factories.items():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        events = [factory(i) for i in range(n)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # Si esclude la lista che contiene gli eventi
+        sizes[name] = round((after - before - sys.getsizeof(events)) / float(n), 1)
+        del events
+    return sizes
+
+
+def gc_collections():
+    return sum(s["collections"] for s in gc.get_stats())
+
+
+def _run_child(func, results):
+    try:
+        collections = gc_collections()
+        ticks, seconds = func()
+        collections = gc_collections() - collections
+    except Exception as e:
+        results.put(e)
+        raise
+    # ru_maxrss è in KB su Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    results.put((ticks, seconds, peak, collections))
+
+
+def run_isolated(func):
+    """
+    Esegue un benchmark in un processo separato, in modo che il picco
+    di memoria (RSS massimo) sia solo quello del benchmark.
+    """
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=_run_child, args=(func, results))
+    process.start()
+    result = results.get()
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    ticks, seconds, peak, collections = result
+    return {
+        "events": ticks,
+        "seconds": round(seconds, 4),
+        "events_per_sec": round(ticks / seconds, 1),
+        "peak_rss_mb": round(peak, 1),
+        "gc_collections": collections,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Confronta i risultati con la baseline e restituisce l'elenco
+    delle regressioni: throughput inferiore o memoria superiore
+    alla baseline oltre la tolleranza relativa.
+    """
+    regressions = []
+    if baseline.get("config") != results["config"]:
+        print("Warning: baseline was recorded with a different configuration")
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        speed = result["events_per_sec"] / base["events_per_sec"]
+        memory = result["peak_rss_mb"] / base["peak_rss_mb"]
+        print("%-22s speed x%.2f, memory x%.2f" % (name, speed, memory))
+        if speed < 1.0 - tolerance:
+            regressions.append("%s: throughput x%.2f" % (name, speed))
+        if memory > 1.0 + tolerance:
+            regressions.append("%s: peak memory x%.2f" % (name, memory))
+    for name, size in results.get("event_bytes", {}).items():
+        base = baseline.get("event_bytes", {}).get(name)
+        if base is None:
+            continue
+        print("%-22s %s bytes (baseline %s)" % (name, size, base))
+        if size > base * (1.0 + tolerance):
+            regressions.append("%s: %s bytes per event" % (name, size))
+    return regressions
+
+
+if __name__ == "__main__":
+    """
+    Suite di benchmark della pipeline: genera dati sintetici (CSV e
+    binari) in una directory temporanea e misura gli eventi al secondo
+    e il picco di memoria del gestore dei prezzi, della strategia, del
+    portfolio e del backtest completo, ognuno in un processo separato,
+    con il numero di raccolte del garbage collector e la memoria
+    allocata per ogni tipo di evento.
+
+    I risultati sono confrontati con la baseline salvata in
+    scripts/benchmark_baseline.json (registrata su una macchina di
+    riferimento: va rigenerata con --save-baseline quando si cambia
+    macchina); con regressioni oltre la tolleranza l'uscita è 1.
+
+    Uso: python scripts/benchmark.py [--pairs 2 --days 2]
+        [--only strategy,portfolio] [--save-baseline] [--output FILE]
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=2)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=1400)
+    parser.add_argument("--only", default=None)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    all_pairs = ["GBPUSD", "EURUSD", "USDJPY", "AUDUSD", "USDCHF", "USDCAD"]
+    pairs = all_pairs[:args.pairs]
+    start_prices = {
+        "GBPUSD": 1.25, "EURUSD": 1.10, "USDJPY": 110.0,
+        "AUDUSD": 0.75, "USDCHF": 1.0, "USDCAD": 1.30
+    }
+    config = {
+        "pairs": pairs, "days": args.days, "interval_ms": args.interval
+    }
+    tmp_dir = tempfile.mkdtemp(prefix="tqforex_bench_")
+    try:
+        csv_dir = os.path.join(tmp_dir, "csv")
+        store_dir = os.path.join(tmp_dir, "store")
+        generator = SyntheticTickGenerator(
+            pairs, start_prices, correlation=0.5,
+            mean_interval_ms=args.interval
+        )
+        start = time.perf_counter()
+        ticks = generator.write(
+            trading_days(datetime.date(2017, 1, 2), args.days),
+            csv_dir, store_dir
+        )
+        print("Generated %s ticks in %.2fs" % (ticks, time.perf_counter() - start))
+
+        results = {"config": config, "event_bytes": event_bytes(), "results": {}}
+        for name, size in results["event_bytes"].items():
+            print("%-22s %10.1f bytes/event" % (name, size))
+        for name, func in benchmarks(pairs, csv_dir, store_dir).items():
+            if args.only and name not in args.only.split(","):
+                continue
+            result = results["results"][name] = run_isolated(func)
+            print("%-22s %10.0f events/s  %8.3fs  peak %7.1f MB  gc %s" % (
+                name, result["events_per_sec"], result["seconds"],
+                result["peak_rss_mb"], result["gc_collections"]
+            ))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    if args.output is not None:
+        with open(args.output, "w") as out_file:
+            json.dump(results, out_file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as out_file:
+            json.dump(results, out_file, indent=2)
+        print("Baseline saved to %s" % args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as in_file:
+            regressions = compare(results, json.load(in_file), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against %s" % args.baseline)
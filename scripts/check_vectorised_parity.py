@@ -0,0 +1,73 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import sys
+
+import numpy as np
+
+from backtest import Backtest
+from backtest.vectorised import VectorisedBacktest
+from execution import SimulatedExecution
+from portfolio import Portfolio
+from settings import settings
+from strategy import MovingAverageCrossStrategy
+from data.price import HistoricCSVPriceHandler
+
+
+if __name__ == "__main__":
+    """
+    Esegue la MovingAverageCrossStrategy sugli stessi file CSV sia con il
+    motore event-driven che con il motore vettoriale e verifica che le
+    curve di equity (saldo e P&L per coppia) coincidano.
+
+    Richiede l'impostazione di CSV_DATA_DIR e OUTPUT_RESULTS_DIR.
+    Uso: python scripts/check_vectorised_parity.py [short_window long_window]
+    """
+    pairs = ["GBPUSD", "EURUSD"]
+    try:
+        short_window, long_window = int(sys.argv[1]), int(sys.argv[2])
+    except IndexError:
+        short_window, long_window = 500, 2000
+    strategy_params = {
+        "short_window": short_window,
+        "long_window": long_window
+    }
+
+    backtest = Backtest(
+        pairs, HistoricCSVPriceHandler,
+        MovingAverageCrossStrategy, strategy_params,
+        Portfolio, SimulatedExecution,
+        equity=settings.EQUITY
+    )
+    backtest._run_backtest()
+    backtest.portfolio.recorder.close()
+    event_curve = backtest.portfolio.recorder.to_frame()
+
+    vectorised = VectorisedBacktest(
+        pairs, settings.CSV_DATA_DIR, equity=settings.EQUITY,
+        **strategy_params
+    )
+    vector_curve = vectorised.simulate_trading()
+
+    # Confronta riga per riga il saldo e il P&L non realizzato
+    columns = ["Balance"] + pairs
+    diff = np.abs(
+        event_curve[columns].values.astype(float) - vector_curve[columns].values
+    )
+    event_total = event_curve[columns].sum(axis=1).values
+    vector_total = vector_curve[columns].sum(axis=1).values
+    print("Rows: event-driven %s, vectorised %s" % (
+        len(event_curve), len(vector_curve))
+    )
+    print("Final balance: event-driven %s, vectorised %0.2f" % (
+        event_curve["Balance"].iloc[-1], vector_curve["Balance"].iloc[-1])
+    )
+    print("Final total: event-driven %0.5f, vectorised %0.5f" % (
+        event_total[-1], vector_total[-1])
+    )
+    print("Max absolute difference: %0.5f" % diff.max())
+    if len(event_curve) != len(vector_curve) or diff.max() > 0.01:
+        print("Parity check FAILED")
+        sys.exit(1)
+    print("Parity check passed")
@@ -0,0 +1,26 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import sys
+
+from data.store import convert_csv_dir
+from settings import settings
+
+
+if __name__ == "__main__":
+    """
+    Converte una tantum i file CSV di tick presenti in CSV_DATA_DIR
+    nell'archivio binario colonnare in TICK_STORE_DIR. Vengono
+    riconvertiti solo i file CSV nuovi o modificati.
+
+    Uso: python scripts/convert_csv_to_store.py [--overwrite]
+    """
+    if settings.CSV_DATA_DIR is None or settings.TICK_STORE_DIR is None:
+        print("CSV_DATA_DIR and TICK_STORE_DIR must be set - conversion terminating.")
+        sys.exit()
+    written = convert_csv_dir(
+        settings.CSV_DATA_DIR, settings.TICK_STORE_DIR,
+        overwrite="--overwrite" in sys.argv[1:]
+    )
+    print("Converted %s files into %s" % (len(written), settings.TICK_STORE_DIR))
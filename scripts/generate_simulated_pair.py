@@ -1,16 +1,11 @@
-
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
+import argparse
 import calendar
-import copy
 import datetime
-import os, os.path
-import sys
-
-import numpy as np
-import pandas as pd
 
+from data.synthetic import SyntheticTickGenerator, trading_days
 from settings import settings
 
 
@@ -27,56 +22,42 @@ def month_weekdays(year_int, month_int):
 
 
 if __name__ == "__main__":
-    try:
-        pair = sys.argv[1]
-    except IndexError:
-        print("You need to enter a currency pair, e.g. EURUSD, as a command line parameter.")
-    else:
-        np.random.seed(42)  # Fix the randomness
+    """
+    Genera i file di tick simulati di una o più coppie, con random walk
+    correlate, in CSV_DATA_DIR (file CSV) e/o TICK_STORE_DIR (formato
+    binario). Per default si generano i giorni feriali di gennaio 2017.
 
-        S0 = 1.5000
-        spread = 0.002
-        mu_dt = 1400  # Millisecondi
-        sigma_dt = 100  # Millisecondi
-        ask = copy.deepcopy(S0) + spread / 2.0
-        bid = copy.deepcopy(S0) - spread / 2.0
+    Uso: python scripts/generate_simulated_pair.py EURUSD [GBPUSD ...]
+        [--days N --start YYYYMMDD] [--correlation RHO]
+        [--interval MS] [--format csv|binary|both]
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pairs", nargs="+")
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument("--start", default="20170102")
+    parser.add_argument("--correlation", type=float, default=0.0)
+    parser.add_argument("--interval", type=float, default=1400)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--format", choices=("csv", "binary", "both"), default="csv"
+    )
+    args = parser.parse_args()
+
+    if args.days is None:
         days = month_weekdays(2017, 1)  # Gennaio 2017
-        current_time = datetime.datetime(
-            days[0].year, days[0].month, days[0].day, 0, 0, 0,
+    else:
+        days = trading_days(
+            datetime.datetime.strptime(args.start, "%Y%m%d").date(), args.days
         )
-
-        # Ciclo su ogni giorno del mese e crea un file CSV
-        # per ogni giorno, es. "EURUSD_20170101.csv"
-        for d in days:
-            print(d.day)
-            current_time = current_time.replace(day=d.day)
-            outfile = open(
-                os.path.join(
-                    settings.CSV_DATA_DIR,
-                    "%s_%s.csv" % (
-                        pair, d.strftime("%Y%m%d")
-                    )
-                ),
-                "w")
-            outfile.write("Time,Ask,Bid,AskVolume,BidVolume\n")
-
-            # Crea una random walk per i prezzi bid/ask
-            # con spread fissi tra loro
-            while True:
-                dt = abs(np.random.normal(mu_dt, sigma_dt))
-                current_time += datetime.timedelta(0, 0, 0, dt)
-                if current_time.day != d.day:
-                    outfile.close()
-                    break
-                else:
-                    W = np.random.standard_normal() * dt / 1000.0 / 86400.0
-                    ask += W
-                    bid += W
-                    ask_volume = 1.0 + np.random.uniform(0.0, 2.0)
-                    bid_volume = 1.0 + np.random.uniform(0.0, 2.0)
-                    line = "%s,%s,%s,%s,%s\n" % (
-                        current_time.strftime("%d.%m.%Y %H:%M:%S.%f")[:-3],
-                        "%0.5f" % ask, "%0.5f" % bid,
-                        "%0.2f00" % ask_volume, "%0.2f00" % bid_volume
-                    )
-                    outfile.write(line)
+    csv_dir = settings.CSV_DATA_DIR if args.format != "binary" else None
+    store_dir = settings.TICK_STORE_DIR if args.format != "csv" else None
+    if (args.format != "binary" and csv_dir is None) or \
+            (args.format != "csv" and store_dir is None):
+        print("CSV_DATA_DIR and/or TICK_STORE_DIR must be set - generation terminating.")
+    else:
+        generator = SyntheticTickGenerator(
+            args.pairs, correlation=args.correlation,
+            mean_interval_ms=args.interval, seed=args.seed
+        )
+        ticks = generator.write(days, csv_dir, store_dir)
+        print("Generated %s ticks for %s days" % (ticks, len(days)))
@@ -0,0 +1,45 @@
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import argparse
+import os, os.path
+
+from performance import MonteCarlo, load_equity_returns
+from settings import settings
+
+
+if __name__ == "__main__":
+    """
+    Analisi di robustezza Monte Carlo dei rendimenti giornalieri del
+    file equity.csv scritto in OUTPUT_RESULTS_DIR al termine di un
+    backtest: stampa le distribuzioni di equity finale, massimo
+    drawdown e Sharpe ratio dei percorsi simulati con i relativi
+    intervalli di confidenza. La lunghezza dei blocchi è in giorni.
+
+    Uso: python scripts/montecarlo.py [--sims N] [--method block|resample]
+        [--block-size N] [--confidence 0.95] [--workers N]
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sims", type=int, default=10000)
+    parser.add_argument(
+        "--method", choices=("block", "resample"), default="block"
+    )
+    parser.add_argument("--block-size", type=int, default=20)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if settings.OUTPUT_RESULTS_DIR is None:
+        print("OUTPUT_RESULTS_DIR must be set - analysis terminating.")
+    else:
+        returns = load_equity_returns(
+            os.path.join(settings.OUTPUT_RESULTS_DIR, "equity.csv")
+        )
+        monte_carlo = MonteCarlo(
+            returns, method=args.method, n_sims=args.sims,
+            block_size=args.block_size, equity=float(settings.EQUITY),
+            max_workers=args.workers, seed=args.seed
+        )
+        print(monte_carlo.summary(args.confidence).to_string())
+        print("Probability of loss: %0.4f" % monte_carlo.prob_loss())
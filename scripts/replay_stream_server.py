@@ -0,0 +1,44 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import argparse
+import asyncio
+
+from data.replay import (
+    ReplayStreamServer, load_recorded_stream, stream_lines_from_csv
+)
+from settings import settings
+
+
+if __name__ == "__main__":
+    """
+    Avvia un server locale che riproduce uno stream dei prezzi,
+    registrato (--recording) oppure ricavato dai tick CSV di un giorno
+    in CSV_DATA_DIR (--date). Il trading live può essere puntato al
+    server con StreamingForexPrices(domain="127.0.0.1:porta",
+    secure=False, ...).
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording")
+    parser.add_argument("--date", help="YYYYMMDD")
+    parser.add_argument("--pairs", default="GBPUSD,EURUSD")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--interval", type=float, default=0.0)
+    parser.add_argument("--heartbeat-interval", type=float, default=5.0)
+    parser.add_argument("--disconnect-after", type=int)
+    args = parser.parse_args()
+
+    if args.recording:
+        lines = load_recorded_stream(args.recording)
+    else:
+        lines = stream_lines_from_csv(
+            settings.CSV_DATA_DIR, args.pairs.split(","), args.date
+        )
+    server = ReplayStreamServer(
+        lines, port=args.port, interval=args.interval,
+        heartbeat_interval=args.heartbeat_interval,
+        disconnect_after=args.disconnect_after
+    )
+    print("Replaying %s messages on %s" % (len(lines), server.domain))
+    asyncio.run(server.serve_forever())
@@ -21,6 +21,7 @@ ENVIRONMENTS = {
 
 CSV_DATA_DIR = os.environ.get('CSV_DATA_DIR', None)
 OUTPUT_RESULTS_DIR = os.environ.get('OUTPUT_RESULTS_DIR', None)
+TICK_STORE_DIR = os.environ.get('TICK_STORE_DIR', None)
 
 DOMAIN = "practice"
 STREAM_DOMAIN = ENVIRONMENTS["streaming"][DOMAIN]
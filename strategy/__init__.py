@@ -1,2 +1,2 @@
 from .strategy import *
-from events import *
\ No newline at end of file
+from .host import *
\ No newline at end of file
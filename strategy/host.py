@@ -0,0 +1,197 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import logging
+import os
+
+import pandas as pd
+
+from data.bars import BarAggregator
+from event.dispatcher import EventRouter
+
+from settings import OUTPUT_RESULTS_DIR
+
+
+class StrategyQueue(object):
+    """
+    Vista della coda degli eventi condivisa assegnata a una strategia
+    e al suo sotto-portfolio: ogni segnale o ordine inserito viene
+    marcato con lo strategy_id, così il StrategyHost può restituire
+    segnali ed esecuzioni al portfolio corretto.
+    """
+
+    def __init__(self, events, strategy_id):
+        self.events = events
+        self.strategy_id = strategy_id
+
+    def put(self, event, block=True, timeout=None):
+        if getattr(event, "strategy_id", False) is None:
+            event.strategy_id = self.strategy_id
+        self.events.put(event, block, timeout)
+
+    def __getattr__(self, name):
+        return getattr(self.events, name)
+
+
+class StrategyHost(object):
+    """
+    Esegue più strategie nello stesso processo sullo stesso flusso di
+    prezzi. Ogni strategia ha un sotto-portfolio con saldo, posizioni e
+    P&L propri, mentre i prezzi e il gestore di esecuzione sono
+    condivisi.
+
+    I tick sono instradati solo alle strategie (e ai portfolio)
+    sottoscritti al loro strumento tramite una tabella precalcolata
+    (vedi event.dispatcher.EventRouter); le strategie con un attributo
+    timeframes ricevono invece le barre chiuse, costruite da un unico
+    BarAggregator.
+
+    Lo StrategyHost espone gli stessi metodi di una strategia e di un
+    Portfolio (calculate_signals, update_portfolio, execute_signal,
+    execute_fill), per cui si registra nel dispatcher al loro posto.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.strategies = {}
+        self.portfolios = {}
+        self.tick_router = EventRouter()
+        self.bar_router = EventRouter()
+        self.portfolio_router = EventRouter()
+        self.bar_timeframes = set()
+        self.bar_instruments = set()
+        self.bars = None
+        self.logger = logging.getLogger(__name__)
+
+    def queue(self, strategy_id):
+        """
+        Restituisce la coda con cui creare la strategia e il
+        sotto-portfolio strategy_id.
+        """
+        return StrategyQueue(self.events, strategy_id)
+
+    def add_strategy(self, strategy_id, strategy, portfolio, instruments=None):
+        """
+        Registra una strategia e il suo sotto-portfolio, entrambi
+        creati con la coda restituita da queue(strategy_id).
+        instruments sono gli strumenti a cui la strategia è
+        sottoscritta: per default le sue coppie (strategy.pairs).
+        """
+        if strategy_id in self.strategies:
+            raise ValueError("Strategy %s already added" % strategy_id)
+        if instruments is None:
+            instruments = getattr(strategy, "pairs", None)
+        self.strategies[strategy_id] = strategy
+        self.portfolios[strategy_id] = portfolio
+        timeframes = getattr(strategy, "timeframes", None)
+        if timeframes:
+            self.bar_router.subscribe(
+                strategy.calculate_signals, instruments, timeframes
+            )
+            self.bar_timeframes.update(timeframes)
+            if instruments is None:
+                self.bar_instruments = None
+            elif self.bar_instruments is not None:
+                self.bar_instruments.update(instruments)
+            self.bars = BarAggregator(
+                self.events, sorted(self.bar_timeframes), self.bar_instruments
+            )
+        else:
+            self.tick_router.subscribe(strategy.calculate_signals, instruments)
+        self.portfolio_router.subscribe(portfolio.update_portfolio, instruments)
+
+    def calculate_signals(self, event):
+        if event.type == 'TICK':
+            if self.bars is not None:
+                self.bars.on_tick(event)
+            for handler in self.tick_router.handlers(event.instrument):
+                handler(event)
+        elif event.type == 'BAR':
+            self.bar_router.route(event)
+
+    def flush(self):
+        """
+        Emette le barre ancora aperte alla fine dei dati.
+        """
+        if self.bars is not None:
+            self.bars.flush()
+
+    def update_portfolio(self, tick_event):
+        for handler in self.portfolio_router.handlers(tick_event.instrument):
+            handler(tick_event)
+
+    def execute_signal(self, signal_event):
+        self.portfolios[signal_event.strategy_id].execute_signal(signal_event)
+
+    def execute_fill(self, fill_event):
+        portfolio = self.portfolios.get(fill_event.strategy_id)
+        if portfolio is None:
+            self.logger.warning(
+                "Fill of unknown strategy %s ignored", fill_event.strategy_id
+            )
+            return
+        portfolio.execute_fill(fill_event)
+
+    def get_state(self, directory):
+        """
+        Restituisce lo stato di tutte le strategie e dei sotto-portfolio
+        (vedi Portfolio.get_state) e le barre aperte, per i checkpoint
+        del backtest.
+        """
+        return {
+            "strategies": dict(
+                (strategy_id, strategy.get_state())
+                for strategy_id, strategy in self.strategies.items()
+            ),
+            "portfolios": dict(
+                (strategy_id, portfolio.get_state(
+                    directory, "portfolio_%s" % strategy_id
+                )) for strategy_id, portfolio in self.portfolios.items()
+            ),
+            "bars": self.bars.get_state() if self.bars is not None else None
+        }
+
+    def set_state(self, state, directory):
+        for strategy_id, strategy in self.strategies.items():
+            strategy.set_state(state["strategies"][strategy_id])
+        for strategy_id, portfolio in self.portfolios.items():
+            portfolio.set_state(
+                state["portfolios"][strategy_id], directory,
+                "portfolio_%s" % strategy_id
+            )
+        if self.bars is not None:
+            self.bars.set_state(state["bars"])
+
+    def pnl(self):
+        """
+        Restituisce un DataFrame con una riga per strategia: saldo,
+        P&L non realizzato, equity e numero di operazioni chiuse.
+        """
+        rows = []
+        for strategy_id, portfolio in self.portfolios.items():
+            balance = portfolio._float_money(portfolio.balance)
+            unrealised = sum(
+                portfolio._float_money(ps.profit_base)
+                for ps in portfolio.positions.values()
+            )
+            rows.append((
+                strategy_id, balance, unrealised, balance + unrealised,
+                len(portfolio.trade_pnls)
+            ))
+        return pd.DataFrame(
+            rows, columns=["Strategy", "Balance", "Unrealised", "Equity", "Trades"]
+        ).set_index("Strategy")
+
+    def output_results(self):
+        """
+        Completa le curve di equity dei sotto-portfolio e stampa
+        ed esporta in strategies.csv il P&L di ogni strategia.
+        """
+        for portfolio in self.portfolios.values():
+            if portfolio.backtest:
+                portfolio.recorder.close()
+        pnl = self.pnl()
+        print(pnl.to_string())
+        if OUTPUT_RESULTS_DIR is not None:
+            pnl.to_csv(os.path.join(OUTPUT_RESULTS_DIR, "strategies.csv"))
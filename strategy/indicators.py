@@ -0,0 +1,524 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from collections import deque
+from decimal import Decimal, ROUND_HALF_EVEN
+import math
+
+import numpy as np
+
+from fixedpoint import PRICE_SCALE
+
+
+# Indicatori in streaming con aggiornamento O(1) per tick e le
+# corrispondenti funzioni batch su array NumPy per il backtest
+# vettoriale. Le funzioni batch eseguono le stesse operazioni in
+# virgola mobile nello stesso ordine, per cui i risultati coincidono
+# bit per bit con quelli degli oggetti in streaming.
+#
+# Le somme mobili (SMA, deviazione standard, VWAP) sono calcolate su
+# interi in punto fisso e sono quindi esatte; gli indicatori ricorsivi
+# (EMA, ATR, RSI) hanno uno stato float e la versione batch applica la
+# stessa ricorsione con np.frompyfunc(...).accumulate.
+#
+# I prezzi possono essere Decimal, float o interi: gli interi sono
+# considerati già in punto fisso (pipette, vedi il modulo fixedpoint).
+# I valori restituiti sono float nell'unità dei prezzi e sono NaN
+# fino a quando la finestra non è completa.
+
+VOLUME_SCALE = 10000
+
+
+def to_fixed(value, scale=PRICE_SCALE):
+    """
+    Converte un prezzo in intero in punto fisso.
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, Decimal):
+        return int((value * scale).to_integral_value(ROUND_HALF_EVEN))
+    return int(round(value * scale))
+
+
+def to_fixed_array(values, scale=PRICE_SCALE):
+    """
+    Versione su array di to_fixed, restituisce un array int64.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64)
+    if values.dtype == object:
+        return np.array([to_fixed(v, scale) for v in values], dtype=np.int64)
+    return np.rint(values * scale).astype(np.int64)
+
+
+def _rolling_sum(values, window):
+    """
+    Somma mobile esatta di un array intero come differenza delle
+    somme cumulate.
+    """
+    total = np.cumsum(values)
+    total[window:] = total[window:] - total[:-window]
+    return total
+
+
+def _accumulate(step, first, values):
+    """
+    Applica la ricorsione step(stato, valore) partendo da first e
+    restituisce tutti gli stati, con le stesse operazioni float di un
+    ciclo Python.
+    """
+    items = np.empty(len(values) + 1, dtype=object)
+    items[0] = first
+    items[1:] = [float(v) for v in values]
+    return np.frompyfunc(step, 2, 1).accumulate(items).astype(float)
+
+
+class RingBuffer(object):
+    """
+    Buffer circolare di dimensione fissa: push() inserisce un valore e
+    restituisce quello uscito dalla finestra (0 finché non è piena).
+    """
+    __slots__ = ("size", "items", "pos", "count")
+
+    def __init__(self, size):
+        self.size = size
+        self.items = [0] * size
+        self.pos = 0
+        self.count = 0
+
+    def push(self, value):
+        old = self.items[self.pos]
+        self.items[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count += 1
+        return old
+
+    def full(self):
+        return self.count >= self.size
+
+
+class SMA(object):
+    """
+    Media mobile semplice esatta sugli ultimi window prezzi.
+    """
+
+    def __init__(self, window, scale=PRICE_SCALE):
+        self.window = window
+        self.scale = scale
+        self.divisor = float(window * scale)
+        self.buffer = RingBuffer(window)
+        self.total = 0
+        self.value = math.nan
+
+    @property
+    def ready(self):
+        return self.buffer.full()
+
+    def update(self, price):
+        x = to_fixed(price, self.scale)
+        self.total += x - self.buffer.push(x)
+        if self.buffer.full():
+            self.value = float(self.total) / self.divisor
+        return self.value
+
+
+def sma(prices, window, scale=PRICE_SCALE):
+    x = to_fixed_array(prices, scale)
+    out = _rolling_sum(x, window).astype(float) / float(window * scale)
+    out[:window - 1] = math.nan
+    return out
+
+
+class EMA(object):
+    """
+    Media mobile esponenziale con alpha = 2 / (window + 1), oppure
+    con l'alpha indicato. Il primo valore è il primo prezzo.
+    """
+
+    def __init__(self, window=None, alpha=None, scale=PRICE_SCALE):
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.scale = scale
+        self.value = math.nan
+        self.count = 0
+
+    @property
+    def ready(self):
+        return self.count > 0
+
+    def update(self, price):
+        x = to_fixed(price, self.scale) / self.scale
+        if self.count == 0:
+            self.value = x
+        else:
+            self.value = self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.value
+
+
+def ema(prices, window=None, alpha=None, scale=PRICE_SCALE, initial=None):
+    """
+    initial è l'eventuale valore della EMA prima del primo prezzo,
+    per proseguire il calcolo su un nuovo blocco di dati.
+    """
+    alpha = alpha if alpha is not None else 2.0 / (window + 1)
+    x = to_fixed_array(prices, scale) / scale
+    if len(x) == 0:
+        return x
+
+    def step(value, price):
+        return value + alpha * (price - value)
+
+    if initial is None:
+        return _accumulate(step, float(x[0]), x[1:])
+    return _accumulate(step, float(initial), x)[1:]
+
+
+class RollingStd(object):
+    """
+    Media e deviazione standard (della popolazione) sugli ultimi
+    window prezzi, da somme intere esatte dei prezzi e dei quadrati.
+    """
+
+    def __init__(self, window, scale=PRICE_SCALE):
+        self.window = window
+        self.scale = scale
+        self.divisor = float(window * scale)
+        self.buffer = RingBuffer(window)
+        self.total = 0
+        self.total_sq = 0
+        self.mean = math.nan
+        self.value = math.nan
+
+    @property
+    def ready(self):
+        return self.buffer.full()
+
+    def update(self, price):
+        x = to_fixed(price, self.scale)
+        old = self.buffer.push(x)
+        self.total += x - old
+        self.total_sq += x * x - old * old
+        if self.buffer.full():
+            w = self.window
+            var_num = w * self.total_sq - self.total * self.total
+            self.mean = float(self.total) / self.divisor
+            self.value = math.sqrt(float(var_num) / float(w * w)) / self.scale
+        return self.value
+
+
+def _rolling_mean_std(prices, window, scale):
+    x = to_fixed_array(prices, scale)
+    if len(x):
+        # La varianza non dipende da una traslazione, per cui si
+        # sottrae il primo prezzo per evitare overflow nei quadrati
+        x = x - x[0]
+        total = _rolling_sum(x, window)
+        total_sq = _rolling_sum(x * x, window)
+        var_num = window * total_sq - total * total
+        offset = to_fixed_array(prices[:1], scale)[0]
+        mean = (total + window * offset).astype(float) / float(window * scale)
+        std = np.sqrt(var_num.astype(float) / float(window * window)) / scale
+    else:
+        mean = std = np.empty(0)
+    mean[:window - 1] = math.nan
+    std[:window - 1] = math.nan
+    return mean, std
+
+
+def rolling_std(prices, window, scale=PRICE_SCALE):
+    return _rolling_mean_std(prices, window, scale)[1]
+
+
+class BollingerBands(object):
+    """
+    Bande di Bollinger: media mobile e media +/- k deviazioni standard.
+    update() restituisce la tupla (media, banda superiore, inferiore).
+    """
+
+    def __init__(self, window, k=2.0, scale=PRICE_SCALE):
+        self.k = k
+        self.std = RollingStd(window, scale)
+        self.value = (math.nan, math.nan, math.nan)
+
+    @property
+    def ready(self):
+        return self.std.ready
+
+    def update(self, price):
+        std = self.std.update(price)
+        mean = self.std.mean
+        self.value = (mean, mean + self.k * std, mean - self.k * std)
+        return self.value
+
+
+def bollinger_bands(prices, window, k=2.0, scale=PRICE_SCALE):
+    mean, std = _rolling_mean_std(prices, window, scale)
+    return mean, mean + k * std, mean - k * std
+
+
+class ATR(object):
+    """
+    Average True Range di Wilder. Con i tick si passa solo il prezzo
+    (massimo, minimo e chiusura coincidono); con le barre si passano
+    massimo, minimo e chiusura.
+    """
+
+    def __init__(self, window=14, scale=PRICE_SCALE):
+        self.window = window
+        self.scale = scale
+        self.prev_close = None
+        self.count = 0
+        self.total = 0
+        self.value = math.nan
+
+    @property
+    def ready(self):
+        return self.count >= self.window
+
+    def update(self, high, low=None, close=None):
+        high = to_fixed(high, self.scale)
+        low = high if low is None else to_fixed(low, self.scale)
+        close = high if close is None else to_fixed(close, self.scale)
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(
+                high - low, abs(high - self.prev_close),
+                abs(low - self.prev_close)
+            )
+        self.prev_close = close
+        self.count += 1
+        w = self.window
+        if self.count < w:
+            self.total += tr
+        elif self.count == w:
+            self.total += tr
+            self.value = float(self.total) / float(w * self.scale)
+        else:
+            self.value = (self.value * (w - 1) + tr / self.scale) / w
+        return self.value
+
+
+def atr(high, low=None, close=None, window=14, scale=PRICE_SCALE):
+    high = to_fixed_array(high, scale)
+    low = high if low is None else to_fixed_array(low, scale)
+    close = high if close is None else to_fixed_array(close, scale)
+    n = len(high)
+    out = np.full(n, math.nan)
+    if n < window:
+        return out
+    tr = high - low
+    prev = close[:-1]
+    tr[1:] = np.maximum(
+        tr[1:], np.maximum(np.abs(high[1:] - prev), np.abs(low[1:] - prev))
+    )
+
+    def step(value, tr_price):
+        return (value * (window - 1) + tr_price) / window
+
+    seed = float(tr[:window].sum()) / float(window * scale)
+    out[window - 1:] = _accumulate(step, seed, tr[window:] / scale)
+    return out
+
+
+class RSI(object):
+    """
+    Relative Strength Index di Wilder sugli ultimi window movimenti.
+    Vale 100 senza movimenti al ribasso e 50 senza alcun movimento.
+    """
+
+    def __init__(self, window=14, scale=PRICE_SCALE):
+        self.window = window
+        self.scale = scale
+        self.prev = None
+        self.count = 0
+        self.gain_total = 0
+        self.loss_total = 0
+        self.avg_gain = math.nan
+        self.avg_loss = math.nan
+        self.value = math.nan
+
+    @property
+    def ready(self):
+        return self.count >= self.window
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        if avg_loss == 0.0:
+            return 50.0 if avg_gain == 0.0 else 100.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def update(self, price):
+        x = to_fixed(price, self.scale)
+        if self.prev is None:
+            self.prev = x
+            return self.value
+        change = x - self.prev
+        self.prev = x
+        gain, loss = max(change, 0), max(-change, 0)
+        self.count += 1
+        w = self.window
+        if self.count < w:
+            self.gain_total += gain
+            self.loss_total += loss
+            return self.value
+        if self.count == w:
+            self.avg_gain = float(self.gain_total + gain) / w
+            self.avg_loss = float(self.loss_total + loss) / w
+        else:
+            self.avg_gain = (self.avg_gain * (w - 1) + gain) / w
+            self.avg_loss = (self.avg_loss * (w - 1) + loss) / w
+        self.value = self._rsi(self.avg_gain, self.avg_loss)
+        return self.value
+
+
+def rsi(prices, window=14, scale=PRICE_SCALE):
+    x = to_fixed_array(prices, scale)
+    out = np.full(len(x), math.nan)
+    change = np.diff(x)
+    if len(change) < window:
+        return out
+    gain = np.maximum(change, 0)
+    loss = np.maximum(-change, 0)
+
+    def step(value, move):
+        return (value * (window - 1) + move) / window
+
+    avg_gain = _accumulate(
+        step, float(gain[:window].sum()) / window, gain[window:]
+    )
+    avg_loss = _accumulate(
+        step, float(loss[:window].sum()) / window, loss[window:]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    value = np.where(
+        avg_loss == 0.0, np.where(avg_gain == 0.0, 50.0, 100.0), value
+    )
+    out[window:] = value
+    return out
+
+
+class VWAP(object):
+    """
+    Prezzo medio ponderato per il volume dei tick, sugli ultimi window
+    tick oppure cumulato (window=None) fino a reset(), ad esempio per
+    sessione. I volumi sono convertiti in punto fisso con 4 decimali.
+    """
+
+    def __init__(self, window=None, scale=PRICE_SCALE):
+        self.window = window
+        self.scale = scale
+        self.reset()
+
+    def reset(self):
+        if self.window:
+            self.buffer = RingBuffer(self.window)
+            self.volumes = RingBuffer(self.window)
+        self.total_pv = 0
+        self.total_volume = 0
+        self.value = math.nan
+
+    @property
+    def ready(self):
+        return self.buffer.full() if self.window else self.total_volume > 0
+
+    def update(self, price, volume):
+        x = to_fixed(price, self.scale)
+        v = to_fixed(volume, VOLUME_SCALE)
+        pv = x * v
+        if self.window:
+            self.total_pv += pv - self.buffer.push(pv)
+            self.total_volume += v - self.volumes.push(v)
+        else:
+            self.total_pv += pv
+            self.total_volume += v
+        if self.ready and self.total_volume:
+            self.value = float(self.total_pv) / float(self.total_volume) / self.scale
+        else:
+            self.value = math.nan
+        return self.value
+
+
+def vwap(prices, volumes, window=None, scale=PRICE_SCALE):
+    x = to_fixed_array(prices, scale)
+    v = to_fixed_array(volumes, VOLUME_SCALE)
+    pv = x * v
+    if window:
+        total_pv = _rolling_sum(pv, window)
+        total_volume = _rolling_sum(v, window)
+    else:
+        total_pv = np.cumsum(pv)
+        total_volume = np.cumsum(v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = total_pv.astype(float) / total_volume.astype(float) / scale
+    out[total_volume == 0] = math.nan
+    if window:
+        out[:window - 1] = math.nan
+    return out
+
+
+class _RollingExtreme(object):
+    """
+    Minimo o massimo mobile con una deque monotona: ogni prezzo entra
+    ed esce dalla deque al più una volta, per un costo O(1)
+    ammortizzato. Finché la finestra non è piena si considerano i
+    prezzi disponibili.
+    """
+
+    def __init__(self, window, scale=PRICE_SCALE):
+        self.window = window
+        self.scale = scale
+        self.items = deque()
+        self.count = 0
+        self.value = math.nan
+
+    @property
+    def ready(self):
+        return self.count >= self.window
+
+    def _dominates(self, new, old):
+        raise NotImplementedError("Should implement _dominates()")
+
+    def update(self, price):
+        x = to_fixed(price, self.scale)
+        items = self.items
+        while items and self._dominates(x, items[-1][1]):
+            items.pop()
+        items.append((self.count, x))
+        if items[0][0] <= self.count - self.window:
+            items.popleft()
+        self.count += 1
+        self.value = items[0][1] / self.scale
+        return self.value
+
+
+class RollingMin(_RollingExtreme):
+    def _dominates(self, new, old):
+        return new <= old
+
+
+class RollingMax(_RollingExtreme):
+    def _dominates(self, new, old):
+        return new >= old
+
+
+def _rolling_extreme(prices, window, scale, ufunc):
+    x = to_fixed_array(prices, scale)
+    out = np.empty(len(x), dtype=np.int64)
+    head = min(window - 1, len(x))
+    out[:head] = ufunc.accumulate(x[:head])
+    if len(x) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(x, window)
+        out[window - 1:] = ufunc.reduce(windows, axis=1)
+    return out / scale
+
+
+def rolling_min(prices, window, scale=PRICE_SCALE):
+    return _rolling_extreme(prices, window, scale, np.minimum)
+
+
+def rolling_max(prices, window, scale=PRICE_SCALE):
+    return _rolling_extreme(prices, window, scale, np.maximum)
@@ -2,10 +2,12 @@
 # codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
 # https://tradingquant.it/corsi/trading-automatico-sul-forex/
 
-import random, copy
+import random
 
 from event import OrderEvent
 
+from .indicators import SMA
+
 
 class TestRandomStrategy(object):
     def __init__(self, instrument, units, events):
@@ -61,58 +63,63 @@ class MovingAverageCrossStrategy(object):
     ordine di vendita) quando la SMA lunga incrocia nuovamente
     la SMA breve.
 
-    La strategia utilizza un calcolo SMA a rotazione per
-    aumentare l'efficienza eliminando la necessità di chiamare due
-    calcoli della media mobile completa su ogni tick.
+    Le SMA sono esatte e aggiornate in O(1) per tick con gli
+    indicatori in streaming di strategy.indicators (buffer circolare
+    e somma mobile in punto fisso), per cui coincidono con quelle
+    calcolate in blocco dal backtest vettoriale.
+
+    Se si indica un timeframe (es. "1min") la strategia lavora sui
+    prezzi di chiusura delle barre invece che sui tick e le finestre
+    sono espresse in barre.
     """
     def __init__(
             self, pairs, events,
-            short_window=500, long_window=2000
+            short_window=500, long_window=2000, timeframe=None
     ):
         self.pairs = pairs
-        self.pairs_dict = self.create_pairs_dict()
         self.events = events
         self.short_window = short_window
         self.long_window = long_window
+        if timeframe is not None:
+            self.timeframes = [timeframe]
+        self.pairs_dict = self.create_pairs_dict()
 
     def create_pairs_dict(self):
-        attr_dict = {
-            "ticks": 0,
-            "invested": False,
-            "short_sma": None,
-            "long_sma": None
-        }
         pairs_dict = {}
         for p in self.pairs:
-            pairs_dict[p] = copy.deepcopy(attr_dict)
+            pairs_dict[p] = {
+                "ticks": 0,
+                "invested": False,
+                "short_sma": SMA(self.short_window),
+                "long_sma": SMA(self.long_window)
+            }
         return pairs_dict
 
-    def calc_rolling_sma(self, sma_m_1, window, price):
-        return ((sma_m_1 * (window - 1)) + price) / window
-
     def calculate_signals(self, event):
-        if event.type == 'TICK':
+        if event.type in ('TICK', 'BAR'):
             pair = event.instrument
-            price = event.bid
+            price = event.bid if event.type == 'TICK' else event.close
             pd = self.pairs_dict[pair]
-            if pd["ticks"] == 0:
-                pd["short_sma"] = price
-                pd["long_sma"] = price
-            else:
-                pd["short_sma"] = self.calc_rolling_sma(
-                    pd["short_sma"], self.short_window, price
-                )
-                pd["long_sma"] = self.calc_rolling_sma(
-                    pd["long_sma"], self.long_window, price
-                )
-            # Si avvia la strategia solamente dopo aver creato una accurata finestra di breve periodo
-            if pd["ticks"] > self.short_window:
-                if pd["short_sma"] > pd["long_sma"] and not pd["invested"]:
+            short_sma = pd["short_sma"].update(price)
+            long_sma = pd["long_sma"].update(price)
+            # Si avvia la strategia solamente quando entrambe le finestre sono complete
+            if pd["short_sma"].ready and pd["long_sma"].ready:
+                if short_sma > long_sma and not pd["invested"]:
                     signal = SignalEvent(pair, "market", "buy", event.time)
                     self.events.put(signal)
                     pd["invested"] = True
-                if pd["short_sma"] < pd["long_sma"] and pd["invested"]:
+                if short_sma < long_sma and pd["invested"]:
                     signal = SignalEvent(pair, "market", "sell", event.time)
                     self.events.put(signal)
                     pd["invested"] = False
             pd["ticks"] += 1
+
+    def get_state(self):
+        """
+        Restituisce lo stato delle medie mobili e delle posizioni di
+        ogni coppia, per i checkpoint del backtest.
+        """
+        return {"pairs_dict": self.pairs_dict}
+
+    def set_state(self, state):
+        self.pairs_dict = state["pairs_dict"]
@@ -0,0 +1,116 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import datetime
+from decimal import Decimal
+import queue
+
+from data.pricebook import PriceBook
+from event import SignalEvent, TickEvent
+from execution import SimulatedExecution
+from fixedpoint import pipettes_from_str
+from portfolio import Portfolio
+
+
+class SimulatedMarket(object):
+    """
+    Mercato di prova su GBPUSD per i test di SimulatedExecution e
+    Portfolio: fa anche da ticker (prices, pairs, fixed_point) e
+    distribuisce gli eventi nello stesso ordine del backtest, cioè
+    esecuzione, segnali della strategia, portfolio e poi la coda degli
+    eventi fino al suo svuotamento.
+
+    Con fill_events=False il portfolio esegue gli ordini al prezzo
+    corrente e il simulatore non riceve la coda degli eventi.
+    """
+
+    def __init__(
+        self, fill_events=True, fixed_point=False, spread="0.00010",
+        **execution_params
+    ):
+        self.pairs = ["GBPUSD"]
+        self.fixed_point = fixed_point
+        self.prices = PriceBook(self.pairs, fixed_point)
+        self.spread = self.price(spread)
+        self.time = datetime.datetime(2017, 1, 2, 8)
+        self.events = queue.Queue()
+        if fill_events:
+            self.execution = SimulatedExecution(
+                self.events, self, **execution_params
+            )
+        else:
+            self.execution = SimulatedExecution()
+        self.portfolio = Portfolio(
+            self, self.events, backtest=False, fill_events=fill_events
+        )
+        self.orders = []
+        self.fills = []
+
+    def price(self, value):
+        if value is None:
+            return None
+        if self.fixed_point:
+            return pipettes_from_str(value)
+        return Decimal(value)
+
+    def signal(
+        self, order_type, side, price=None, take_profit=None, stop_loss=None
+    ):
+        return SignalEvent(
+            "GBPUSD", order_type, side, self.time, self.price(price),
+            self.price(take_profit), self.price(stop_loss)
+        )
+
+    def tick(self, bid, signals=(), volume=None, ask_volume=None, ms=1000):
+        """
+        Nuovo tick con il bid indicato (l'ask è bid + spread) e i
+        segnali della strategia per questo tick. Senza ask_volume il
+        volume all'ask è uguale a quello al bid.
+        """
+        self.time += datetime.timedelta(milliseconds=ms)
+        bid = self.price(bid)
+        ask = bid + self.spread
+        if ask_volume is None:
+            ask_volume = volume
+        self.prices.update(0, bid, ask, self.time, volume, ask_volume)
+        tick = TickEvent("GBPUSD", self.time, bid, ask, volume, ask_volume)
+        self.execution.on_tick(tick)
+        for signal in signals:
+            self.events.put(signal)
+        self.portfolio.update_portfolio(tick)
+        self.process_events()
+
+    def ticks(self, bid, count, **kwargs):
+        for i in range(count):
+            self.tick(bid, **kwargs)
+
+    def process_events(self):
+        while not self.events.empty():
+            event = self.events.get(False)
+            if event.type == "SIGNAL":
+                self.portfolio.execute_signal(event)
+            elif event.type == "ORDER":
+                self.orders.append(event)
+                self.execution.execute_order(event)
+            elif event.type == "FILL":
+                self.fills.append(event)
+                self.portfolio.execute_fill(event)
+
+    def units(self):
+        ps = self.portfolio.positions.get("GBPUSD")
+        return int(ps.units) if ps is not None else 0
+
+    def is_flat(self):
+        """
+        True se non restano posizioni, livelli di uscita né ordini
+        presso il simulatore.
+        """
+        portfolio, execution = self.portfolio, self.execution
+        return (
+            not portfolio.positions and not portfolio.brackets and
+            not portfolio.bracket_exits and
+            not portfolio.bracket_replacements and
+            not len(execution.pending) and not execution.delayed and
+            not any(execution.working.values())
+        )
@@ -0,0 +1,248 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+import unittest
+
+from simulation import SimulatedMarket
+
+
+class BracketTests(object):
+    """
+    Livelli di take profit e stop loss del Portfolio, verificati sia
+    con l'esecuzione al prezzo corrente che con i FillEvent del
+    SimulatedExecution (vedi le sottoclassi).
+    """
+
+    fill_events = None
+
+    def create_market(self, **kwargs):
+        return SimulatedMarket(fill_events=self.fill_events, **kwargs)
+
+    def open_position(self, market, side="buy"):
+        if side == "buy":
+            take_profit, stop_loss = "1.25050", "1.24920"
+        else:
+            take_profit, stop_loss = "1.24920", "1.25050"
+        market.tick("1.25000", signals=[market.signal(
+            "market", side, take_profit=take_profit, stop_loss=stop_loss
+        )])
+        self.assertEqual(market.units(), 2000)
+        self.assertEqual(len(market.portfolio.pending), 2)
+
+    def assert_closed(self, market, trades=1):
+        self.assertTrue(market.is_flat())
+        self.assertEqual(len(market.portfolio.pending), 0)
+        self.assertEqual(len(market.portfolio.trade_pnls), trades)
+
+    def test_take_profit(self):
+        market = self.create_market()
+        self.open_position(market)
+        market.tick("1.25040")
+        self.assertEqual(market.units(), 2000)
+        market.tick("1.25050")
+        self.assert_closed(market)
+        self.assertGreater(market.portfolio.trade_pnls[0], 0)
+
+    def test_stop_loss(self):
+        market = self.create_market()
+        self.open_position(market)
+        market.tick("1.24930")
+        self.assertEqual(market.units(), 2000)
+        market.tick("1.24900")
+        self.assert_closed(market)
+        self.assertLess(market.portfolio.trade_pnls[0], 0)
+
+    def test_short_position_levels(self):
+        market = self.create_market()
+        self.open_position(market, "sell")
+        # Per una posizione short i livelli sono confrontati con l'ask
+        market.tick("1.24920")
+        self.assertEqual(market.units(), 2000)
+        market.tick("1.24910")
+        self.assert_closed(market)
+        self.assertGreater(market.portfolio.trade_pnls[0], 0)
+
+    def test_take_profit_cancels_stop_loss(self):
+        market = self.create_market()
+        self.open_position(market)
+        market.tick("1.25060")
+        self.assert_closed(market)
+        market.ticks("1.24800", 3)
+        self.assert_closed(market)
+
+    def test_add_units_then_take_profit(self):
+        market = self.create_market()
+        self.open_position(market)
+        market.tick("1.25010", signals=[market.signal("market", "buy")])
+        self.assertEqual(market.units(), 4000)
+        market.tick("1.25050")
+        self.assert_closed(market)
+
+    def test_cancel_resting_entries(self):
+        market = self.create_market()
+        market.tick("1.25000", signals=[
+            market.signal(
+                "limit", "buy", "1.24950", take_profit="1.25050",
+                stop_loss="1.24900"
+            ),
+            market.signal("stop", "buy", "1.25100"),
+        ])
+        self.assertEqual(len(market.portfolio.pending), 2)
+        market.tick("1.25000", signals=[market.signal("cancel", None)])
+        self.assertEqual(len(market.portfolio.pending), 0)
+        market.tick("1.24900")
+        market.tick("1.25200")
+        self.assertEqual(market.units(), 0)
+        self.assertEqual(market.fills, [])
+
+    def test_cancel_keeps_position_levels(self):
+        market = self.create_market()
+        self.open_position(market)
+        market.tick("1.25000", signals=[
+            market.signal("limit", "buy", "1.24950")
+        ])
+        self.assertEqual(len(market.portfolio.pending), 3)
+        market.tick("1.25000", signals=[market.signal("cancel", None)])
+        self.assertEqual(len(market.portfolio.pending), 2)
+        market.tick("1.24900")
+        self.assert_closed(market)
+
+    def test_limit_entry_with_levels(self):
+        market = self.create_market()
+        market.tick("1.25000", signals=[market.signal(
+            "limit", "buy", "1.24950", take_profit="1.25050",
+            stop_loss="1.24900"
+        )])
+        market.tick("1.24940")
+        self.assertEqual(market.units(), 2000)
+        self.assertEqual(len(market.portfolio.pending), 2)
+        market.tick("1.25050")
+        self.assert_closed(market)
+
+
+class ImmediateBracketTest(BracketTests, unittest.TestCase):
+    fill_events = False
+
+
+class FillEventsBracketTest(BracketTests, unittest.TestCase):
+    fill_events = True
+
+    def assert_exits_cover_position(self, market):
+        portfolio = market.portfolio
+        exits = portfolio.bracket_exits.get("GBPUSD", [])
+        self.assertEqual(sum(o.remaining for o in exits), market.units())
+        for order in portfolio.brackets.get("GBPUSD", []):
+            self.assertEqual(order.units, market.units())
+
+    def test_partial_exit_then_add(self):
+        market = self.create_market(partial_fills=True, volume_unit=1000)
+        self.open_position(market)
+        market.tick("1.25060", volume=0.5)
+        self.assertEqual(market.units(), 1500)
+        self.assert_exits_cover_position(market)
+        # Le unità aggiunte durante l'uscita escono con la stessa uscita
+        market.tick(
+            "1.25060", volume=0.5, ask_volume=10.0,
+            signals=[market.signal("market", "buy")]
+        )
+        self.assertEqual(market.units(), 2000)
+        self.assertEqual(
+            [(o.order_type, o.side, o.units) for o in market.orders[-2:]],
+            [("market", "buy", 2000), ("limit", "sell", 2000)]
+        )
+        self.assert_exits_cover_position(market)
+        for i in range(4):
+            market.tick("1.25060", volume=0.5)
+            self.assert_exits_cover_position(market)
+        self.assert_closed(market, trades=8)
+
+    def test_partial_exit_then_stop_loss(self):
+        market = self.create_market(partial_fills=True, volume_unit=1000)
+        self.open_position(market)
+        market.tick("1.25060", volume=0.5)
+        self.assertEqual(market.units(), 1500)
+        # Lo stop loss annulla il resto del take profit e lo sostituisce
+        market.tick("1.24900", volume=0.5)
+        self.assertEqual(
+            [(o.order_type, o.units) for o in market.orders[-3:]],
+            [("limit", 2000), ("cancel", 0), ("stop", 1500)]
+        )
+        self.assertEqual(market.units(), 1000)
+        self.assert_exits_cover_position(market)
+        market.ticks("1.24900", 2, volume=0.5)
+        self.assert_closed(market, trades=4)
+
+
+class BracketLatencyTest(unittest.TestCase):
+    """
+    Livelli di take profit e stop loss con la latenza del gestore di
+    esecuzione (fill_events).
+    """
+
+    def open_position(self, market):
+        market.tick("1.25000", signals=[market.signal(
+            "market", "buy", take_profit="1.25050", stop_loss="1.24920"
+        )])
+        market.ticks("1.25000", 6)
+        self.assertEqual(market.units(), 2000)
+
+    def test_stop_loss_cancels_resting_take_profit(self):
+        market = SimulatedMarket(latency_ticks=6)
+        self.open_position(market)
+        # Il take profit scatta, ma il limit arriva al simulatore quando
+        # il prezzo è già sceso sotto il livello e resta nel book
+        market.tick("1.25060")
+        market.ticks("1.25000", 5)
+        market.tick("1.24980")
+        self.assertEqual(len(market.execution.pending), 1)
+        # Lo stop loss annulla il limit e chiude l'intera posizione
+        market.tick("1.24900")
+        market.ticks("1.24800", 12)
+        self.assertEqual(
+            [(o.order_type, o.side, o.units) for o in market.orders], [
+                ("market", "buy", 2000), ("limit", "sell", 2000),
+                ("cancel", "sell", 0), ("stop", "sell", 2000)
+            ]
+        )
+        self.assertEqual(market.fills[-2].order_type, "cancel")
+        self.assertEqual(market.fills[-2].remaining, 2000)
+        self.assertEqual(market.fills[-1].price, market.price("1.24800"))
+        self.assertTrue(market.is_flat())
+        self.assertEqual(len(market.portfolio.trade_pnls), 1)
+        self.assertLess(market.portfolio.trade_pnls[0], 0)
+
+    def test_take_profit_filled_before_cancel(self):
+        market = SimulatedMarket(latency_ticks=6)
+        self.open_position(market)
+        market.tick("1.25060")
+        # Lo stop loss scatta, ma il take profit è eseguito prima che
+        # l'annullamento arrivi al simulatore
+        market.tick("1.24900")
+        market.ticks("1.24950", 4)
+        market.tick("1.25060")
+        self.assertEqual(market.units(), 0)
+        market.ticks("1.24800", 12)
+        self.assertEqual(
+            [o.order_type for o in market.orders],
+            ["market", "limit", "cancel"]
+        )
+        self.assertEqual(market.fills[-1].order_type, "cancel")
+        self.assertEqual(market.fills[-1].remaining, 0)
+        self.assertTrue(market.is_flat())
+        self.assertEqual(len(market.portfolio.trade_pnls), 1)
+        self.assertGreater(market.portfolio.trade_pnls[0], 0)
+
+    def test_repeated_entries_leave_no_stale_exits(self):
+        market = SimulatedMarket(latency_ticks=6)
+        for i in range(5):
+            self.open_position(market)
+            market.tick("1.25060")
+            market.ticks("1.24980", 6)
+            market.ticks("1.24800", 13)
+            self.assertTrue(market.is_flat())
+        self.assertEqual(len(market.portfolio.trade_pnls), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
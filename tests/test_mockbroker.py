@@ -0,0 +1,109 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from decimal import Decimal
+import queue
+import time
+import unittest
+
+from event import FillEvent, OrderEvent
+from execution import OANDAExecutionHandler
+from execution.mockbroker import MockBrokerServer
+
+
+class OANDAExecutionMockBrokerTest(unittest.TestCase):
+    """
+    Verifica l'invio degli ordini di OANDAExecutionHandler su un
+    MockBrokerServer locale.
+    """
+
+    def start_broker(self, **kwargs):
+        broker = MockBrokerServer(
+            price_func=lambda instrument, side: 1.25 if side == "buy" else 1.24,
+            **kwargs
+        )
+        broker.start_in_thread()
+        self.addCleanup(broker.stop)
+        return broker
+
+    def create_handler(self, broker, **kwargs):
+        handler = OANDAExecutionHandler(
+            broker.domain, "token", "12345", secure=False, **kwargs
+        )
+        self.addCleanup(handler.close)
+        return handler
+
+    def order(self, side="buy"):
+        return OrderEvent("GBPUSD", 1000, "market", side)
+
+    def test_connection_reuse(self):
+        broker = self.start_broker()
+        handler = self.create_handler(broker, pool_size=1)
+        for i in range(5):
+            self.assertIsNotNone(handler.send_order(self.order()))
+        self.assertEqual(len(broker.orders), 5)
+        self.assertEqual(handler.pool.connections, 1)
+        self.assertEqual(handler.pool.reconnects, 0)
+
+    def test_reconnect_after_drop(self):
+        broker = self.start_broker(drop_every=2)
+        handler = self.create_handler(broker, pool_size=1)
+        fills = [handler.send_order(self.order()) for i in range(6)]
+        self.assertTrue(all(fill is not None for fill in fills))
+        # Ogni ordine arriva al server una sola volta
+        self.assertEqual(len(broker.orders), 6)
+        self.assertEqual(handler.pool.reconnects, 2)
+        self.assertEqual(handler.pool.connections, 3)
+        self.assertEqual(handler.errors, 0)
+
+    def test_no_duplicate_order_on_response_timeout(self):
+        broker = self.start_broker()
+        handler = self.create_handler(broker, pool_size=1, timeout=0.2)
+        self.assertIsNotNone(handler.send_order(self.order()))
+        # Il server accetta l'ordine ma risponde dopo il timeout del
+        # client, sulla connessione riutilizzata
+        broker.latency = 0.5
+        self.assertIsNone(handler.send_order(self.order()))
+        time.sleep(0.6)
+        self.assertEqual(len(broker.orders), 2)
+        self.assertEqual(handler.pool.reconnects, 0)
+        self.assertEqual(handler.errors, 1)
+
+    def test_submit_order_returns_fill(self):
+        broker = self.start_broker()
+        events = queue.Queue()
+        handler = self.create_handler(broker, events_queue=events)
+        futures = [
+            handler.submit_order(self.order(side))
+            for side in ("buy", "sell")
+        ]
+        fills = [future.result(timeout=5) for future in futures]
+        for fill, side, price in zip(
+            fills, ("buy", "sell"), (Decimal("1.25"), Decimal("1.24"))
+        ):
+            self.assertIsInstance(fill, FillEvent)
+            self.assertEqual(fill.instrument, "GBPUSD")
+            self.assertEqual(fill.units, 1000)
+            self.assertEqual(fill.side, side)
+            self.assertEqual(fill.price, price)
+        queued = [events.get(timeout=5) for fill in fills]
+        self.assertEqual(
+            sorted(id(fill) for fill in queued),
+            sorted(id(fill) for fill in fills)
+        )
+        self.assertEqual(
+            sorted(o["side"] for o in broker.orders), ["buy", "sell"]
+        )
+
+    def test_order_latency(self):
+        broker = self.start_broker(latency=0.05)
+        handler = self.create_handler(broker)
+        for i in range(3):
+            handler.send_order(self.order())
+        self.assertEqual(handler.order_latency.count, 3)
+        self.assertGreaterEqual(handler.order_latency.min, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+
+# codice python relativo al corso "TRADING AUTOMATICO SUL FOREX"
+# https://tradingquant.it/corsi/trading-automatico-sul-forex/
+
+from decimal import Decimal
+import unittest
+
+from event import OrderEvent
+from fixedpoint import from_pipettes
+
+from simulation import SimulatedMarket
+
+
+class SimulatedExecutionTest(unittest.TestCase):
+    """
+    Esecuzioni di SimulatedExecution e aggiornamento delle posizioni
+    del Portfolio con fill_events.
+    """
+
+    def test_fill_delayed_by_ticks(self):
+        market = SimulatedMarket(latency_ticks=3)
+        market.tick("1.25000", signals=[market.signal("market", "buy")])
+        market.tick("1.25010")
+        market.tick("1.25020")
+        self.assertEqual(market.fills, [])
+        self.assertEqual(market.units(), 0)
+        market.tick("1.25030")
+        self.assertEqual(len(market.fills), 1)
+        self.assertEqual(market.fills[0].price, Decimal("1.25040"))
+        self.assertEqual(market.units(), 2000)
+        ps = market.portfolio.positions["GBPUSD"]
+        self.assertEqual(ps.avg_price, Decimal("1.25040"))
+
+    def test_fill_delayed_by_ms(self):
+        market = SimulatedMarket(latency_ms=250)
+        market.tick(
+            "1.25000", signals=[market.signal("market", "buy")], ms=100
+        )
+        market.tick("1.25010", ms=100)
+        market.tick("1.25020", ms=100)
+        self.assertEqual(market.fills, [])
+        market.tick("1.25030", ms=100)
+        self.assertEqual(len(market.fills), 1)
+        self.assertEqual(market.fills[0].price, Decimal("1.25040"))
+        self.assertEqual(market.fills[0].time, market.time)
+
+    def test_slippage_rounding_fixed_point(self):
+        # 10 pipette di spread: 0.25 e 0.35 dello spread cadono a metà
+        # del pipette e sono arrotondati per difetto
+        for fraction, pipettes in (
+            (0.05, 0), (0.15, 1), (0.25, 2), (0.35, 3), (0.37, 4), (1.0, 10)
+        ):
+            prices = []
+            for fixed_point in (False, True):
+                market = SimulatedMarket(
+                    fixed_point=fixed_point, spread_slippage=fraction
+                )
+                market.tick("1.25000", signals=[
+                    market.signal("market", "buy")
+                ])
+                market.tick("1.25000", signals=[
+                    market.signal("market", "sell")
+                ])
+                buy, sell = [fill.price for fill in market.fills]
+                if fixed_point:
+                    buy, sell = from_pipettes(buy), from_pipettes(sell)
+                prices.append((buy, sell))
+            self.assertEqual(prices[0], prices[1])
+            slippage = Decimal(pipettes).scaleb(-5)
+            self.assertEqual(
+                prices[0],
+                (Decimal("1.25010") + slippage, Decimal("1.25000") - slippage)
+            )
+
+    def test_impact_slippage_rounding_fixed_point(self):
+        prices = []
+        for fixed_point in (False, True):
+            market = SimulatedMarket(
+                fixed_point=fixed_point, impact_slippage=0.3,
+                volume_unit=1000
+            )
+            market.tick("1.25000", volume=1.6, signals=[
+                market.signal("market", "buy")
+            ])
+            price = market.fills[0].price
+            prices.append(from_pipettes(price) if fixed_point else price)
+        # 0.3 * 2000 / 1600 dello spread = 3.75 pipette
+        self.assertEqual(prices, [Decimal("1.25014")] * 2)
+
+    def test_partial_fill_then_opposite_signal(self):
+        market = SimulatedMarket(partial_fills=True, volume_unit=1000)
+        market.tick("1.25000", volume=0.5, signals=[
+            market.signal("market", "buy")
+        ])
+        self.assertEqual(market.units(), 500)
+        self.assertEqual(market.fills[0].remaining, 1500)
+        # Il segnale opposto chiude le sole unità eseguite
+        market.tick("1.25000", volume=0.0, signals=[
+            market.signal("market", "sell")
+        ])
+        self.assertEqual(
+            [(o.side, o.units) for o in market.orders],
+            [("buy", 2000), ("sell", 500)]
+        )
+        self.assertEqual(len(market.fills), 1)
+        market.tick("1.25000", volume=10.0)
+        self.assertEqual(
+            [(f.side, f.units, f.remaining) for f in market.fills],
+            [("buy", 500, 1500), ("buy", 1500, 0), ("sell", 500, 0)]
+        )
+        self.assertEqual(market.units(), 1500)
+        self.assertEqual(len(market.portfolio.trade_pnls), 1)
+
+    def test_partial_fills_up_to_available_volume(self):
+        market = SimulatedMarket(partial_fills=True, volume_unit=1000)
+        market.tick("1.25000", volume=0.8, signals=[
+            market.signal("market", "buy")
+        ])
+        market.tick("1.25010", volume=0.8)
+        market.tick("1.25020", volume=0.8)
+        self.assertEqual(
+            [(f.units, f.remaining, f.price) for f in market.fills], [
+                (800, 1200, Decimal("1.25010")),
+                (800, 400, Decimal("1.25020")),
+                (400, 0, Decimal("1.25030")),
+            ]
+        )
+        self.assertEqual(market.units(), 2000)
+        self.assertEqual(market.execution.working["GBPUSD"], [])
+
+    def test_limit_fill_prices(self):
+        market = SimulatedMarket(spread_slippage=2.0)
+        market.tick("1.25010")
+        market.execution.execute_order(
+            OrderEvent("GBPUSD", 1000, "limit", "buy", Decimal("1.25000"))
+        )
+        market.execution.execute_order(
+            OrderEvent("GBPUSD", 1000, "limit", "buy", Decimal("1.24950"))
+        )
+        market.process_events()
+        self.assertEqual(market.fills, [])
+        # L'ask scende a 1.24990: lo slippage porterebbe il prezzo a
+        # 1.25010, ma un limit non è eseguito oltre il suo livello
+        market.tick("1.24980")
+        self.assertEqual(
+            [(f.order_type, f.price) for f in market.fills],
+            [("limit", Decimal("1.25000"))]
+        )
+        # Un prezzo migliore del livello è mantenuto
+        market.tick("1.24900")
+        self.assertEqual(market.fills[1].price, Decimal("1.24930"))
+        self.assertEqual(market.units(), 2000)
+        self.assertEqual(len(market.execution.pending), 0)
+
+    def test_stop_fill_prices(self):
+        market = SimulatedMarket(spread_slippage=0.5)
+        market.tick("1.25000")
+        market.execution.execute_order(
+            OrderEvent("GBPUSD", 1000, "stop", "buy", Decimal("1.25050"))
+        )
+        market.execution.execute_order(
+            OrderEvent("GBPUSD", 1000, "stop", "sell", Decimal("1.24950"))
+        )
+        market.tick("1.25030")
+        self.assertEqual(market.fills, [])
+        # Gli stop sono eseguiti al prezzo corrente con lo slippage,
+        # anche se peggiore del livello
+        market.tick("1.25070")
+        market.tick("1.24900")
+        self.assertEqual(
+            [(f.order_type, f.side, f.price) for f in market.fills], [
+                ("stop", "buy", Decimal("1.25085")),
+                ("stop", "sell", Decimal("1.24895")),
+            ]
+        )
+        self.assertEqual(market.units(), 0)
+        self.assertEqual(len(market.portfolio.trade_pnls), 1)
+
+    def test_cancel_order(self):
+        market = SimulatedMarket(latency_ticks=2)
+        market.tick("1.25000")
+        market.execution.execute_order(OrderEvent(
+            "GBPUSD", 1000, "limit", "buy", Decimal("1.24900"),
+            client_id=7
+        ))
+        market.execution.execute_order(OrderEvent(
+            "GBPUSD", 0, "cancel", "buy", client_id=7
+        ))
+        market.ticks("1.25000", 2)
+        self.assertEqual(
+            [(f.order_type, f.units, f.remaining, f.client_id)
+             for f in market.fills],
+            [("cancel", 0, 1000, 7)]
+        )
+        market.tick("1.24800")
+        self.assertEqual(len(market.fills), 1)
+        self.assertEqual(len(market.execution.pending), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,47 +11,75 @@ import queue
 import threading
 import time
 
+from event import BoundedTickQueue, ConflatingTickQueue
+from event.dispatcher import EventDispatcher
 from execution import OANDAExecutionHandler
+from performance import Instrumentation, format_report
 from portfolio import Portfolio
 from settings import STREAM_DOMAIN, API_DOMAIN, ACCESS_TOKEN, ACCOUNT_ID
 from strategy import TestStrategy
 from data import StreamingForexPrices
 from settings import settings
 
-def trade(events, strategy, portfolio, execution, heartbeat):
+def log_event(event):
+    logger.debug("Received new %s event: %s", event.type.lower(), event)
+
+
+def trade(
+    events, strategy, portfolio, execution, heartbeat, stop_event=None,
+    instrumentation=None
+):
     """
-    Esegue un ciclo while infinito che effettua il polling
-    della coda degli eventi e indirizza ogni evento al
-    componente strategia del gestore di esecuzione.
-    Il ciclo si fermerà per "heartbeat" di alcuni secondi
-    e continuerà.
+    Esegue il ciclo di trading: resta in attesa sulla coda degli
+    eventi (al più "heartbeat" secondi per volta, senza polling)
+    e indirizza ogni evento ai componenti registrati nella tabella
+    del dispatcher. Termina quando stop_event viene impostato.
+
+    Per eseguire più strategie sullo stesso flusso di prezzi si passa
+    lo stesso StrategyHost come strategy e come portfolio: i tick e le
+    barre sono instradati solo alle strategie dei loro strumenti.
+
+    Gli eventi sono registrati nel log solo a livello DEBUG, altrimenti
+    log_event non viene neppure registrato nel dispatcher. Con un
+    oggetto Instrumentation il report può essere letto in ogni momento
+    con instrumentation.report() da un altro thread e viene scritto
+    nel log alla fine del trading.
     """
-    while True:
-        try:
-            event = events.get(False)
-        except queue.Empty:
-            pass
+    handlers = {
+        "TICK": [strategy.calculate_signals, portfolio.update_portfolio],
+        "BAR": [strategy.calculate_signals],
+        "SIGNAL": [portfolio.execute_signal],
+        "ORDER": [execution.execute_order],
+        "FILL": [],
+    }
+    if logger.isEnabledFor(logging.DEBUG):
+        for funcs in handlers.values():
+            funcs.insert(0, log_event)
+    dispatcher = EventDispatcher(events, handlers, instrumentation)
+    try:
+        dispatcher.run_live(timeout=heartbeat, stop_event=stop_event)
+    finally:
+        if instrumentation is not None:
+            logger.info("%s", format_report(dispatcher.report()))
         else:
-            if event is not None:
-                if event.type == 'TICK':
-                    logger.info("Received new tick event: %s", event)
-                    strategy.calculate_signals(event)
-                    portfolio.update_portfolio(event)
-                elif event.type == 'SIGNAL':
-                    logger.info("Received new signal event: %s", event)
-                    portfolio.execute_signal(event)
-                elif event.type == 'ORDER':
-                    logger.info("Received new order event: %s", event)
-                    execution.execute_order(event)
-        time.sleep(heartbeat)
+            logger.info("%s", dispatcher.tick_to_order)
+        if hasattr(events, "conflated"):
+            logger.info("Conflated ticks: %s", events.conflated)
 
 
 if __name__ == "__main__":
     logging.config.fileConfig('../logging.conf')
     logger = logging.getLogger('qsforex.trading.trading')
 
-    heartbeat = 0.5  # Pausa di mezzo secondo
-    events = queue.Queue()
+    heartbeat = 0.5  # Attesa massima di mezzo secondo sulla coda
+    # Con conflate_ticks = True in coda resta solo l'ultimo tick di
+    # ogni strumento; altrimenti la coda è limitata e sotto carico si
+    # scartano i tick più vecchi di ogni strumento
+    conflate_ticks = True
+    if conflate_ticks:
+        events = ConflatingTickQueue()
+    else:
+        events = BoundedTickQueue(maxsize=10000)
     equity = settings.EQUITY
 
     # coppie di valute da negoziare
@@ -76,12 +104,22 @@ if __name__ == "__main__":
     portfolio = Portfolio(prices, events, equity=equity, backtest=False)
 
     # Creazione di un gestore di esecuzione con parametri
-    # di autenticazioni di OANDA
-    execution = OANDAExecutionHandler(API_DOMAIN, ACCESS_TOKEN, ACCOUNT_ID)
+    # di autenticazioni di OANDA: gli ordini sono inviati in modo
+    # asincrono e le esecuzioni tornano nella coda come FillEvent
+    execution = OANDAExecutionHandler(
+        API_DOMAIN, ACCESS_TOKEN, ACCOUNT_ID, events_queue=events
+    )
 
     # Crea due threads separati: Uno per il ciclo di trading
     # e l'altro per lo streaming dei prezzi di mercato
-    trade_thread = threading.Thread(target=trade, args=(events, strategy, portfolio, execution, heartbeat))
+    # Strumentazione del ciclo degli eventi: il report è disponibile
+    # durante il trading con instrumentation.report()
+    instrumentation = Instrumentation()
+
+    trade_thread = threading.Thread(
+        target=trade, args=(events, strategy, portfolio, execution, heartbeat),
+        kwargs={"instrumentation": instrumentation}
+    )
     price_thread = threading.Thread(target=prices.stream_to_queue, args=[])
 
     # Avvio di entrambi i thread